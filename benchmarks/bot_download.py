@@ -0,0 +1,136 @@
+'''
+Measures how long a bot zip takes to download, as one GET and as parallel byte-range GETs
+(server/s3_download.py), against a file-backed stand-in for S3.
+
+The stand-in serves a local file but charges each request a time to first byte and each
+connection a fixed bandwidth, which is what makes real S3 downloads slow; both can be set
+to match what a worker sees. If boto3 is installed, the cost of building an S3 client,
+which get_s3_object used to pay on every call, is measured too.
+
+    python3 benchmarks/bot_download.py [--size-mb N] [--latency-ms L] [--bandwidth-mbps B]
+'''
+import argparse
+import concurrent.futures
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, 'server'))
+
+from s3_download import RangedObject  # noqa: E402
+
+
+class ThrottledBody(object):
+    def __init__(self, data, bandwidth):
+        self.data = data
+        self.offset = 0
+        self.bandwidth = bandwidth
+
+    def read(self, amt=None):
+        end = len(self.data) if amt is None else self.offset + amt
+        chunk = self.data[self.offset:end]
+        self.offset += len(chunk)
+        time.sleep(len(chunk) / self.bandwidth)
+        return chunk
+
+    def close(self):
+        pass
+
+
+class FakeS3Client(object):
+    '''
+    Serves get_object from files in a directory, with S3-like latency and bandwidth.
+    '''
+
+    def __init__(self, directory, latency, bandwidth):
+        self.directory = directory
+        self.latency = latency
+        self.bandwidth = bandwidth
+
+    def get_object(self, Bucket, Key, Range=None):
+        time.sleep(self.latency)
+        path = os.path.join(self.directory, Bucket, Key)
+        size = os.path.getsize(path)
+        response = {}
+        with open(path, 'rb') as f:
+            if Range is None:
+                data = f.read()
+            else:
+                first, last = Range[len('bytes='):].split('-')
+                first, last = int(first), min(int(last), size - 1)
+                f.seek(first)
+                data = f.read(last + 1 - first)
+                response['ContentRange'] = 'bytes {}-{}/{}'.format(first, last, size)
+        response['ContentLength'] = len(data)
+        response['Body'] = ThrottledBody(data, self.bandwidth)
+        return response
+
+
+def drain(body):
+    size = 0
+    for chunk in iter(lambda: body.read(1024 ** 2), b''):
+        size += len(chunk)
+    body.close()
+    return size
+
+
+def single_get(client, size):
+    start = time.perf_counter()
+    assert drain(client.get_object(Bucket='bots', Key='bot.zip')['Body']) == size
+    return time.perf_counter() - start
+
+
+def ranged_get(client, size, part_size, executor, workers):
+    start = time.perf_counter()
+    assert drain(RangedObject(client, 'bots', 'bot.zip', part_size, executor, workers)) == size
+    return time.perf_counter() - start
+
+
+def client_construction(repeat):
+    try:
+        import boto3
+    except ImportError:
+        return None
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        boto3.client('s3', region_name='us-east-1', aws_access_key_id='x', aws_secret_access_key='x')
+        times.append(time.perf_counter() - start)
+    return times
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(prog='python3 benchmarks/bot_download.py')
+    parser.add_argument('--size-mb', type=float, default=64)
+    parser.add_argument('--latency-ms', type=float, default=30)
+    parser.add_argument('--bandwidth-mbps', type=float, default=400, help='Per-connection bandwidth, in megabits per second')
+    parser.add_argument('--part-mb', type=float, default=8)
+    parser.add_argument('--workers', type=int, default=8)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+    size = int(args.size_mb * 1024 ** 2)
+    part_size = int(args.part_mb * 1024 ** 2)
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        os.mkdir(os.path.join(tmp_dir, 'bots'))
+        with open(os.path.join(tmp_dir, 'bots', 'bot.zip'), 'wb') as f:
+            f.write(os.urandom(size))
+        client = FakeS3Client(tmp_dir, args.latency_ms / 1e3, args.bandwidth_mbps * 1e6 / 8)
+        executor = concurrent.futures.ThreadPoolExecutor(max_workers=args.workers)
+        single, ranged = [], []
+        for _ in range(args.repeat):
+            single.append(single_get(client, size))
+            ranged.append(ranged_get(client, size, part_size, executor, args.workers))
+    print('{:.0f} MB, {:.0f} ms to first byte, {:.0f} Mbit/s per connection'.format(
+        args.size_mb, args.latency_ms, args.bandwidth_mbps))
+    print('single GET   {:>8.1f} ms'.format(min(single) * 1e3))
+    print('ranged GETs  {:>8.1f} ms   ({} x {:.0f} MB parts, {} workers)'.format(
+        min(ranged) * 1e3, -(-size // part_size), args.part_mb, args.workers))
+    construction = client_construction(args.repeat * 5)
+    if construction is None:
+        print('boto3 is not installed; skipping S3 client construction')
+    else:
+        print('new S3 client {:>7.1f} ms median, saved on every download by the shared client'.format(
+            statistics.median(construction) * 1e3))
@@ -0,0 +1,88 @@
+'''
+Micro-benchmark of bounty checks with bitmask cards against the list scans they replaced.
+
+For a sample of seeded deals at every street, times RoundState.get_bounty_hits in the
+engine and the parser next to the old list-building versions, plus the engine's
+showdown, which now reuses the round's board and a single bounty check.
+
+    python3 benchmarks/cards.py [--deals N]
+'''
+import argparse
+import os
+import sys
+import timeit
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+ENGINE_DIR = os.path.join(ROOT, 'deps', 'engine-2025')
+sys.path.insert(0, ENGINE_DIR)
+sys.path.insert(0, os.path.join(ROOT, 'server'))
+
+from tournament import load_engine  # noqa: E402
+from pokerbots_parser import states as parser_states  # noqa: E402
+
+
+def engine_list_hits(round_state, card_names=('2', '3', '4', '5', '6', '7', '8', '9', 'T', 'J', 'Q', 'K', 'A')):
+    cards0 = round_state.hands[0] + ([] if round_state.street == 0 else round_state.deck.peek(round_state.street))
+    cards1 = round_state.hands[1] + ([] if round_state.street == 0 else round_state.deck.peek(round_state.street))
+    return (round_state.bounties[0] in [card_names[card.rank] for card in cards0],
+            round_state.bounties[1] in [card_names[card.rank] for card in cards1])
+
+
+def parser_list_hits(round_state):
+    cards0 = round_state.hands[0] + round_state.deck
+    cards1 = round_state.hands[1] + round_state.deck
+    return (round_state.bounties[0] in [card[0] for card in cards0],
+            round_state.bounties[1] in [card[0] for card in cards1])
+
+
+def states(engine, deals, seed):
+    schedule = engine.deal_schedule(seed)
+    # a bot only knows its own bounty, so the parser's states hide the opponent's
+    engine_states, parser_states_ = [], []
+    for _ in range(deals):
+        deal = next(schedule)
+        cards = [str(card) for card in deal.cards]
+        for street in (0, 3, 4, 5):
+            round_state = engine.new_round_state(deal.cards, deal.bounties)
+            round_state.street = street
+            round_state.pips = [20, 20]
+            round_state.stacks = [380, 380]
+            engine_states.append(round_state)
+            parser_states_.append(parser_states.RoundState(1, street, [20, 20], [380, 380], [cards[:2], cards[2:4]],
+                                                           [deal.bounties[0], '-1'], cards[4:4 + street]))
+    return engine_states, parser_states_
+
+
+def bench(cases, repeat):
+    '''
+    Times each (name, function, items) case, interleaving the runs so that all cases see
+    the same machine conditions, and prints the best time per call.
+    '''
+    best = [float('inf')] * len(cases)
+    for _ in range(repeat):
+        for i, (name, function, items) in enumerate(cases):
+            elapsed = timeit.timeit(lambda: [function(item) for item in items], number=1)
+            best[i] = min(best[i], elapsed / len(items))
+    for (name, function, items), elapsed in zip(cases, best):
+        print('{:<28} {:>8.0f} ns/call'.format(name, elapsed * 1e9))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(prog='python3 benchmarks/cards.py')
+    parser.add_argument('--deals', type=int, default=5000)
+    parser.add_argument('--repeat', type=int, default=15)
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+    with open(os.path.join(ENGINE_DIR, 'config.py')) as config_file:
+        engine = load_engine(config_file.read())
+    engine_states, parser_states_ = states(engine, args.deals, args.seed)
+    assert all(engine_list_hits(state) == state.get_bounty_hits() for state in engine_states)
+    assert all(parser_list_hits(state) == state.get_bounty_hits() for state in parser_states_)
+    river = [state for state in engine_states if state.street == 5]
+    bench([
+        ('engine bounty hits (lists)', engine_list_hits, engine_states),
+        ('engine bounty hits (masks)', engine.RoundState.get_bounty_hits, engine_states),
+        ('parser bounty hits (lists)', parser_list_hits, parser_states_),
+        ('parser bounty hits (masks)', parser_states.RoundState.get_bounty_hits, parser_states_),
+        ('engine showdown', engine.RoundState.showdown, river)
+    ], args.repeat)
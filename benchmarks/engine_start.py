@@ -0,0 +1,91 @@
+'''
+Measures how long a live game's engine takes to start listening for the hero, started
+cold (`python engine.py`, ENGINE_MODE = 'subprocess') and forked from the zygote
+(ENGINE_MODE = 'zygote').
+
+The engine runs with the live game config and no bot on either seat, so the time is
+start-up alone: from launching the engine to reading its first "<name> <port>" line.
+
+    python3 benchmarks/engine_start.py [--games N]
+'''
+import argparse
+import os
+import select
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+ENGINE_DIR = os.path.join(ROOT, 'deps', 'engine-2025')
+ENGINE_PATH = os.path.join(ENGINE_DIR, 'engine.py')
+ZYGOTE_PATH = os.path.join(ENGINE_DIR, 'zygote.py')
+sys.path.insert(0, os.path.join(ROOT, 'server'))
+
+from engine_zygote import EngineZygote  # noqa: E402
+
+
+def config_source():
+    with open(os.path.join(ROOT, 'server', 'templates', 'config.txt')) as template:
+        source = template.read().replace('{{ bot_path }}', '').replace('{{ bot_prebuilt }}', 'False')
+    return source.replace("PLAYER_2_PATH = ''", 'PLAYER_2_PATH = None')
+
+
+def read_line(fd):
+    data = b''
+    while not data.endswith(b'\n'):
+        select.select([fd], [], [])
+        chunk = os.read(fd, 64)
+        if not chunk:
+            raise RuntimeError('engine exited before listening')
+        data += chunk
+    return data
+
+
+def cold_start(game_dir):
+    with open(os.path.join(game_dir, 'config.py'), 'w') as config_file:
+        config_file.write(config_source())
+    start = time.perf_counter()
+    ready_read, ready_write = os.pipe()
+    process = subprocess.Popen([sys.executable, ENGINE_PATH, '--ready-fd', str(ready_write)], cwd=game_dir,
+                               pass_fds=(ready_write,), stdout=subprocess.DEVNULL)
+    os.close(ready_write)
+    read_line(ready_read)
+    elapsed = time.perf_counter() - start
+    process.kill()
+    process.wait()
+    os.close(ready_read)
+    return elapsed
+
+
+def zygote_start(zygote, game_dir):
+    start = time.perf_counter()
+    game = zygote.spawn(game_dir, config_source())
+    read_line(game.ready_fd)
+    elapsed = time.perf_counter() - start
+    game.kill()
+    game.wait()
+    os.close(game.ready_fd)
+    return elapsed
+
+
+def report(name, times):
+    times = sorted(times)
+    print('{:<10} median {:>7.1f} ms   p95 {:>7.1f} ms   min {:>7.1f} ms'.format(
+        name, statistics.median(times) * 1e3, times[int(0.95 * (len(times) - 1))] * 1e3, times[0] * 1e3))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(prog='python3 benchmarks/engine_start.py')
+    parser.add_argument('--games', type=int, default=20)
+    args = parser.parse_args()
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        cold = [cold_start(tempfile.mkdtemp(dir=tmp_dir)) for _ in range(args.games)]
+        zygote = EngineZygote(ZYGOTE_PATH, stdout=subprocess.DEVNULL)
+        try:
+            forked = [zygote_start(zygote, tempfile.mkdtemp(dir=tmp_dir)) for _ in range(args.games)]
+        finally:
+            zygote.close()
+    report('cold', cold)
+    report('zygote', forked)
@@ -0,0 +1,108 @@
+'''
+Benchmarks the RoundState game tree of the engine and of the server's bot parser.
+
+Plays the same seeded random hands through both implementations and reports hands per
+second (best of --repeat runs) and the memory each finished hand keeps alive: every
+block allocated while playing it that is still reachable from its TerminalState.
+
+    python3 benchmarks/round_state.py [--hands N] [--repeat N]
+'''
+import argparse
+import os
+import random
+import sys
+import time
+import tracemalloc
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+ENGINE_DIR = os.path.join(ROOT, 'deps', 'engine-2025')
+sys.path.insert(0, ENGINE_DIR)
+sys.path.insert(0, os.path.join(ROOT, 'server'))
+
+from tournament import load_engine  # noqa: E402
+from pokerbots_parser import actions as parser_actions, states as parser_states  # noqa: E402
+
+
+def load():
+    with open(os.path.join(ENGINE_DIR, 'config.py')) as config_file:
+        return load_engine(config_file.read())
+
+
+def deals(engine, hands, seed):
+    '''
+    Returns the deck order and bounties of each hand, and the random numbers that pick
+    its actions.
+    '''
+    schedule = engine.deal_schedule(seed)
+    rng = random.Random(seed)
+    return [(next(schedule), [rng.random() for _ in range(64)]) for _ in range(hands)]
+
+
+def play(initial_state, actions, terminal_class, choices):
+    '''
+    Plays one hand, picking each action and raise size from choices.
+    '''
+    round_state = initial_state
+    choices = iter(choices)
+    while not isinstance(round_state, terminal_class):
+        legal_actions = round_state.legal_actions()
+        if actions.RaiseAction in legal_actions and next(choices) < 0.3:
+            min_raise, max_raise = round_state.raise_bounds()
+            round_state = round_state.proceed(actions.RaiseAction(min_raise + int(next(choices) * (max_raise - min_raise))))
+        elif actions.CheckAction in legal_actions:
+            round_state = round_state.proceed(actions.CheckAction())
+        elif next(choices) < 0.8:
+            round_state = round_state.proceed(actions.CallAction())
+        else:
+            round_state = round_state.proceed(actions.FoldAction())
+    return round_state
+
+
+def engine_hands(engine, hands):
+    return [(engine.new_round_state(deal.cards, deal.bounties), choices) for deal, choices in hands]
+
+
+def parser_hands(engine, hands):
+    states = []
+    for deal, choices in hands:
+        cards = [str(card) for card in deal.cards]
+        pips = [parser_states.SMALL_BLIND, parser_states.BIG_BLIND]
+        stacks = [parser_states.STARTING_STACK - parser_states.SMALL_BLIND,
+                  parser_states.STARTING_STACK - parser_states.BIG_BLIND]
+        states.append((parser_states.RoundState(0, 0, pips, stacks, [cards[:2], cards[2:4]], list(deal.bounties),
+                                                cards[4:9], None), choices))
+    return states
+
+
+def measure(name, make_hands, actions, terminal_class, repeat):
+    elapsed = float('inf')
+    for _ in range(repeat):
+        hands = make_hands()
+        start = time.perf_counter()
+        for initial_state, choices in hands:
+            play(initial_state, actions, terminal_class, choices)
+        elapsed = min(elapsed, time.perf_counter() - start)
+
+    hands = make_hands()
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    results = [play(initial_state, actions, terminal_class, choices) for initial_state, choices in hands]
+    after = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+    stats = [stat for stat in after.compare_to(before, 'lineno') if stat.count_diff > 0]
+    blocks = sum(stat.count_diff for stat in stats) - 1  # the results list itself
+    size = sum(stat.size_diff for stat in stats)
+    print('{:<8} {:>10.0f} hands/sec {:>8.1f} blocks/hand {:>8.0f} bytes/hand'.format(
+        name, len(results) / elapsed, blocks / len(results), size / len(results)))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(prog='python3 benchmarks/round_state.py')
+    parser.add_argument('--hands', type=int, default=20000)
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+    engine = load()
+    hands = deals(engine, args.hands, args.seed)
+    measure('engine', lambda: engine_hands(engine, hands), engine, engine.TerminalState, args.repeat)
+    measure('parser', lambda: parser_hands(engine, hands), parser_actions, parser_states.TerminalState, args.repeat)
@@ -0,0 +1,121 @@
+'''
+Measures the round trip of one action between the engine and a bot: the engine writes
+a message line, the bot reads it and writes back its action, and the engine reads that.
+
+Each transport the engine can hand a bot is timed with the same line-buffered socket
+files the engine and the skeletons use, against a forked bot that answers immediately:
+
+    tcp          TCP over loopback with Nagle's algorithm left on (the old default)
+    tcp-nodelay  TCP over loopback with TCP_NODELAY on both ends
+    unix         a Unix domain socket, as bots with "transport": "unix" get
+    socketpair   an already-connected AF_UNIX pair, as the daemon engine uses in-process
+
+    python3 benchmarks/transport.py [--actions N] [--repeat R]
+'''
+import argparse
+import os
+import shutil
+import socket
+import statistics
+import tempfile
+import time
+
+# a mid-hand message from the engine, and the bot's reply
+MESSAGE = 'T29.041 P0 Hkd,Qs B2,-1 R2 C RTJ B7s,8c,2d,Tc O'
+REPLY = 'R30'
+
+
+def answer(sock):
+    '''
+    Plays the bot: replies to every line until the engine closes the connection.
+    '''
+    socketfile = sock.makefile('rw')
+    for _ in socketfile:
+        socketfile.write(REPLY + '\n')
+        socketfile.flush()
+
+
+def time_actions(sock, actions):
+    '''
+    Returns the per-action round trips over sock, in seconds.
+    '''
+    socketfile = sock.makefile('rw')
+    times = []
+    for _ in range(actions):
+        start = time.perf_counter()
+        socketfile.write(MESSAGE + '\n')
+        socketfile.flush()
+        socketfile.readline()
+        times.append(time.perf_counter() - start)
+    socketfile.close()
+    return times
+
+
+def connected_pair(transport, tmp_dir):
+    '''
+    Returns (engine end, bot end) of a connection over transport.
+    '''
+    if transport == 'socketpair':
+        return socket.socketpair()
+    if transport == 'unix':
+        path = os.path.join(tmp_dir, 'player.sock')
+        if os.path.exists(path):
+            os.unlink(path)
+        server_socket = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        server_socket.bind(path)
+        address = path
+    else:
+        server_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        server_socket.bind(('localhost', 0))
+        address = server_socket.getsockname()
+    with server_socket:
+        server_socket.listen()
+        client = socket.socket(server_socket.family, socket.SOCK_STREAM)
+        client.connect(address)
+        engine_end, _ = server_socket.accept()
+    if transport == 'tcp-nodelay':
+        for sock in (engine_end, client):
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+    return engine_end, client
+
+
+def run(transport, actions, tmp_dir):
+    '''
+    Times actions round trips over transport with the bot in a forked child.
+    '''
+    engine_end, bot_end = connected_pair(transport, tmp_dir)
+    pid = os.fork()
+    if pid == 0:
+        engine_end.close()
+        answer(bot_end)
+        os._exit(0)
+    bot_end.close()
+    try:
+        return time_actions(engine_end, actions)
+    finally:
+        engine_end.close()
+        os.waitpid(pid, 0)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(prog='python3 benchmarks/transport.py')
+    parser.add_argument('--actions', type=int, default=20000)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+    transports = ['tcp', 'tcp-nodelay', 'unix', 'socketpair']
+    medians = {transport: [] for transport in transports}
+    p99s = {transport: [] for transport in transports}
+    tmp_dir = tempfile.mkdtemp(prefix='pokerbots-bench-')
+    try:
+        # interleaved, so background load hits every transport alike
+        for _ in range(args.repeat):
+            for transport in transports:
+                times = sorted(run(transport, args.actions, tmp_dir))
+                medians[transport].append(statistics.median(times))
+                p99s[transport].append(times[int(0.99 * (len(times) - 1))])
+    finally:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+    for transport in transports:
+        # best of the repeats for each statistic
+        print('{:<12} median {:>6.1f} us   p99 {:>7.1f} us'.format(
+            transport, min(medians[transport]) * 1e6, min(p99s[transport]) * 1e6))
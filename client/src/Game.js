@@ -120,19 +120,14 @@ class Game extends Component {
   }
 
   componentDidMount() {
-    this.props.socket.emit(
-      "join_game",
-      this.props.match.params.id,
-      (result) => {
-        this.setState({
-          status: "loaded",
-          pingInterval: setInterval(() => {
-            this.props.socket.emit("game_ping", this.props.match.params.id);
-          }, 2000),
-        });
-        this.handleGameUpdate(result);
-      }
-    );
+    this.joinGame(() => {
+      this.setState({
+        status: "loaded",
+        pingInterval: setInterval(() => {
+          this.props.socket.emit("game_ping", this.props.match.params.id);
+        }, 2000),
+      });
+    });
 
     this.props.socket.on("game_update", this.handleGameUpdate);
   }
@@ -142,7 +137,57 @@ class Game extends Component {
     clearInterval(this.state.pingInterval);
   }
 
-  handleGameUpdate = (newGame) => {
+  // Fetches a full snapshot of the game, used on load and to recover from missed updates.
+  joinGame = (callback) => {
+    this.props.socket.emit("join_game", this.props.match.params.id, (result) => {
+      if (callback) {
+        callback();
+      }
+      this.applySnapshot(result);
+    });
+  };
+
+  // Updates carrying a "delta" only hold what changed since update seq - 1.
+  handleGameUpdate = (update) => {
+    if (update.delta === undefined) {
+      this.applySnapshot(update);
+      return;
+    }
+
+    const game = this.state.game;
+    if (!game || update.seq <= game.seq) {
+      // not loaded yet, or already included in the snapshot we hold
+      return;
+    }
+    if (update.seq !== game.seq + 1) {
+      this.joinGame();
+      return;
+    }
+
+    const last_message = Object.assign({}, game.last_message, update.delta);
+    update.removed.forEach((key) => {
+      delete last_message[key];
+    });
+    if (update.new_moves.length > 0) {
+      last_message.move_history = (last_message.move_history || []).concat(
+        update.new_moves
+      );
+    }
+    this.applySnapshot(
+      Object.assign({}, game, {
+        seq: update.seq,
+        status: update.status,
+        last_message,
+      })
+    );
+  };
+
+  applySnapshot = (newGame) => {
+    if (newGame === null) {
+      this.setState({ game: newGame });
+      return;
+    }
+
     var min_amount = null;
     var max_amount = null;
     if (newGame.last_message && newGame.last_message.legal_moves) {
@@ -5,8 +5,13 @@ PLAYER_1_PATH = './python_skeleton'
 # NO TRAILING SLASHES ARE ALLOWED IN PATHS
 PLAYER_2_NAME = 'B'
 PLAYER_2_PATH = './cpp_skeleton'        # Change this to './player_chatbot' to interact with your own bot!
+# SET TO True TO SKIP THE BUILD COMMAND FOR A BOT THAT IS ALREADY BUILT
+PLAYER_1_PREBUILT = False
+PLAYER_2_PREBUILT = False
 # GAME PROGRESS IS RECORDED HERE
 GAME_LOG_FILENAME = 'gamelog'
+# SET TO True TO WRITE gamelog.txt.gz INSTEAD OF gamelog.txt
+COMPRESS_GAME_LOG = True
 # PLAYER_LOG_SIZE_LIMIT IS IN BYTES
 PLAYER_LOG_SIZE_LIMIT = 524288
 # STARTING_GAME_CLOCK AND TIMEOUTS ARE IN SECONDS
@@ -14,6 +19,8 @@ ENFORCE_GAME_CLOCK = True
 STARTING_GAME_CLOCK = 30.
 BUILD_TIMEOUT = 10.
 CONNECT_TIMEOUT = 10.
+# 'unix' CONNECTS BOTS WHOSE commands.json SETS "transport": "unix" OVER A UNIX DOMAIN SOCKET; 'tcp' ALWAYS USES TCP
+BOT_TRANSPORT = 'unix'
 # THE GAME VARIANT FIXES THE PARAMETERS BELOW
 # CHANGE ONLY FOR TRAINING OR EXPERIMENTATION
 NUM_ROUNDS = 1000
@@ -27,3 +34,13 @@ BOUNTY_RATIO = 1.5 # subject to change, ratio as a multiplier of pot
 BOUNTY_CONSTANT = 10
 
 PLAYER_TIMEOUT = 120
+
+# SET TO True TO REPLAY EVERY DEAL WITH THE PLAYERS' SEATS SWAPPED (DUPLICATE POKER)
+DUPLICATE_DEALS = False
+# SET EARLY_STOP_CONFIDENCE (E.G. 0.99) TO END THE MATCH ONCE THE WINNER IS STATISTICALLY SETTLED
+# IT IS CHECKED EVERY EARLY_STOP_INTERVAL ROUNDS, STARTING AT EARLY_STOP_MIN_ROUNDS
+EARLY_STOP_CONFIDENCE = None
+EARLY_STOP_MIN_ROUNDS = 200
+EARLY_STOP_INTERVAL = 25
+# SET GAME_SEED TO AN INTEGER TO REPRODUCE A GAME'S DEALS; None DRAWS A FRESH SEED, WHICH IS LOGGED
+GAME_SEED = None
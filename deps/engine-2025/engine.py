@@ -3,8 +3,12 @@
 DO NOT REMOVE, RENAME, OR EDIT THIS FILE
 '''
 from collections import namedtuple
-from threading import Thread
-from queue import Queue
+from contextlib import redirect_stdout
+from collections import deque
+from threading import Event, Lock, Thread
+import argparse
+import bisect
+import importlib
 import time
 import math
 import json
@@ -14,6 +18,9 @@ import eval7
 import sys
 import os
 import random
+import shutil
+import tempfile
+import zlib
 
 sys.path.insert(0, os.getcwd())
 from config import *
@@ -27,6 +34,12 @@ TerminalState = namedtuple('TerminalState', ['deltas', 'bounty_hits', 'previous_
 
 STREET_NAMES = ['Flop', 'Turn', 'River']
 DECODE = {'F': FoldAction, 'C': CallAction, 'K': CheckAction, 'R': RaiseAction}
+ACTION_NAMES = {action.__name__: action for action in DECODE.values()}
+CARD_NAMES = ['2', '3', '4', '5', '6', '7', '8', '9', 'T', 'J', 'Q', 'K', 'A']
+# Sets of cards are bitmasks in eval7's layout (Card.mask): bit 13 * suit + rank, with
+# suits in cdhs order. RANK_MASKS selects all four cards of a rank, so "does this hand
+# hold a bounty card" is a single AND.
+RANK_MASKS = {name: sum(1 << (13 * suit + rank) for suit in range(4)) for rank, name in enumerate(CARD_NAMES)}
 CCARDS = lambda cards: ','.join(map(str, cards))
 PCARDS = lambda cards: '[{}]'.format(' '.join(map(str, cards)))
 PVALUE = lambda name, value: ', {} ({})'.format(name, value)
@@ -55,10 +68,46 @@ STATUS = lambda players: ''.join([PVALUE(p.name, p.bankroll) for p in players])
 # Action history is sent once, including the player's actions
 
 
-class RoundState(namedtuple('_RoundState', ['button', 'street', 'pips', 'stacks', 'hands', 'deck', 'bounties', 'previous_state'])):
+class RoundState():
     '''
     Encodes the game tree for one round of poker.
+
+    A round is one mutable object: proceed updates the button, street, pips and stacks in
+    place and appends the action to a flat log, instead of allocating a new state that
+    points back at the old one. previous_state rebuilds the state before the last action
+    from that log for code that still walks back through the round.
     '''
+    __slots__ = ('button', 'street', 'pips', 'stacks', 'hands', 'deck', 'bounties', 'actions', 'board')
+
+    def __init__(self, button, street, pips, stacks, hands, deck, bounties, actions=None):
+        self.button = button
+        self.street = street
+        self.pips = pips
+        self.stacks = stacks
+        self.hands = hands
+        self.deck = deck
+        self.bounties = bounties
+        self.actions = [] if actions is None else actions
+        # the whole board, dealt or not
+        self.board = deck.peek(5)
+
+    def __repr__(self):
+        return 'RoundState(button={}, street={}, pips={}, stacks={}, actions={})'.format(
+            self.button, self.street, self.pips, self.stacks, self.actions)
+
+    @property
+    def previous_state(self):
+        '''
+        The state before the last action, or None at the start of the round.
+        '''
+        if not self.actions:
+            return None
+        pips = [SMALL_BLIND, BIG_BLIND]
+        stacks = [STARTING_STACK - SMALL_BLIND, STARTING_STACK - BIG_BLIND]
+        round_state = RoundState(0, 0, pips, stacks, self.hands, self.deck, self.bounties)
+        for action in self.actions[:-1]:
+            round_state.proceed(action)
+        return round_state
     def get_bounty_hits(self):
         '''
         Determines if each player hit their bounty card during the round.
@@ -72,25 +121,33 @@ class RoundState(namedtuple('_RoundState', ['button', 'street', 'pips', 'stacks'
                 - First boolean indicates if Player 1's bounty was hit
                 - Second boolean indicates if Player 2's bounty was hit
         '''
-        cards0 = self.hands[0] + ([] if self.street == 0 else self.deck.peek(self.street))
-        cards1 = self.hands[1] + ([] if self.street == 0 else self.deck.peek(self.street))
-        cardNames = ['2', '3', '4', '5', '6', '7', '8', '9', 'T', 'J', 'Q', 'K', 'A']
-        return (self.bounties[0] in [cardNames[card.rank] for card in cards0],
-                self.bounties[1] in [cardNames[card.rank] for card in cards1])
+        street = self.street
+        board = self.board
+        # the flop, turn and river show the first 3, 4 and 5 board cards
+        shown = 0 if street == 0 else board[0].mask | board[1].mask | board[2].mask
+        if street > 3:
+            shown |= board[3].mask
+        if street > 4:
+            shown |= board[4].mask
+        hand0, hand1 = self.hands
+        return (((hand0[0].mask | hand0[1].mask | shown) & RANK_MASKS.get(self.bounties[0], 0)) != 0,
+                ((hand1[0].mask | hand1[1].mask | shown) & RANK_MASKS.get(self.bounties[1], 0)) != 0)
 
-    def get_delta(self, winner_index: int) -> int:
+    def get_delta(self, winner_index: int, bounty_hits=None) -> int:
         '''Returns the delta after bounty rules are applied.
 
         Args:
             winner_index (int): Index of the winning player. Must be 0 (player A),
                 1 (player B), or 2 (split pot).
+            bounty_hits (tuple[bool, bool], optional): get_bounty_hits(), if the caller
+                already has it.
 
         Returns:
             int: The delta value after applying bounty rules.
         '''
         assert winner_index in [0, 1, 2]
 
-        bounty_hit_0, bounty_hit_1 = self.get_bounty_hits()
+        bounty_hit_0, bounty_hit_1 = self.get_bounty_hits() if bounty_hits is None else bounty_hits
 
         delta = 0
         if winner_index == 2:
@@ -139,18 +196,19 @@ class RoundState(namedtuple('_RoundState', ['button', 'street', 'pips', 'stacks'
             This method assumes both players have equal stacks when reaching showdown,
             which is enforced by an assertion.
         '''
-        score0 = eval7.evaluate(self.deck.peek(5) + self.hands[0])
-        score1 = eval7.evaluate(self.deck.peek(5) + self.hands[1])
+        score0 = eval7.evaluate(self.board + self.hands[0])
+        score1 = eval7.evaluate(self.board + self.hands[1])
         assert(self.stacks[0] == self.stacks[1])
+        bounty_hits = self.get_bounty_hits()
         if score0 > score1:
-            delta = self.get_delta(0)
+            delta = self.get_delta(0, bounty_hits)
         elif score0 < score1:
-            delta = self.get_delta(1)
+            delta = self.get_delta(1, bounty_hits)
         else:
             # split the pot
-            delta = self.get_delta(2)
+            delta = self.get_delta(2, bounty_hits)
         
-        return TerminalState([int(delta), -int(delta)], self.get_bounty_hits(), self)
+        return TerminalState([int(delta), -int(delta)], bounty_hits, self)
 
     def legal_actions(self):
         '''
@@ -183,8 +241,10 @@ class RoundState(namedtuple('_RoundState', ['button', 'street', 'pips', 'stacks'
         '''
         if self.street == 5:
             return self.showdown()
-        new_street = 3 if self.street == 0 else self.street + 1
-        return RoundState(1, new_street, [0, 0], self.stacks, self.hands, self.deck, self.bounties, self)
+        self.street = 3 if self.street == 0 else self.street + 1
+        self.button = 1
+        self.pips[0] = self.pips[1] = 0
+        return self
 
     def proceed(self, action):
         '''
@@ -199,7 +259,7 @@ class RoundState(namedtuple('_RoundState', ['button', 'street', 'pips', 'stacks'
 
         Returns:
             Either:
-            - RoundState: The new state after the action is performed
+            - RoundState: This state, updated in place
             - TerminalState: If the action ends the hand (e.g., fold or final call)
 
         Note:
@@ -210,52 +270,275 @@ class RoundState(namedtuple('_RoundState', ['button', 'street', 'pips', 'stacks'
             For RaiseAction, updates pips and stacks based on raise amount.
         '''
         active = self.button % 2
+        pips = self.pips
+        stacks = self.stacks
+        self.actions.append(action)
         if isinstance(action, FoldAction):
-            delta = self.get_delta((1 - active) % 2) # if active folds, the other player (1 - active) wins
-            return TerminalState([delta, -delta], self.get_bounty_hits(), self)
+            bounty_hits = self.get_bounty_hits()
+            delta = self.get_delta((1 - active) % 2, bounty_hits) # if active folds, the other player (1 - active) wins
+            return TerminalState([delta, -delta], bounty_hits, self)
         if isinstance(action, CallAction):
             if self.button == 0:  # sb calls bb
-                return RoundState(1, 0, [BIG_BLIND] * 2, [STARTING_STACK - BIG_BLIND] * 2, self.hands, self.deck, self.bounties, self)
+                self.button = 1
+                pips[0] = pips[1] = BIG_BLIND
+                stacks[0] = stacks[1] = STARTING_STACK - BIG_BLIND
+                return self
             # both players acted
-            new_pips = list(self.pips)
-            new_stacks = list(self.stacks)
-            contribution = new_pips[1-active] - new_pips[active]
-            new_stacks[active] -= contribution
-            new_pips[active] += contribution
-            state = RoundState(self.button + 1, self.street, new_pips, new_stacks, self.hands, self.deck, self.bounties, self)
-            return state.proceed_street()
+            contribution = pips[1-active] - pips[active]
+            stacks[active] -= contribution
+            pips[active] += contribution
+            self.button += 1
+            return self.proceed_street()
         if isinstance(action, CheckAction):
             if (self.street == 0 and self.button > 0) or self.button > 1:  # both players acted
                 return self.proceed_street()
             # let opponent act
-            return RoundState(self.button + 1, self.street, self.pips, self.stacks, self.hands, self.deck, self.bounties, self)
+            self.button += 1
+            return self
         # isinstance(action, RaiseAction)
-        new_pips = list(self.pips)
-        new_stacks = list(self.stacks)
-        contribution = action.amount - new_pips[active]
-        new_stacks[active] -= contribution
-        new_pips[active] += contribution
-        return RoundState(self.button + 1, self.street, new_pips, new_stacks, self.hands, self.deck, self.bounties, self)
+        contribution = action.amount - pips[active]
+        stacks[active] -= contribution
+        pips[active] += contribution
+        self.button += 1
+        return self
+
+
+def normal_quantile(p):
+    '''
+    Inverse of the standard normal CDF, by bisection on math.erf.
+    '''
+    low, high = -10., 10.
+    for _ in range(100):
+        mid = (low + high) / 2
+        if 0.5 * (1 + math.erf(mid / math.sqrt(2))) < p:
+            low = mid
+        else:
+            high = mid
+    return (low + high) / 2
+
+
+class RunningStats():
+    '''
+    Running count, mean and variance of a stream of values (Welford's algorithm).
+    '''
+
+    def __init__(self, count=0, mean=0., m2=0.):
+        self.count = count
+        self.mean = mean
+        self.m2 = m2
+
+    def add(self, value):
+        self.count += 1
+        delta = value - self.mean
+        self.mean += delta / self.count
+        self.m2 += delta * (value - self.mean)
+
+    def merge(self, other):
+        '''
+        Folds another RunningStats into this one (Chan et al.'s parallel update).
+        '''
+        count = self.count + other.count
+        if count == 0:
+            return
+        delta = other.mean - self.mean
+        self.m2 += other.m2 + delta * delta * self.count * other.count / count
+        self.mean += delta * other.count / count
+        self.count = count
+
+    @property
+    def variance(self):
+        return self.m2 / (self.count - 1) if self.count > 1 else 0.
+
+    @property
+    def std_error(self):
+        return math.sqrt(self.variance / self.count) if self.count > 0 else float('inf')
+
+    def to_json(self):
+        return {'count': self.count, 'mean': self.mean, 'm2': self.m2}
+
+
+class LatencyHistogram():
+    '''
+    Counts durations in logarithmic millisecond buckets.
+    '''
+    BOUNDS_MS = [0.1, 0.25, 0.5, 1, 2.5, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000]
+
+    def __init__(self):
+        self.counts = [0] * (len(self.BOUNDS_MS) + 1)
+        self.count = 0
+        self.total_ms = 0.
+        self.max_ms = 0.
+
+    def add(self, seconds):
+        ms = seconds * 1000
+        self.counts[bisect.bisect_left(self.BOUNDS_MS, ms)] += 1
+        self.count += 1
+        self.total_ms += ms
+        self.max_ms = max(self.max_ms, ms)
+
+    def percentile(self, fraction):
+        '''
+        Upper bound of the bucket holding the given fraction of samples, capped at the max.
+        '''
+        rank = fraction * self.count
+        seen = 0
+        for bound, count in zip(self.BOUNDS_MS, self.counts):
+            seen += count
+            if seen >= rank:
+                return min(bound, self.max_ms)
+        return self.max_ms
+
+    def to_json(self):
+        buckets = {'<=' + str(bound): count for bound, count in zip(self.BOUNDS_MS, self.counts) if count}
+        if self.counts[-1]:
+            buckets['>' + str(self.BOUNDS_MS[-1])] = self.counts[-1]
+        return {
+            'count': self.count,
+            'total_ms': round(self.total_ms, 3),
+            'mean_ms': round(self.total_ms / self.count, 3) if self.count else 0.,
+            'p50_ms': round(self.percentile(0.5), 3),
+            'p95_ms': round(self.percentile(0.95), 3),
+            'max_ms': round(self.max_ms, 3),
+            'buckets_ms': buckets
+        }
+
+
+class LatencyStats():
+    '''
+    Latency histograms for one player.
+
+    response holds the bot's thinking time keyed by "<street> <action>", where the action
+    is what the engine ended up using or an outcome such as timeout. write is the time
+    spent writing and flushing the request, and overhead is the rest of each query spent
+    in the engine itself.
+    '''
+    STREET_LABELS = {0: 'preflop', 3: 'flop', 4: 'turn', 5: 'river'}
+
+    def __init__(self):
+        self.response = {}
+        self.write = LatencyHistogram()
+        self.overhead = LatencyHistogram()
+
+    def record(self, round_state, action_name, total_time, write_time, response_time):
+        if isinstance(round_state, RoundState):
+            street = self.STREET_LABELS.get(round_state.street, str(round_state.street))
+        else:
+            street = 'round_over'
+        key = street + ' ' + action_name
+        if key not in self.response:
+            self.response[key] = LatencyHistogram()
+        self.response[key].add(response_time)
+        self.write.add(write_time)
+        self.overhead.add(max(total_time - write_time - response_time, 0.))
+
+    def summary_lines(self, name):
+        line = '  {:<28} {:>6} {:>11.1f} {:>9.3f} {:>9.3f} {:>9.3f}'
+        lines = ['{} latency (ms):   count    total      p50      p95      max'.format(name)]
+        rows = sorted(self.response.items()) + [('write+flush', self.write), ('engine overhead', self.overhead)]
+        for key, histogram in rows:
+            lines.append(line.format(key, histogram.count, histogram.total_ms, histogram.percentile(0.5),
+                                     histogram.percentile(0.95), histogram.max_ms))
+        return lines
+
+    def to_json(self):
+        return {
+            'response': {key: histogram.to_json() for key, histogram in sorted(self.response.items())},
+            'write': self.write.to_json(),
+            'overhead': self.overhead.to_json()
+        }
+
+
+class OutputBuffer():
+    '''
+    Captures a pokerbot's output within a fixed byte budget.
+
+    The first half of the budget keeps the start of the output and the second half is a
+    ring of chunks holding the most recent output. Whatever falls in between is dropped
+    as it arrives and counted in dropped_bytes. Also usable as a text stream for
+    redirect_stdout.
+    '''
+    CHUNK_SIZE = 65536
+
+    def __init__(self, limit):
+        self.head_limit = limit // 2
+        self.tail_limit = limit - self.head_limit
+        self.head = bytearray()
+        self.tail = deque()
+        self.tail_bytes = 0
+        self.total_bytes = 0
+        self.dropped_bytes = 0
+        self.lock = Lock()
+
+    def write(self, data):
+        '''
+        Captures data, which may be bytes or str. None is ignored.
+        '''
+        if data is None:
+            return 0
+        written = len(data)
+        if isinstance(data, str):
+            data = data.encode(errors='replace')
+        with self.lock:
+            self.total_bytes += len(data)
+            room = self.head_limit - len(self.head)
+            if room > 0:
+                self.head += data[:room]
+                data = data[room:]
+            if data:
+                self.tail.append(bytes(data))
+                self.tail_bytes += len(data)
+                while self.tail_bytes > self.tail_limit:
+                    excess = self.tail_bytes - self.tail_limit
+                    oldest = self.tail[0]
+                    if len(oldest) <= excess:
+                        self.tail.popleft()
+                        excess = len(oldest)
+                    else:
+                        self.tail[0] = oldest[excess:]
+                    self.tail_bytes -= excess
+                    self.dropped_bytes += excess
+        return written
+
+    def flush(self):
+        pass
+
+    def getvalue(self):
+        with self.lock:
+            gap = b''
+            if self.dropped_bytes > 0:
+                gap = '\n[... {} bytes dropped ...]\n'.format(self.dropped_bytes).encode()
+            return bytes(self.head) + gap + b''.join(self.tail)
 
 
 class Player():
     '''
     Handles subprocess and socket interactions with one player's pokerbot.
+
+    env, if given, replaces the engine's environment for the bot's build and run commands.
     '''
 
-    def __init__(self, name, path):
+    def __init__(self, name, path, log_dir='.', prebuilt=False, ready_fd=None, env=None):
         self.name = name
         self.path = path
+        self.log_dir = log_dir
+        self.prebuilt = prebuilt
+        self.ready_fd = ready_fd
+        self.env = env
         self.game_clock = STARTING_GAME_CLOCK
         self.bankroll = 0
         self.commands = None
+        self.socket_dir = None
         self.bot_subprocess = None
         self.socketfile = None
-        self.bytes_queue = Queue()
+        self.output = OutputBuffer(PLAYER_LOG_SIZE_LIMIT)
+        self.output_thread = None
+        self.latency = LatencyStats()
+        # [write seconds, response seconds, outcome] of the request in flight
+        self.timing = None
 
     def build(self):
         '''
-        Loads the commands file and builds the pokerbot.
+        Loads the commands file and builds the pokerbot, unless it was prebuilt.
         '''
         if self.path is None:
             return
@@ -272,58 +555,91 @@ class Player():
             print(self.name, 'commands.json not found - check PLAYER_PATH')
         except json.decoder.JSONDecodeError:
             print(self.name, 'commands.json misformatted')
-        if self.commands is not None and len(self.commands['build']) > 0:
+        if self.commands is not None and len(self.commands['build']) > 0 and not self.prebuilt:
             try:
                 proc = subprocess.run(self.commands['build'],
                                       stdout=subprocess.PIPE, stderr=subprocess.STDOUT,
-                                      cwd=self.path, timeout=BUILD_TIMEOUT, check=False)
-                self.bytes_queue.put(proc.stdout)
+                                      cwd=self.path, env=self.env, timeout=BUILD_TIMEOUT, check=False)
+                self.output.write(proc.stdout)
             except subprocess.TimeoutExpired as timeout_expired:
                 error_message = 'Timed out waiting for ' + self.name + ' to build'
                 print(error_message)
-                self.bytes_queue.put(timeout_expired.stdout)
-                self.bytes_queue.put(error_message.encode())
+                self.output.write(timeout_expired.stdout)
+                self.output.write(error_message)
             except (TypeError, ValueError):
                 print(self.name, 'build command misformatted')
             except OSError:
                 print(self.name, 'build failed - check "build" in commands.json')
 
+    def listen(self):
+        '''
+        Opens the socket the player connects to. Returns it with the address to hand the
+        player in place of a port: "unix:<path>" for a Unix domain socket, else the port.
+
+        With BOT_TRANSPORT = 'unix', launchers waiting on the readiness fd and bots whose
+        commands.json has "transport": "unix" get a Unix domain socket in a private
+        directory; everyone else gets TCP.
+        '''
+        if self.path is None:
+            use_unix = self.ready_fd is not None
+        else:
+            use_unix = self.commands.get('transport') == 'unix'
+        if BOT_TRANSPORT == 'unix' and use_unix:
+            self.socket_dir = tempfile.mkdtemp(prefix='pokerbots-')
+            socket_path = os.path.join(self.socket_dir, 'player.sock')
+            server_socket = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            server_socket.bind(socket_path)
+            return server_socket, 'unix:' + socket_path
+        server_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        if self.path is None:
+            server_socket.bind(('localhost', 0 if self.ready_fd is not None else 4514))
+        else:
+            server_socket.bind(('', 0))
+        return server_socket, str(server_socket.getsockname()[1])
+
     def run(self):
         '''
         Runs the pokerbot and establishes the socket connection.
+
+        Does nothing if the caller already attached a connected socketfile.
         '''
+        if self.socketfile is not None:
+            return
         if (self.commands is not None and len(self.commands['run']) > 0) or (self.path is None):
             try:
-                server_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+                server_socket, address = self.listen()
                 with server_socket:
-                    if self.path is None:
-                        server_socket.bind(('localhost', 4514))
-                    else:
-                        server_socket.bind(('', 0))
                     server_socket.settimeout(CONNECT_TIMEOUT)
                     server_socket.listen()
-                    port = server_socket.getsockname()[1]
+                    if self.path is None and self.ready_fd is not None:
+                        # tell whoever launched the engine where to connect
+                        os.write(self.ready_fd, '{} {}\n'.format(self.name, address).encode())
                     if self.path is not None:
-                        proc = subprocess.Popen(self.commands['run'] + [str(port)],
+                        proc = subprocess.Popen(self.commands['run'] + [address],
                                                 stdout=subprocess.PIPE, stderr=subprocess.STDOUT,
-                                                cwd=self.path)
+                                                cwd=self.path, env=self.env)
                         self.bot_subprocess = proc
                         # function for bot listening
-                        def enqueue_output(out, queue):
+                        def capture_output(out, output):
                             try:
-                                for line in out:
-                                    if self.path == r"./player_chatbot":
+                                if self.path == r"./player_chatbot":
+                                    for line in out:
                                         print(line.strip().decode("utf-8"))
-                                    else:
-                                        queue.put(line)
+                                else:
+                                    for chunk in iter(lambda: out.read1(OutputBuffer.CHUNK_SIZE), b''):
+                                        output.write(chunk)
                             except ValueError:
                                 pass
                         # start a separate bot listening thread which dies with the program
-                        Thread(target=enqueue_output, args=(proc.stdout, self.bytes_queue), daemon=True).start()
+                        self.output_thread = Thread(target=capture_output, args=(proc.stdout, self.output), daemon=True)
+                        self.output_thread.start()
                     else:
                         print('No path specified for', self.name)
                     # block until we timeout or the player connects
                     client_socket, _ = server_socket.accept()
+                    if client_socket.family != socket.AF_UNIX:
+                        # every message is a single small write followed by a wait for the reply
+                        client_socket.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
                     with client_socket:
                         if self.path == r"./player_chatbot":
                             client_socket.settimeout(PLAYER_TIMEOUT)
@@ -338,6 +654,18 @@ class Player():
                 print(self.name, 'run failed - check "run" in commands.json')
             except socket.timeout:
                 print('Timed out waiting for', self.name, 'to connect')
+            finally:
+                # a connected Unix domain socket no longer needs its path
+                if self.socket_dir is not None:
+                    shutil.rmtree(self.socket_dir, ignore_errors=True)
+                    self.socket_dir = None
+
+    def set_outcome(self, outcome):
+        '''
+        Labels the current request with outcome instead of the action returned.
+        '''
+        if self.timing is not None:
+            self.timing[2] = outcome
 
     def stop(self):
         '''
@@ -354,26 +682,36 @@ class Player():
         if self.bot_subprocess is not None:
             try:
                 if self.path == r"./player_chatbot":
-                    outs, _ = self.bot_subprocess.communicate(timeout=PLAYER_TIMEOUT)
+                    self.bot_subprocess.wait(timeout=PLAYER_TIMEOUT)
                 else:
-                    outs, _ = self.bot_subprocess.communicate(timeout=CONNECT_TIMEOUT)
-                self.bytes_queue.put(outs)
+                    self.bot_subprocess.wait(timeout=CONNECT_TIMEOUT)
             except subprocess.TimeoutExpired:
                 print('Timed out waiting for', self.name, 'to quit')
                 self.bot_subprocess.kill()
-                outs, _ = self.bot_subprocess.communicate()
-                self.bytes_queue.put(outs)
-        with open(self.name + '.txt', 'wb') as log_file:
-            bytes_written = 0
-            for output in self.bytes_queue.queue:
-                try:
-                    bytes_written += log_file.write(output)
-                    if bytes_written >= PLAYER_LOG_SIZE_LIMIT:
-                        break
-                except TypeError:
-                    pass
+                self.bot_subprocess.wait()
+            if self.output_thread is not None:
+                # the pipe stays open if the bot left children behind, so don't wait forever
+                self.output_thread.join(1)
+        if self.output.dropped_bytes > 0:
+            print('{} printed {} bytes; dropped {} over PLAYER_LOG_SIZE_LIMIT'.format(
+                self.name, self.output.total_bytes, self.output.dropped_bytes))
+        with open(os.path.join(self.log_dir, self.name + '.txt'), 'wb') as log_file:
+            log_file.write(self.output.getvalue())
 
     def query(self, round_state, player_message, game_log):
+        '''
+        Requests one action from the pokerbot and records how long the request took.
+        '''
+        self.timing = None
+        query_start = time.perf_counter()
+        action = self.request_action(round_state, player_message, game_log)
+        if self.timing is not None:
+            write_time, response_time, outcome = self.timing
+            self.latency.record(round_state, outcome or type(action).__name__,
+                                time.perf_counter() - query_start, write_time, response_time)
+        return action
+
+    def request_action(self, round_state, player_message, game_log):
         '''
         Requests one action from the pokerbot over the socket connection.
 
@@ -409,8 +747,11 @@ class Player():
                 start_time = time.perf_counter()
                 self.socketfile.write(message)
                 self.socketfile.flush()
+                flushed_time = time.perf_counter()
+                self.timing = [flushed_time - start_time, 0., None]
                 clause = self.socketfile.readline().strip()
                 end_time = time.perf_counter()
+                self.timing[1] = end_time - flushed_time
                 if ENFORCE_GAME_CLOCK and self.path != r"./player_chatbot":
                     self.game_clock -= end_time - start_time
                 if self.game_clock <= 0.:
@@ -425,29 +766,523 @@ class Player():
                     else:
                         return action()
                 game_log.append(self.name + ' attempted illegal ' + action.__name__)
+                self.set_outcome('illegal')
             except socket.timeout:
                 error_message = self.name + ' ran out of time'
                 game_log.append(error_message)
                 print(error_message)
                 self.game_clock = 0.
+                self.set_outcome('timeout')
             except OSError:
                 error_message = self.name + ' disconnected'
                 game_log.append(error_message)
                 print(error_message)
                 self.game_clock = 0.
+                self.set_outcome('disconnected')
             except (IndexError, KeyError, ValueError):
                 game_log.append(self.name + ' response misformatted: ' + str(clause))
+                self.set_outcome('misformatted')
+        return CheckAction() if CheckAction in legal_actions else FoldAction()
+
+
+class LocalPlayer(Player):
+    '''
+    Runs a Python pokerbot in-process through its Bot interface.
+
+    The bot's player.py is imported directly, so there is no build step, no
+    subprocess and no socket. Game state is handed to the bot as views built
+    from the bot's own skeleton.states classes instead of being encoded as clauses.
+    '''
+
+    def __init__(self, name, path, log_dir='.', prebuilt=False, ready_fd=None, env=None):
+        super().__init__(name, path, log_dir, prebuilt, ready_fd, env)
+        self.pokerbot = None
+        self.states = None
+        self.round_num = 1
+        self.round_flag = True
+        self.active = 1
+        self.hands = None
+        self.bounties = None
+        self.board = (None, [])
+
+    def build(self):
+        '''
+        Imports the pokerbot's player.py and instantiates its Player class.
+        '''
+        if self.path is None:
+            print(self.name, 'headless mode requires a PLAYER_PATH')
+            return
+        # every skeleton bot ships modules named player and skeleton, so isolate each import
+        shadowed = {name: module for name, module in sys.modules.items()
+                    if name == 'player' or name == 'skeleton' or name.startswith('skeleton.')}
+        for name in shadowed:
+            del sys.modules[name]
+        cwd = os.getcwd()
+        sys.path.insert(0, os.path.abspath(self.path))
+        try:
+            os.chdir(self.path)
+            with redirect_stdout(self.output):
+                module = importlib.import_module('player')
+                self.pokerbot = module.Player()
+            self.states = sys.modules['skeleton.states']
+        except Exception as error:  # pylint: disable=broad-except
+            self.pokerbot = None
+            print(self.name, 'failed to load player.py:', repr(error))
+        finally:
+            os.chdir(cwd)
+            sys.path.pop(0)
+            for name in [name for name in sys.modules
+                         if name == 'player' or name == 'skeleton' or name.startswith('skeleton.')]:
+                del sys.modules[name]
+            sys.modules.update(shadowed)
+
+    def run(self):
+        '''
+        In-process bots have nothing to connect to.
+        '''
+
+    def view(self, round_state):
+        '''
+        Returns the pokerbot's view of a RoundState, hiding the opponent's cards.
+        '''
+        street = round_state.street
+        if self.board[0] != street:
+            self.board = (street, [str(card) for card in round_state.board[:street]] if street > 0 else [])
+        return self.states.RoundState(round_state.button, street, list(round_state.pips), list(round_state.stacks),
+                                      self.hands, self.bounties, self.board[1], None)
+
+    def new_round(self, round_state):
+        '''
+        Calls handle_new_round with the view of the round before any action.
+        '''
+        self.hands = [[], []]
+        self.hands[self.active] = [str(card) for card in round_state.hands[self.active]]
+        self.bounties = ['-1', '-1']
+        self.bounties[self.active] = round_state.bounties[self.active]
+        self.board = (None, [])
+        pips = [SMALL_BLIND, BIG_BLIND]
+        stacks = [STARTING_STACK - SMALL_BLIND, STARTING_STACK - BIG_BLIND]
+        initial_state = self.states.RoundState(0, 0, pips, stacks, self.hands, self.bounties, [], None)
+        game_state = self.states.GameState(self.bankroll, self.game_clock, self.round_num)
+        self.pokerbot.handle_new_round(game_state, initial_state, self.active)
+        self.round_flag = False
+
+    def round_over(self, terminal_state, showdown):
+        '''
+        Calls handle_round_over with the same information a socket bot would receive.
+        '''
+        previous_state = self.view(terminal_state.previous_state)
+        if showdown:
+            hands = list(self.hands)
+            hands[1-self.active] = [str(card) for card in terminal_state.previous_state.hands[1-self.active]]
+            previous_state = previous_state._replace(hands=hands)
+        # only the winner's bounty hit is revealed, or both on a chop
+        bounty_hits = list(terminal_state.bounty_hits)
+        if terminal_state.deltas[0] > 0:
+            bounty_hits[1] = False
+        elif terminal_state.deltas[1] > 0:
+            bounty_hits[0] = False
+        bounty_hits = [bounty_hits[self.active], bounty_hits[1-self.active]]
+        delta = terminal_state.deltas[self.active]
+        game_state = self.states.GameState(self.bankroll + delta, self.game_clock, self.round_num)
+        round_over = self.states.TerminalState(list(terminal_state.deltas), bounty_hits, previous_state)
+        self.pokerbot.handle_round_over(game_state, round_over, self.active)
+        self.round_num += 1
+        self.round_flag = True
+        self.active = 1  # the big blind is the only player who may not act in a round
+
+    def request_action(self, round_state, player_message, game_log):
+        '''
+        Requests one action from the in-process pokerbot.
+
+        Mirrors Player.request_action: the bot's thinking time is charged to its game clock,
+        illegal or malformed actions are logged and replaced by a check or fold, and
+        an exception raised by the bot is treated like a disconnection.
+        '''
+        legal_actions = round_state.legal_actions() if isinstance(round_state, RoundState) else {CheckAction}
+        showdown = isinstance(round_state, TerminalState) and any(clause[0] == 'O' for clause in player_message)
+        del player_message[1:]
+        if self.pokerbot is not None and self.game_clock > 0.:
+            action = None
+            try:
+                start_time = time.perf_counter()
+                with redirect_stdout(self.output):
+                    if isinstance(round_state, RoundState):
+                        self.active = round_state.button % 2
+                    if self.round_flag:
+                        self.new_round(round_state if isinstance(round_state, RoundState) else round_state.previous_state)
+                    if isinstance(round_state, TerminalState):
+                        self.round_over(round_state, showdown)
+                    else:
+                        game_state = self.states.GameState(self.bankroll, self.game_clock, self.round_num)
+                        action = self.pokerbot.get_action(game_state, self.view(round_state), self.active)
+                end_time = time.perf_counter()
+                self.timing = [0., end_time - start_time, None]
+                if ENFORCE_GAME_CLOCK:
+                    self.game_clock -= end_time - start_time
+            except Exception as error:  # pylint: disable=broad-except
+                error_message = self.name + ' crashed: ' + repr(error)
+                game_log.append(error_message)
+                print(error_message)
+                self.game_clock = 0.
+                self.timing = [0., time.perf_counter() - start_time, 'crashed']
+                return CheckAction() if CheckAction in legal_actions else FoldAction()
+            if self.game_clock <= 0.:
+                error_message = self.name + ' ran out of time'
+                game_log.append(error_message)
+                print(error_message)
+                self.game_clock = 0.
+                self.set_outcome('timeout')
+            elif action is not None:
+                try:
+                    action_class = ACTION_NAMES[type(action).__name__]
+                    if action_class in legal_actions:
+                        if action_class is RaiseAction:
+                            amount = int(action.amount)
+                            min_raise, max_raise = round_state.raise_bounds()
+                            if min_raise <= amount <= max_raise:
+                                return RaiseAction(amount)
+                        else:
+                            return action_class()
+                    game_log.append(self.name + ' attempted illegal ' + action_class.__name__)
+                    self.set_outcome('illegal')
+                except (KeyError, AttributeError, TypeError, ValueError):
+                    game_log.append(self.name + ' response misformatted: ' + str(action))
+                    self.set_outcome('misformatted')
         return CheckAction() if CheckAction in legal_actions else FoldAction()
 
 
+class GameLog():
+    '''
+    Streams the game log to disk one section (header, round, final) at a time.
+
+    Compressed logs are an ordinary gzip stream made of one member per
+    SECTIONS_PER_MEMBER sections. Each section is sync-flushed, so everything up to the
+    last finished round can be recovered after a crash. An index file records where each
+    section starts: the byte offset of its member and its offset in the member's text.
+    '''
+    SECTIONS_PER_MEMBER = 25
+
+    def __init__(self, base_path, compress):
+        self.compress = compress
+        self.path = base_path + ('.txt.gz' if compress else '.txt')
+        self.log_file = open(self.path, 'wb')
+        self.index_file = open(base_path + '.idx', 'w')
+        self.compressor = None
+        self.member_offset = 0
+        self.text_offset = 0
+        self.member_sections = 0
+
+    def write(self, label, lines):
+        '''
+        Appends lines as the section called label and flushes it to disk.
+        '''
+        data = ('\n'.join(lines) + '\n').encode()
+        if not self.compress:
+            offset = self.log_file.tell()
+            self.log_file.write(data)
+            entry = (label, offset, 0)
+        else:
+            if self.compressor is None:
+                self.compressor = zlib.compressobj(6, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+                self.member_offset = self.log_file.tell()
+                self.text_offset = 0
+                self.member_sections = 0
+            entry = (label, self.member_offset, self.text_offset)
+            self.log_file.write(self.compressor.compress(data) + self.compressor.flush(zlib.Z_SYNC_FLUSH))
+            self.text_offset += len(data)
+            self.member_sections += 1
+            if self.member_sections == self.SECTIONS_PER_MEMBER:
+                self.end_member()
+        self.log_file.flush()
+        self.index_file.write('{} {} {}\n'.format(*entry))
+        self.index_file.flush()
+
+    def end_member(self):
+        if self.compressor is not None:
+            self.log_file.write(self.compressor.flush())
+            self.compressor = None
+
+    def close(self):
+        self.end_member()
+        self.log_file.close()
+        self.index_file.close()
+
+
+def read_game_log(base_path, label):
+    '''
+    Returns one section of a game log written by GameLog, decompressing at most the
+    gzip member that holds it.
+
+    When both gamelog.txt and gamelog.txt.gz are present, the index belongs to the one
+    written last, so that is the one read; on a tie, COMPRESS_GAME_LOG decides.
+    '''
+    with open(base_path + '.idx') as index_file:
+        entries = [line.split() for line in index_file if line.strip()]
+    labels = [entry[0] for entry in entries]
+    if str(label) not in labels:
+        raise KeyError('No section {} in {}'.format(label, base_path + '.idx'))
+    i = labels.index(str(label))
+    offset, text_start = int(entries[i][1]), int(entries[i][2])
+    following = entries[i + 1] if i + 1 < len(entries) else None
+    mtimes = {}
+    for compressed, path in ((False, base_path + '.txt'), (True, base_path + '.txt.gz')):
+        if os.path.exists(path):
+            mtimes[compressed] = os.stat(path).st_mtime_ns
+    compressed = max(mtimes, key=lambda c: (mtimes[c], c == COMPRESS_GAME_LOG)) if mtimes else COMPRESS_GAME_LOG
+    if not compressed:
+        with open(base_path + '.txt', 'rb') as log_file:
+            log_file.seek(offset)
+            data = log_file.read() if following is None else log_file.read(int(following[1]) - offset)
+        return data.decode()
+    # the next section marks the end of this one if it lives in the same member
+    text_end = int(following[2]) if following is not None and int(following[1]) == offset else None
+    decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+    text = b''
+    with open(base_path + '.txt.gz', 'rb') as log_file:
+        log_file.seek(offset)
+        while not decompressor.eof and (text_end is None or len(text) < text_end):
+            chunk = log_file.read(16384)
+            if not chunk:
+                break
+            text += decompressor.decompress(chunk)
+    return text[text_start:text_end].decode()
+
+
+Deal = namedtuple('Deal', ['cards', 'bounties', 'reset', 'replay'])
+
+
+def new_seed():
+    '''
+    Draws a fresh game seed from the operating system, so that forked engines never
+    share one.
+    '''
+    return random.SystemRandom().getrandbits(63)
+
+
+def early_stop_check(round_num):
+    '''
+    Whether the early stopping test runs after round_num: every EARLY_STOP_INTERVAL rounds
+    from EARLY_STOP_MIN_ROUNDS on, before the last round. Duplicate matches are only tested
+    after complete pairs, so a check that falls on an original round moves to its replay.
+    '''
+    def due(check_round):
+        return check_round >= EARLY_STOP_MIN_ROUNDS and (check_round - EARLY_STOP_MIN_ROUNDS) % EARLY_STOP_INTERVAL == 0
+    if round_num >= NUM_ROUNDS:
+        return False
+    if DUPLICATE_DEALS:
+        # replays are the even rounds
+        return round_num % 2 == 0 and (due(round_num) or due(round_num - 1))
+    return due(round_num)
+
+
+def deal_schedule(seed, duplicate_deals=None, rounds_per_bounty=None):
+    '''
+    Yields the Deal of every round of a game played with this seed, in order.
+    duplicate_deals and rounds_per_bounty default to DUPLICATE_DEALS and ROUNDS_PER_BOUNTY.
+
+    Each Deal holds the deck order, the bounties in seat order, whether the bounties were
+    just redrawn and whether the round is a duplicate replay. Only bounty draws and
+    shuffles consume the seeded generator, so the deals never depend on what the bots do.
+    '''
+    if duplicate_deals is None:
+        duplicate_deals = DUPLICATE_DEALS
+    if rounds_per_bounty is None:
+        rounds_per_bounty = ROUNDS_PER_BOUNTY
+    rng = random.Random(seed)
+    bounties = ['-1', '-1']
+    # in duplicate mode, the deal and seat bounties of an original round awaiting replay
+    pending = None
+    reset_bounties = False
+    round_num = 0
+    while True:
+        round_num += 1
+        if round_num % rounds_per_bounty == 1:
+            reset_bounties = True
+        if pending is not None:
+            # a replay keeps its original's bounties, so a reset waits for the next pair
+            cards, seat_bounties = pending
+            pending = None
+            yield Deal(cards, seat_bounties, False, True)
+        else:
+            reset = reset_bounties
+            if reset:
+                reset_bounties = False
+                bounties = [CARD_NAMES[rng.randint(0, 12)], CARD_NAMES[rng.randint(0, 12)]]
+            cards = eval7.Deck().cards
+            rng.shuffle(cards)
+            if duplicate_deals:
+                pending = (cards, list(bounties))
+            yield Deal(cards, list(bounties), reset, False)
+        bounties = bounties[::-1]
+
+
+def new_round_state(cards, bounties):
+    '''
+    Returns the first RoundState of a round dealt from the deck order cards.
+    '''
+    deck = eval7.Deck()
+    deck.cards = list(cards)
+    hands = [deck.deal(2), deck.deal(2)]
+    pips = [SMALL_BLIND, BIG_BLIND]
+    stacks = [STARTING_STACK - SMALL_BLIND, STARTING_STACK - BIG_BLIND]
+    return RoundState(0, 0, pips, stacks, hands, deck, bounties, None)
+
+
+def read_actions(path):
+    '''
+    Reads an action file written by Game.run.
+
+    Returns the game's seed, the deal_schedule keyword arguments it was dealt with and,
+    for every round played, its action codes and the recorded bankroll delta of the first
+    seat. Action files from before the header named the deal settings leave them to the
+    current config.
+    '''
+    with open(path) as action_file:
+        header = action_file.readline().split()
+        fields = dict(zip(header[::2], header[1::2]))
+        seed = int(fields['seed'])
+        schedule = {}
+        if 'duplicate_deals' in fields:
+            schedule['duplicate_deals'] = fields['duplicate_deals'] == '1'
+        if 'rounds_per_bounty' in fields:
+            schedule['rounds_per_bounty'] = int(fields['rounds_per_bounty'])
+        rounds = []
+        for line in action_file:
+            codes = line.split()
+            if codes:
+                rounds.append((codes[:-1], int(codes[-1][1:])))
+    return seed, schedule, rounds
+
+
+def replay_round(cards, bounties, codes):
+    '''
+    Re-plays one round's action codes through RoundState.proceed.
+
+    Returns (delta, error): the first seat's bankroll delta, or None with a description
+    of why the actions no longer make a complete, legal round.
+    '''
+    round_state = new_round_state(cards, bounties)
+    for i, code in enumerate(codes):
+        if isinstance(round_state, TerminalState):
+            return None, 'round ended after {} of {} actions'.format(i, len(codes))
+        action = DECODE[code[0]]
+        if action not in round_state.legal_actions():
+            return None, 'action {} ({}) is illegal'.format(i + 1, code)
+        if action is RaiseAction:
+            min_raise, max_raise = round_state.raise_bounds()
+            amount = int(code[1:])
+            if not min_raise <= amount <= max_raise:
+                return None, 'action {} ({}) is outside [{}, {}]'.format(i + 1, code, min_raise, max_raise)
+            round_state = round_state.proceed(action(amount))
+        else:
+            round_state = round_state.proceed(action())
+    if not isinstance(round_state, TerminalState):
+        return None, 'round is unfinished after {} actions'.format(len(codes))
+    return round_state.deltas[0], None
+
+
+def replay_game(path):
+    '''
+    Re-deals a recorded game from its seed and deal settings and re-plays every round's
+    actions under the current rules, with no bots attached.
+
+    Returns the number of rounds replayed, the first player's replayed bankroll and a
+    list of (round number, recorded delta, replayed delta, error) for every round whose
+    outcome changed.
+    '''
+    seed, schedule, rounds = read_actions(path)
+    bankroll = 0
+    mismatches = []
+    for round_num, ((codes, recorded), deal) in enumerate(zip(rounds, deal_schedule(seed, **schedule)), 1):
+        delta, error = replay_round(deal.cards, deal.bounties, codes)
+        if delta != recorded:
+            mismatches.append((round_num, recorded, delta, error))
+        # the players swap seats every round
+        bankroll += (delta or 0) if round_num % 2 == 1 else -(delta or 0)
+    return len(rounds), bankroll, mismatches
+
+
 class Game():
     '''
     Manages logging and the high-level game procedure.
+
+    self.log only holds the section being played; finished sections go to a GameLog.
     '''
 
-    def __init__(self):
+    def __init__(self, log_dir='.', ready_fd=None, hold=False):
         self.log = ['6.9630 MIT Pokerbots - ' + PLAYER_1_NAME + ' vs ' + PLAYER_2_NAME]
+        # per-round bankroll deltas of the first player, and per duplicate pair
+        self.deltas = RunningStats()
+        self.pair_deltas = RunningStats()
         self.player_messages = [[], []]
+        self.log_dir = log_dir
+        self.ready_fd = ready_fd
+        self.seed = GAME_SEED if GAME_SEED is not None else new_seed()
+        self.round_actions = []
+        self.cancelled = False
+        # set once both players are connected; a held game then waits for release()
+        self.parked = Event()
+        self.released = Event()
+        if not hold:
+            self.released.set()
+
+    def cancel(self):
+        '''
+        Asks a running game to stop at the end of the current round.
+        '''
+        self.cancelled = True
+        self.released.set()
+
+    def release(self):
+        '''
+        Lets a game created with hold=True start its first round.
+        '''
+        self.released.set()
+
+    def settled(self, round_num):
+        '''
+        Sequential test for stopping before NUM_ROUNDS, enabled by EARLY_STOP_CONFIDENCE.
+
+        On the rounds early_stop_check picks, checks whether the first player's mean delta
+        per round (per pair in duplicate mode) is nonzero. The error budget is split evenly
+        over all the checks the match could make, so the winner is right with at least the
+        configured confidence despite the repeated looks.
+        '''
+        if EARLY_STOP_CONFIDENCE is None or not early_stop_check(round_num):
+            return False
+        stats = self.pair_deltas if DUPLICATE_DEALS else self.deltas
+        if stats.count < 2 or stats.variance == 0.:
+            return False
+        checks = sum(early_stop_check(check_round) for check_round in range(1, NUM_ROUNDS))
+        z = stats.mean / stats.std_error
+        if abs(z) < normal_quantile(1 - (1 - EARLY_STOP_CONFIDENCE) / checks / 2):
+            return False
+        self.log.append('')
+        self.log.append('Stopping early after round #{}: {} delta of {:+.3f} per {} (z = {:+.2f})'.format(
+            round_num, PLAYER_1_NAME, stats.mean, 'pair' if DUPLICATE_DEALS else 'round', z))
+        return True
+
+    def log_latency(self, players):
+        '''
+        Adds a latency summary per player to the log and writes the full histograms to a
+        JSON file next to it.
+        '''
+        players = sorted(players, key=lambda player: player.name)
+        for player in players:
+            self.log.append('')
+            self.log.extend(player.latency.summary_lines(player.name))
+        name = os.path.join(self.log_dir, GAME_LOG_FILENAME + '_latency.json')
+        with open(name, 'w') as latency_file:
+            json.dump({player.name: player.latency.to_json() for player in players}, latency_file, indent=2)
+
+    def flush_log(self, game_log, label):
+        '''
+        Writes the current section of the log and starts a new one.
+        '''
+        game_log.write(label, self.log)
+        # players hold a reference to self.log, so empty it in place
+        del self.log[:]
 
     def log_round_state(self, players, round_state):
         '''
@@ -461,7 +1296,7 @@ class Game():
             self.player_messages[0] = ['T0.', 'P0', 'H' + CCARDS(round_state.hands[0]), 'G' + round_state.bounties[0]]
             self.player_messages[1] = ['T0.', 'P1', 'H' + CCARDS(round_state.hands[1]), 'G' + round_state.bounties[1]]
         elif round_state.street > 0 and round_state.button == 1:
-            board = round_state.deck.peek(round_state.street)
+            board = round_state.board[:round_state.street]
             self.log.append(STREET_NAMES[round_state.street - 3] + ' ' + PCARDS(board) +
                             PVALUE(players[0].name, STARTING_STACK-round_state.stacks[0]) +
                             PVALUE(players[1].name, STARTING_STACK-round_state.stacks[1]))
@@ -487,6 +1322,7 @@ class Game():
             phrasing = (' bets ' if bet_override else ' raises to ') + str(action.amount)
             code = 'R' + str(action.amount)
         self.log.append(name + phrasing)
+        self.round_actions.append(code)
         self.player_messages[0].append(code)
         self.player_messages[1].append(code)
 
@@ -523,16 +1359,14 @@ class Game():
         self.player_messages[0].append('Y' + hit_chars[0] + hit_chars[1])
         self.player_messages[1].append('Y' + hit_chars[1] + hit_chars[0])
 
-    def run_round(self, players, bounties):
+    def run_round(self, players, bounties, cards):
         '''
-        Runs one round of poker.
+        Runs one round of poker dealt from the deck order cards.
+
+        Returns the round's action codes followed by the first seat's bankroll delta.
         '''
-        deck = eval7.Deck()
-        deck.shuffle()
-        hands = [deck.deal(2), deck.deal(2)]
-        pips = [SMALL_BLIND, BIG_BLIND]
-        stacks = [STARTING_STACK - SMALL_BLIND, STARTING_STACK - BIG_BLIND]
-        round_state = RoundState(0, 0, pips, stacks, hands, deck, bounties, None)
+        self.round_actions = []
+        round_state = new_round_state(cards, bounties)
         while not isinstance(round_state, TerminalState):
             self.log_round_state(players, round_state)
             active = round_state.button % 2
@@ -545,10 +1379,24 @@ class Game():
         for player, player_message, delta in zip(players, self.player_messages, round_state.deltas):
             player.query(round_state, player_message, self.log)
             player.bankroll += delta
+        return self.round_actions + ['D' + str(round_state.deltas[0])]
 
-    def run(self):
+    def run(self, headless=False, players=None):
         '''
         Runs one game of poker.
+
+        In headless mode both players are Python bots loaded in-process as LocalPlayers.
+        Callers hosting the engine themselves may pass their own pair of players instead.
+        Returns the number of rounds played, the final bankrolls by player name and the
+        first player's per-round and per-duplicate-pair deltas as RunningStats.to_json.
+
+        With DUPLICATE_DEALS every round is followed by a replay of the same deck and
+        seat bounties with the players in each other's seats, so the luck of the deal
+        cancels out of each pair.
+
+        All deals come from deal_schedule(self.seed). The seed, the deal settings and every
+        round's actions are written to an action file next to the game log, from which replay_game can
+        reproduce the game without the bots.
         '''
         print('   __  _____________  ___       __           __        __    ')
         print('  /  |/  /  _/_  __/ / _ \\___  / /_____ ____/ /  ___  / /____')
@@ -556,35 +1404,137 @@ class Game():
         print('/_/  /_/___/ /_/   /_/   \\___/_/\\_\\\\__/_/ /_.__/\\___/\\__/___/')
         print()
         print('Starting the Pokerbots engine...')
-        players = [
-            Player(PLAYER_1_NAME, PLAYER_1_PATH),
-            Player(PLAYER_2_NAME, PLAYER_2_PATH)
-        ]
-        bounties = [-1, -1]
+        if players is None:
+            player_class = LocalPlayer if headless else Player
+            players = [
+                player_class(PLAYER_1_NAME, PLAYER_1_PATH, self.log_dir, PLAYER_1_PREBUILT, self.ready_fd),
+                player_class(PLAYER_2_NAME, PLAYER_2_PATH, self.log_dir, PLAYER_2_PREBUILT, self.ready_fd)
+            ]
         for player in players:
             player.build()
             player.run()
+        if self.ready_fd is not None:
+            os.close(self.ready_fd)
+        self.parked.set()
+        self.released.wait()
+        game_log = GameLog(os.path.join(self.log_dir, GAME_LOG_FILENAME), COMPRESS_GAME_LOG)
+        print('Writing', game_log.path)
+        self.log.append('Seed: {}'.format(self.seed))
+        self.flush_log(game_log, 'header')
+        action_file = open(os.path.join(self.log_dir, GAME_LOG_FILENAME + '_actions.txt'), 'w')
+        # the deals depend on these settings too, so replays use the recorded ones
+        action_file.write('seed {} duplicate_deals {:d} rounds_per_bounty {}\n'.format(
+            self.seed, DUPLICATE_DEALS, ROUNDS_PER_BOUNTY))
+        start_time = time.perf_counter()
+        rounds_played = 0
+        first_player = players[0]
+        deals = deal_schedule(self.seed)
+        pair_bankroll = 0
         for round_num in range(1, NUM_ROUNDS + 1):
+            if self.cancelled:
+                self.log.append('')
+                self.log.append('Game cancelled after round #' + str(rounds_played))
+                break
             self.log.append('')
             self.log.append('Round #' + str(round_num) + STATUS(players))
-            if round_num % ROUNDS_PER_BOUNTY == 1:
-                cardNames = ['2', '3', '4', '5', '6', '7', '8', '9', 'T', 'J', 'Q', 'K', 'A']
-                bounties = [cardNames[random.randint(0, 12)], cardNames[random.randint(0, 12)]]
+            deal = next(deals)
+            bounties = deal.bounties
+            if deal.reset:
                 self.log.append(f"Bounties reset to {bounties[0]} for player {players[0].name} and {bounties[1]} for player {players[1].name}")
-            self.run_round(players, bounties)
+            bankroll = first_player.bankroll
+            if deal.replay:
+                self.log.append('Replaying round #{} with seats swapped'.format(round_num - 1))
+            else:
+                pair_bankroll = bankroll
+            codes = self.run_round(players, bounties, deal.cards)
+            action_file.write(' '.join(codes) + '\n')
+            action_file.flush()
+            if deal.replay:
+                self.pair_deltas.add(first_player.bankroll - pair_bankroll)
+                self.log.append('{} nets {} over the duplicate pair'.format(
+                    first_player.name, first_player.bankroll - pair_bankroll))
+            self.deltas.add(first_player.bankroll - bankroll)
+            rounds_played = round_num
             self.log.append('Winning counts at the end of the round: ' + STATUS(players))
+            # in duplicate mode, only stop after a complete pair
+            settled = (deal.replay or not DUPLICATE_DEALS) and self.settled(round_num)
+            self.flush_log(game_log, round_num)
+            if settled:
+                break
 
             players = players[::-1]
-            bounties = bounties[::-1]
+        action_file.close()
+        elapsed = time.perf_counter() - start_time
+        print('Played {} hands in {:.3f}s ({:.1f} hands/sec)'.format(rounds_played, elapsed, rounds_played / max(elapsed, 1e-9)))
         self.log.append('')
         self.log.append('Final' + STATUS(players))
+        if self.pair_deltas.count > 0:
+            self.log.append('{} nets {:+.2f} per duplicate pair (standard error {:.2f}) over {} pairs'.format(
+                first_player.name, self.pair_deltas.mean, self.pair_deltas.std_error, self.pair_deltas.count))
         for player in players:
             player.stop()
-        name = GAME_LOG_FILENAME + '.txt'
-        print('Writing', name)
-        with open(name, 'w') as log_file:
-            log_file.write('\n'.join(self.log))
+            if player.output.dropped_bytes > 0:
+                self.log.append('{} printed {} bytes; {} were dropped from its log'.format(
+                    player.name, player.output.total_bytes, player.output.dropped_bytes))
+        self.log_latency(players)
+        self.flush_log(game_log, 'final')
+        game_log.close()
+        return {
+            'seed': self.seed,
+            'rounds': rounds_played,
+            'bankrolls': {player.name: player.bankroll for player in players},
+            'deltas': self.deltas.to_json(),
+            'pair_deltas': self.pair_deltas.to_json()
+        }
+
+
+def parse_args():
+    '''
+    Parses command line options for the engine.
+    '''
+    parser = argparse.ArgumentParser(prog='python3 engine.py')
+    parser.add_argument('--headless', action='store_true',
+                        help='Run both Python bots in-process without sockets or subprocesses')
+    parser.add_argument('--show-round', metavar='N', default=None,
+                        help='Print round N (or "header" or "final") of the game log in the '
+                             'current directory and exit')
+    parser.add_argument('--ready-fd', type=int, default=None,
+                        help='Listen on an ephemeral port for players without a path and write '
+                             '"<name> <port>" to this file descriptor once each one is listening')
+    parser.add_argument('--replay', metavar='ACTION_FILE', nargs='*', default=None,
+                        help='Re-play recorded games (default: the one in the current directory) '
+                             'under the current config without bots and report changed rounds')
+    return parser.parse_args()
+
+
+def replay_games(paths):
+    '''
+    Replays every action file in paths and prints what changed. Returns the number of
+    games whose outcome changed.
+    '''
+    start_time = time.perf_counter()
+    changed = 0
+    total_rounds = 0
+    for path in paths:
+        rounds, bankroll, mismatches = replay_game(path)
+        total_rounds += rounds
+        if mismatches:
+            changed += 1
+        print('{}: {} rounds, {} ends at {}, {} rounds changed'.format(
+            path, rounds, PLAYER_1_NAME, bankroll, len(mismatches)))
+        for round_num, recorded, delta, error in mismatches:
+            print('  round #{}: recorded {}, replayed {}'.format(
+                round_num, recorded, error if error is not None else delta))
+    elapsed = time.perf_counter() - start_time
+    print('Replayed {} games ({} rounds) in {:.3f}s'.format(len(paths), total_rounds, elapsed))
+    return changed
 
 
 if __name__ == '__main__':
-    Game().run()
+    args = parse_args()
+    if args.show_round is not None:
+        print(read_game_log(GAME_LOG_FILENAME, args.show_round), end='')
+    elif args.replay is not None:
+        sys.exit(1 if replay_games(args.replay or [GAME_LOG_FILENAME + '_actions.txt']) else 0)
+    else:
+        Game(ready_fd=args.ready_fd).run(headless=args.headless)
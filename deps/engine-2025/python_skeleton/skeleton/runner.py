@@ -122,17 +122,34 @@ def parse_args():
     '''
     parser = argparse.ArgumentParser(prog='python3 player.py')
     parser.add_argument('--host', type=str, default='localhost', help='Host to connect to, defaults to localhost')
-    parser.add_argument('port', type=int, help='Port on host to connect to')
+    parser.add_argument('port', type=str, help='Port on host to connect to, or unix:<path> for a Unix domain socket')
     return parser.parse_args()
 
+def connect(host, port):
+    '''
+    Connects to the engine, over a Unix domain socket if port is "unix:<path>".
+    '''
+    if port.startswith('unix:'):
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            sock.connect(port[len('unix:'):])
+        except OSError:
+            sock.close()
+            raise
+        return sock
+    sock = socket.create_connection((host, int(port)))
+    # each action is one short line, sent as soon as it is decided
+    sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+    return sock
+
 def run_bot(pokerbot, args):
     '''
     Runs the pokerbot.
     '''
     assert isinstance(pokerbot, Bot)
     try:
-        sock = socket.create_connection((args.host, args.port))
-    except OSError:
+        sock = connect(args.host, args.port)
+    except (OSError, ValueError):
         print('Could not connect to {}:{}'.format(args.host, args.port))
         return
     socketfile = sock.makefile('rw')
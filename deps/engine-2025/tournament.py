@@ -0,0 +1,318 @@
+'''
+Round-robin tournaments for the MIT Pokerbots engine.
+
+Every pair of bots plays MATCHES_PER_PAIR matches, alternating seats, on a pool of
+worker processes. Each match gets its own directory for the game log and the bots' logs,
+and bots listen on ephemeral ports, so matches never collide.
+'''
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from contextlib import redirect_stdout
+import argparse
+import importlib.util
+import itertools
+import json
+import os
+import re
+import subprocess
+import sys
+import tempfile
+import types
+
+ENGINE_DIR = os.path.dirname(os.path.abspath(__file__))
+ENGINE_PATH = os.path.join(ENGINE_DIR, 'engine.py')
+SEAT_NAMES = ['A', 'B']
+
+
+def load_engine(config_source):
+    '''
+    Imports engine.py as a fresh module, with config_source as its config.py.
+    '''
+    config = types.ModuleType('config')
+    exec(config_source, config.__dict__)
+    saved_config = sys.modules.get('config')
+    sys.modules['config'] = config
+    try:
+        spec = importlib.util.spec_from_file_location('pokerbots_engine', ENGINE_PATH)
+        engine = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(engine)
+    finally:
+        if saved_config is None:
+            del sys.modules['config']
+        else:
+            sys.modules['config'] = saved_config
+    return engine
+
+
+def build_bot(path, timeout):
+    '''
+    Runs a bot's build command once, so that its matches can skip it.
+
+    Returns None on success, or an error message.
+    '''
+    try:
+        with open(os.path.join(path, 'commands.json')) as json_file:
+            build_command = json.load(json_file)['build']
+    except (OSError, ValueError, KeyError):
+        return 'commands.json is missing or misformatted'
+    if not build_command:
+        return None
+    try:
+        proc = subprocess.run(build_command, cwd=path, stdout=subprocess.PIPE,
+                              stderr=subprocess.STDOUT, timeout=timeout, check=False)
+    except subprocess.TimeoutExpired:
+        return 'build timed out'
+    except (OSError, TypeError, ValueError) as error:
+        return 'build failed: {}'.format(error)
+    if proc.returncode != 0:
+        return 'build exited with code {}'.format(proc.returncode)
+    return None
+
+
+def engine_config(config_source, duplicate=False, early_stop=None):
+    '''
+    Adds the tournament-wide overrides to config_source.
+    '''
+    overrides = [config_source]
+    if duplicate:
+        overrides.append('DUPLICATE_DEALS = True')
+    if early_stop is not None:
+        overrides.append('EARLY_STOP_CONFIDENCE = {!r}'.format(early_stop))
+    return '\n'.join(overrides) + '\n'
+
+
+_worker_engine = None
+
+
+def init_worker(config_source):
+    '''
+    Pool worker initializer: loads the engine once for all of the worker's matches.
+    '''
+    global _worker_engine  # pylint: disable=global-statement
+    _worker_engine = load_engine(config_source)
+
+
+def play_match(paths, match_dir, headless=False):
+    '''
+    Plays one match between the bots at paths and returns Game.run's result.
+
+    Meant to run in a pool worker set up by init_worker: only the player settings change
+    between matches, and all of the engine's output goes to engine.txt in match_dir.
+    '''
+    engine = _worker_engine
+    for seat, (name, path) in enumerate(zip(SEAT_NAMES, paths), 1):
+        setattr(engine, 'PLAYER_{}_NAME'.format(seat), name)
+        setattr(engine, 'PLAYER_{}_PATH'.format(seat), path)
+        setattr(engine, 'PLAYER_{}_PREBUILT'.format(seat), True)
+    with open(os.path.join(match_dir, 'engine.txt'), 'w') as output, redirect_stdout(output):
+        return engine.Game(log_dir=match_dir).run(headless=headless)
+
+
+def available_cpus():
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 1
+
+
+def schedule(names, matches_per_pair):
+    '''
+    Lists every (first seat, second seat) match, alternating seats between repeats.
+    '''
+    matches = []
+    for first, second in itertools.combinations(names, 2):
+        for repeat in range(matches_per_pair):
+            matches.append((first, second) if repeat % 2 == 0 else (second, first))
+    return matches
+
+
+class Standing():
+    '''
+    One bot's aggregate results, including its per-hand bankroll deltas.
+    '''
+
+    def __init__(self, name, running_stats):
+        self.name = name
+        self.matches = 0
+        self.wins = 0
+        self.draws = 0
+        self.losses = 0
+        self.bankroll = 0
+        self.hands = running_stats()
+        self.pairs = running_stats()
+        self.errors = 0
+
+    def per_hand_stats(self):
+        '''
+        Returns the statistic the standing is reported and ranked by, and the hands per sample.
+        '''
+        # duplicate pairs cancel the luck of the deal, so they give much tighter intervals
+        return (self.pairs, 2) if self.pairs.count > 1 else (self.hands, 1)
+
+    def per_hand(self):
+        stats, hands_per_sample = self.per_hand_stats()
+        return stats.mean / hands_per_sample
+
+    def add(self, bankroll, opponent_bankroll, hands, pairs):
+        self.matches += 1
+        self.bankroll += bankroll
+        if bankroll > opponent_bankroll:
+            self.wins += 1
+        elif bankroll < opponent_bankroll:
+            self.losses += 1
+        else:
+            self.draws += 1
+        self.hands.merge(hands)
+        self.pairs.merge(pairs)
+
+    def to_json(self, z):
+        stats, hands_per_sample = self.per_hand_stats()
+        per_hand = stats.mean / hands_per_sample
+        half_width = z * stats.std_error / hands_per_sample if stats.count > 1 else None
+        return {
+            'name': self.name,
+            'matches': self.matches,
+            'wins': self.wins,
+            'draws': self.draws,
+            'losses': self.losses,
+            'errors': self.errors,
+            'bankroll': self.bankroll,
+            'hands': self.hands.count,
+            'duplicate_pairs': self.pairs.count,
+            'per_hand': per_hand,
+            'ci_low': per_hand - half_width if half_width is not None else None,
+            'ci_high': per_hand + half_width if half_width is not None else None
+        }
+
+
+def run_tournament(bots, config_source, jobs=None, matches_per_pair=2, headless=False,
+                   output_dir=None, confidence=0.95, duplicate=False, early_stop=None):
+    '''
+    Plays a round robin between bots, a dict of name to bot directory.
+
+    Returns (standings, matches): standings sorted by mean bankroll delta per hand (per
+    duplicate pair in duplicate mode, halved), with
+    a normal-approximation confidence interval over all hands the bot played (over all
+    duplicate pairs in duplicate mode), and the result of every match.
+    '''
+    config_source = engine_config(config_source, duplicate, early_stop)
+    engine = load_engine(config_source)
+    z = engine.normal_quantile(0.5 + confidence / 2)
+    output_dir = output_dir or tempfile.mkdtemp(prefix='tournament-')
+    os.makedirs(output_dir, exist_ok=True)
+    standings = {name: Standing(name, engine.RunningStats) for name in bots}
+
+    for name, path in bots.items():
+        if not headless:
+            error = build_bot(path, engine.BUILD_TIMEOUT)
+            if error is not None:
+                print('{}: {}'.format(name, error))
+
+    matches = []
+    with ProcessPoolExecutor(max_workers=jobs or available_cpus(), initializer=init_worker,
+                             initargs=(config_source,)) as executor:
+        futures = {}
+        for i, (first, second) in enumerate(schedule(list(bots), matches_per_pair)):
+            match_dir = os.path.join(output_dir, re.sub(r'[^\w.-]', '_', '{:03d}-{}-vs-{}'.format(i, first, second)))
+            os.makedirs(match_dir)
+            future = executor.submit(play_match, [bots[first], bots[second]], match_dir, headless)
+            futures[future] = (first, second, match_dir)
+        for future in as_completed(futures):
+            first, second, match_dir = futures[future]
+            match = {'players': [first, second], 'log_dir': match_dir}
+            try:
+                result = future.result()
+            except Exception as error:  # pylint: disable=broad-except
+                match['error'] = repr(error)
+                standings[first].errors += 1
+                standings[second].errors += 1
+                print('{} vs {}: failed with {!r}'.format(first, second, error))
+            else:
+                bankrolls = [result['bankrolls'][seat] for seat in SEAT_NAMES]
+                deltas, pair_deltas = result['deltas'], result['pair_deltas']
+                standings[first].add(bankrolls[0], bankrolls[1], engine.RunningStats(**deltas),
+                                     engine.RunningStats(**pair_deltas))
+                standings[second].add(bankrolls[1], bankrolls[0],
+                                      engine.RunningStats(deltas['count'], -deltas['mean'], deltas['m2']),
+                                      engine.RunningStats(pair_deltas['count'], -pair_deltas['mean'], pair_deltas['m2']))
+                match.update(seed=result['seed'], rounds=result['rounds'], bankrolls=bankrolls)
+                print('{} vs {}: {:+d} after {} rounds'.format(first, second, bankrolls[0], result['rounds']))
+            matches.append(match)
+
+    ranked = sorted(standings.values(), key=Standing.per_hand, reverse=True)
+    return [standing.to_json(z) for standing in ranked], matches
+
+
+def format_standings(standings, confidence=0.95):
+    '''
+    Renders standings as a text table.
+    '''
+    width = max([len(standing['name']) for standing in standings] + [3])
+    lines = ['{:<{w}}  {:>7}  {:>11}  {:>9}  {:>6}  {:>8}  {:>19}'.format(
+        'Bot', 'Matches', 'W-D-L', 'Bankroll', 'Hands', 'Per hand', '{:.0%} CI'.format(confidence), w=width)]
+    for standing in standings:
+        if standing['ci_low'] is None:
+            interval = 'n/a'
+        else:
+            interval = '[{:+.3f}, {:+.3f}]'.format(standing['ci_low'], standing['ci_high'])
+        lines.append('{:<{w}}  {:>7}  {:>11}  {:>+9d}  {:>6}  {:>+8.3f}  {:>19}'.format(
+            standing['name'], standing['matches'],
+            '{}-{}-{}'.format(standing['wins'], standing['draws'], standing['losses']),
+            standing['bankroll'], standing['hands'], standing['per_hand'], interval, w=width))
+    return '\n'.join(lines)
+
+
+def bot_names(paths):
+    '''
+    Names bots after their directories, numbering duplicates.
+    '''
+    bots = {}
+    for path in paths:
+        name = os.path.basename(os.path.normpath(path))
+        unique_name, n = name, 2
+        while unique_name in bots:
+            unique_name, n = '{}-{}'.format(name, n), n + 1
+        bots[unique_name] = os.path.abspath(path)
+    return bots
+
+
+def parse_args():
+    '''
+    Parses command line options for the tournament runner.
+    '''
+    parser = argparse.ArgumentParser(prog='python3 tournament.py')
+    parser.add_argument('bots', nargs='+', help='Bot directories, each holding a commands.json')
+    parser.add_argument('--jobs', type=int, default=None,
+                        help='Matches to play at once (default: one per available CPU)')
+    parser.add_argument('--matches-per-pair', type=int, default=2,
+                        help='Matches between every pair of bots, alternating seats')
+    parser.add_argument('--config', default=os.path.join(ENGINE_DIR, 'config.py'),
+                        help='Engine config to play with; player names and paths are overridden')
+    parser.add_argument('--headless', action='store_true',
+                        help='Run Python bots in-process (see engine.py --headless)')
+    parser.add_argument('--duplicate', action='store_true',
+                        help='Replay every deal with seats swapped (DUPLICATE_DEALS)')
+    parser.add_argument('--early-stop', type=float, default=None, metavar='CONFIDENCE',
+                        help='End each match once its winner is settled at this confidence (EARLY_STOP_CONFIDENCE)')
+    parser.add_argument('--output-dir', default=None,
+                        help='Directory for per-match logs (default: a new temporary directory)')
+    parser.add_argument('--json', default=None, help='Also write standings and match results here')
+    parser.add_argument('--confidence', type=float, default=0.95,
+                        help='Confidence level of the per-hand intervals')
+    return parser.parse_args()
+
+
+if __name__ == '__main__':
+    args = parse_args()
+    with open(args.config) as config_file:
+        source = config_file.read()
+    output_dir = args.output_dir or tempfile.mkdtemp(prefix='tournament-')
+    standings, matches = run_tournament(bot_names(args.bots), source, args.jobs, args.matches_per_pair,
+                                        args.headless, output_dir, args.confidence, args.duplicate,
+                                        args.early_stop)
+    print()
+    print(format_standings(standings, args.confidence))
+    print()
+    print('Match logs are in', output_dir)
+    if args.json is not None:
+        with open(args.json, 'w') as json_file:
+            json.dump({'standings': standings, 'matches': matches}, json_file, indent=2)
@@ -0,0 +1,110 @@
+'''
+Engine zygote: imports the engine, eval7 and a base config once, then forks a child
+per game.
+
+A cold `python engine.py` spends most of its start-up importing the interpreter's
+modules, eval7 and the engine itself. The zygote pays for that once; each game then
+costs a fork(). It serves requests on a listening AF_UNIX socket passed in by file
+descriptor, so the parent can connect before the zygote is even running:
+
+    python3 zygote.py --listen-fd FD [--config config.py]
+
+A request is one JSON line, {"game_dir": ..., "config": <config.py source>}. The forked
+child applies the config on top of the base one, moves into game_dir and replies on the
+same connection with "pid <pid>", then the engine's --ready-fd lines ("<name> <port>")
+and finally "exit <code>" just before it exits. The connection stays open until the
+game is over, so the parent sees EOF when the child is gone. The child leads its own
+process group, so killing the group also stops its bots.
+
+The zygote exits when its stdin is closed, i.e. when the process that started it is gone.
+'''
+import argparse
+import json
+import os
+import random
+import select
+import signal
+import socket
+import sys
+import traceback
+import types
+
+from tournament import load_engine, ENGINE_DIR
+
+
+def apply_config(engine, config_source):
+    '''
+    Replaces the engine's config values with the ones set by config_source.
+    '''
+    config = types.ModuleType('config')
+    exec(config_source, config.__dict__)
+    engine.__dict__.update({name: value for name, value in config.__dict__.items() if name.isupper()})
+
+
+def serve_game(engine, listener, connection):
+    '''
+    Runs in the forked child: plays one game, reporting on connection. Never returns.
+    '''
+    code = 1
+    try:
+        listener.close()
+        signal.signal(signal.SIGCHLD, signal.SIG_DFL)
+        os.setpgid(0, 0)
+        # forked children would otherwise share the zygote's random state
+        random.seed()
+        request = json.loads(connection.makefile('r').readline())
+        apply_config(engine, request['config'])
+        os.chdir(request['game_dir'])
+        connection.sendall('pid {}\n'.format(os.getpid()).encode())
+        # the engine closes its readiness fd once the players are up; the connection
+        # itself stays open until this process exits
+        engine.Game(ready_fd=os.dup(connection.fileno())).run()
+        code = 0
+    except BaseException:  # pylint: disable=broad-except
+        traceback.print_exc()
+    finally:
+        try:
+            connection.sendall('exit {}\n'.format(code).encode())
+        except OSError:
+            pass
+        sys.stdout.flush()
+        sys.stderr.flush()
+        os._exit(code)
+
+
+def serve(engine, listener):
+    '''
+    Forks a child for every connection until stdin is closed.
+    '''
+    # children are reaped automatically; serve_game restores the default for the engine
+    signal.signal(signal.SIGCHLD, signal.SIG_IGN)
+    while True:
+        readable, _, _ = select.select([listener, sys.stdin], [], [])
+        if sys.stdin in readable and not os.read(sys.stdin.fileno(), 4096):
+            return
+        if listener in readable:
+            connection, _ = listener.accept()
+            sys.stdout.flush()
+            sys.stderr.flush()
+            if os.fork() == 0:
+                serve_game(engine, listener, connection)
+            connection.close()
+
+
+def parse_args():
+    '''
+    Parses command line options for the zygote.
+    '''
+    parser = argparse.ArgumentParser(prog='python3 zygote.py')
+    parser.add_argument('--listen-fd', type=int, required=True,
+                        help='File descriptor of a listening AF_UNIX socket to serve requests on')
+    parser.add_argument('--config', default=os.path.join(ENGINE_DIR, 'config.py'),
+                        help='Base config to import the engine with; every request overrides it')
+    return parser.parse_args()
+
+
+if __name__ == '__main__':
+    args = parse_args()
+    with open(args.config) as config_file:
+        zygote_engine = load_engine(config_file.read())
+    serve(zygote_engine, socket.socket(fileno=args.listen_fd))
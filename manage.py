@@ -1,6 +1,9 @@
 from flask_migrate import MigrateCommand
 from flask_script import Manager
 from server import app, db, socketio
+from server.models import Bot
+from server.tasks import load_tournament, run_tournament
+import json
 import ssl
 
 manager = Manager(app)
@@ -16,5 +19,19 @@ def runserver():
         context.load_cert_chain('cert.crt', 'cert.key')
         socketio.run(app, host='0.0.0.0', port=5001, ssl_context=context)
 
+@manager.option('-b', '--bot', dest='bot_ids', type=int, action='append', help='Bot id to enter (default: every bot)')
+@manager.option('-j', '--jobs', dest='jobs', type=int, default=None, help='Matches to play at once (default: one per CPU)')
+@manager.option('-m', '--matches-per-pair', dest='matches_per_pair', type=int, default=2)
+@manager.option('-d', '--output-dir', dest='output_dir', default=None, help='Directory for per-match logs')
+@manager.option('-o', '--output', dest='output', default=None, help='Write standings and match results as JSON')
+def tournament(bot_ids=None, jobs=None, matches_per_pair=2, output_dir=None, output=None):
+    """Plays a round robin between bots in the database."""
+    bots = Bot.query.filter(Bot.id.in_(bot_ids)).all() if bot_ids else Bot.query.all()
+    standings, matches = run_tournament(bots, jobs, matches_per_pair, output_dir)
+    print(load_tournament().format_standings(standings))
+    if output is not None:
+        with open(output, 'w') as output_file:
+            json.dump({'standings': standings, 'matches': matches}, output_file, indent=2)
+
 if __name__ == "__main__":
     manager.run()
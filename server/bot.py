@@ -4,6 +4,8 @@ import socket
 import time
 import random
 import json
+import queue
+import threading
 
 def pot_to_json(pot):
     return {
@@ -19,22 +21,22 @@ def pot_to_json(pot):
         'grand_total': pot.grand_total
     }
 
+def move_to_json(move):
+    data = move.split(':')
+    d = {
+        'type': data[0],
+        'player': 'table' if data[0] == 'DEAL' else ('hero' if data[-1] == 'A' else 'bot')
+    }
+    if data[0] in ['POST', 'BET', 'RAISE']:
+        d['amount'] = int(data[1])
+    elif data[0] == 'SHOW':
+        d['cards'] = data[1:3]
+    elif data[0] == 'DEAL':
+        d['street'] = data[1]
+    return d
+
 def move_history_to_json(move_history):
-    history = []
-    for move in move_history:
-        data = move.split(':')
-        d = {
-            'type': data[0],
-            'player': 'table' if data[0] == 'DEAL' else ('hero' if data[-1] == 'A' else 'bot')
-        }
-        if data[0] in ['POST', 'BET', 'RAISE']:
-            d['amount'] = int(data[1])
-        elif data[0] == 'SHOW':
-            d['cards'] = data[1:3]
-        elif data[0] == 'DEAL':
-            d['street'] = data[1]
-        history.append(d)
-    return history
+    return [move_to_json(move) for move in move_history]
 
 def legal_moves_to_json(legal_moves, min_amount, max_amount, continue_cost):
     moves = []
@@ -53,20 +55,128 @@ def legal_moves_to_json(legal_moves, min_amount, max_amount, continue_cost):
         moves.append(d)
     return sorted(moves, key=lambda m: ('min' in m, m['type']))
 
+def percentile(samples, fraction):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+class HeroChannel():
+    '''
+    Consumes a game's pubsub channel on a background thread.
+
+    Subscribe confirmations are dropped, so the engine thread blocks on a queue and wakes
+    only for hero events and keep-alive pings. The pubsub connection is not thread-safe,
+    so only the listener thread touches it, unsubscribing and closing it itself once
+    close() asks it to stop.
+    '''
+    PING = object()
+    CLOSED = object()
+    # how often the listener checks whether it should stop, in seconds
+    POLL_INTERVAL = 0.5
+
+    def __init__(self, pubsub):
+        self.pubsub = pubsub
+        self.events = queue.Queue()
+        self.stopping = threading.Event()
+        self.thread = threading.Thread(target=self._listen, daemon=True)
+        self.thread.start()
+
+    def _listen(self):
+        try:
+            while not self.stopping.is_set():
+                message = self.pubsub.get_message(timeout=self.POLL_INTERVAL)
+                if message is None or message['type'] != 'message':
+                    continue
+                if message['data'] == b'ping':
+                    self.events.put(self.PING)
+                else:
+                    self.events.put((message['data'].decode('utf-8'), time.time()))
+            self.pubsub.unsubscribe()
+        except Exception as e:
+            print('Game channel closed: {}'.format(e))
+        finally:
+            self.pubsub.close()
+            # wakes a waiting engine thread, which treats a closed channel like a timeout
+            self.events.put(self.CLOSED)
+
+    def get(self, timeout):
+        '''
+        Returns (data, received_at) for the next hero event, or None once the hero has sent
+        nothing, not even a ping, for timeout seconds since the call or the last ping.
+        '''
+        deadline = time.monotonic() + timeout
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return None
+            try:
+                event = self.events.get(timeout=remaining)
+            except queue.Empty:
+                return None
+            if event is self.CLOSED:
+                # left for any later call, which must not wait either
+                self.events.put(event)
+                return None
+            if event is self.PING:
+                deadline = time.monotonic() + timeout
+                continue
+            return event
+
+    def close(self):
+        self.stopping.set()
+        self.thread.join(2 * self.POLL_INTERVAL + 1)
+
 class Player(Bot):
-    def __init__(self, db_game, pubsub):
+    def __init__(self, db_game, pubsub, timeline=None):
         self.db_game = db_game
+        # the game's StartupTimeline, marked when the first hand is dealt
+        self.timeline = timeline
         self.sock = None
         self.done = False
         self.bankroll = 0
         self.opponent_bankroll = 0
-        self.pubsub = pubsub
+        self.channel = HeroChannel(pubsub)
         self.past_moves = []
+        self.move_history = []
         self.current_street = 0
+        # (published -> received, received -> engine thread, published -> returned to engine) per
+        # action; the first and last span the web host's and this worker's clocks
+        self.action_latencies = []
 
     def set_sock(self, sock):
         self.sock = sock
 
+    def close(self):
+        self.channel.close()
+
+    def latency_summary(self):
+        '''
+        Click-to-engine latency in milliseconds, from the web server publishing an action
+        to get_action handing it back to the engine.
+
+        published_at is stamped by the web host, so the cross-host spans also hold the
+        difference between its clock and this worker's, and can be skewed or negative.
+        Only the handoff, from the listener thread to the engine thread, is timed on one clock.
+        '''
+        if not self.action_latencies:
+            return None
+        summary = {'actions': len(self.action_latencies)}
+        for i, name in enumerate(['redis_cross_host', 'handoff', 'total_cross_host']):
+            samples = [latency[i] * 1000 for latency in self.action_latencies]
+            summary[name] = {
+                'p50': round(percentile(samples, 0.5), 2),
+                'p95': round(percentile(samples, 0.95), 2),
+                'max': round(max(samples), 2)
+            }
+        return summary
+
+    def move_history_json(self):
+        '''
+        Converts only the moves made since the last call, so each update costs the same
+        however long the hand gets. Returns a copy, since sent messages are diffed later.
+        '''
+        self.move_history.extend(move_history_to_json(self.past_moves[len(self.move_history):]))
+        return list(self.move_history)
+
     def force_shutdown(self):
         self.done = True
         self.sock.shutdown(socket.SHUT_RDWR)
@@ -96,9 +206,12 @@ class Player(Bot):
         Returns:
         Nothing.
         '''
+        if game_state.round_num == 1 and self.timeline is not None:
+            self.timeline.mark('first_hand')
         self.bankroll = game_state.bankroll
         self.opponent_bankroll = -1 * game_state.bankroll
         self.past_moves = []
+        self.move_history = []
         self.current_street = 0
 
         if game_state.round_num > 100:
@@ -177,17 +290,17 @@ class Player(Bot):
             'opponent_cards': opp_cards if opp_cards else ['??', '??'],
             'board_cards': board_cards,
             'result': ('win' if my_delta > 0 else ('loss' if my_delta < 0 else 'tie')),
-            'move_history': move_history_to_json(self.past_moves)
+            'move_history': self.move_history_json()
         })
 
         while True:
-            message = self.pubsub.get_message(timeout=30)
-            if message is None:
+            event = self.channel.get(timeout=30)
+            if event is None:
                 break
-            if message['data'].decode("utf-8") == 'quit_game':
+            if event[0] == 'quit_game':
                 self.force_shutdown()
                 break
-            if (message['data'].decode("utf-8") == 'next_hand'):
+            if event[0] == 'next_hand':
                 break
 
     def get_action(self, game_state, round_state, active):
@@ -271,32 +384,35 @@ class Player(Bot):
             'cards': round_state.hands[active],
             'opponent_cards': ['??', '??'],
             'board_cards': board_cards,
-            'move_history': move_history_to_json(self.past_moves),
+            'move_history': self.move_history_json(),
             'legal_moves': legal_moves_to_json(legal_actions, min_raise, max_raise, continue_cost)
-        })
+        }, persist=False)
 
         while True:
-            message = self.pubsub.get_message(timeout=30)
-            if message is None:
-                # None message, therefore timeout
+            event = self.channel.get(timeout=30)
+            if event is None:
+                # the hero went quiet, or the channel closed
                 self.force_shutdown()
                 return FoldAction()
 
-            if message.get('type') == 'subscribe':
-                continue
-
-            if (message['data'].decode("utf-8") == 'quit_game'):
+            message, received_at = event
+            if message == 'quit_game':
                 self.force_shutdown()
                 return FoldAction()
 
-            if message['data'].decode("utf-8") == 'ping':
-                continue
-
             try:
-                data = json.loads(message['data'])
+                data = json.loads(message)
             except:
                 return FoldAction()
 
+            if isinstance(data, dict) and 'published_at' in data:
+                now = time.time()
+                self.action_latencies.append((
+                    received_at - data['published_at'],
+                    now - received_at,
+                    now - data['published_at']
+                ))
+
             if data['type'] == 'FOLD':
                 self.past_moves.append('FOLD:A')
                 return FoldAction()
@@ -0,0 +1,121 @@
+import os
+import tarfile
+import tempfile
+import zipfile
+import zlib
+
+# pax header naming the directory that holds commands.json in a prebuilt bot archive
+BOT_DIR_HEADER = 'pokerbots.bot_dir'
+
+
+class BotArchiveError(Exception):
+  pass
+
+
+def spool(stream, max_bytes, spool_bytes, chunk_size=1024 ** 2):
+  """
+  Copies a file-like stream (an S3 body or an open file) into a temporary file that is
+  kept in memory until it grows past spool_bytes. Raises BotArchiveError as soon as more
+  than max_bytes have arrived, without reading the rest.
+  """
+  archive = tempfile.SpooledTemporaryFile(max_size=spool_bytes)
+  size = 0
+  try:
+    while True:
+      chunk = stream.read(chunk_size)
+      if not chunk:
+        break
+      size += len(chunk)
+      if size > max_bytes:
+        raise BotArchiveError('Bot zip is larger than {} bytes'.format(max_bytes))
+      archive.write(chunk)
+  except BaseException:
+    archive.close()
+    raise
+  archive.seek(0)
+  return archive
+
+
+def extract(archive, dest, max_bytes, max_entries):
+  """
+  Extracts the zip in archive into dest in a single pass, after checking it against the
+  limits on entry count and total uncompressed size. Raises BotArchiveError for archives
+  that are malformed or over a limit, before anything is written.
+
+  The sizes checked are the ones the central directory declares; zipfile never inflates
+  a member past its declared size, so they also bound what reaches the disk.
+  """
+  try:
+    with zipfile.ZipFile(archive, 'r') as zip_ref:
+      infos = zip_ref.infolist()
+      if len(infos) > max_entries:
+        raise BotArchiveError('Bot zip has more than {} files'.format(max_entries))
+      total_size = 0
+      for info in infos:
+        total_size += info.file_size
+        if total_size > max_bytes:
+          raise BotArchiveError('Bot zip unpacks to more than {} bytes'.format(max_bytes))
+      for info in infos:
+        zip_ref.extract(info, dest)
+  except (zipfile.BadZipfile, zipfile.LargeZipFile, EOFError, zlib.error):
+    raise BotArchiveError('Bot zip file is malformed')
+
+
+def pack(source_dir, bot_dir, spool_bytes):
+  """
+  Archives a built source tree as a gzipped tar in a spooled temporary file. bot_dir,
+  the directory inside source_dir holding commands.json, is recorded in the archive's
+  global pax header for unpack to return.
+  """
+  archive = tempfile.SpooledTemporaryFile(max_size=spool_bytes)
+  pax_headers = {BOT_DIR_HEADER: os.path.relpath(bot_dir, source_dir)}
+  with tarfile.open(fileobj=archive, mode='w:gz', format=tarfile.PAX_FORMAT, pax_headers=pax_headers) as tar:
+    tar.add(source_dir, arcname='.')
+  archive.seek(0)
+  return archive
+
+
+def _inside(path):
+  """Whether a relative archive path stays inside the directory it is extracted into."""
+  return not os.path.isabs(path) and os.path.normpath(path).split(os.sep)[0] != os.pardir
+
+
+def _check_member(member):
+  if not _inside(member.name):
+    raise BotArchiveError('Prebuilt bot archive has a file outside the bot: {}'.format(member.name))
+  if member.issym():
+    target = os.path.join(os.path.dirname(member.name), member.linkname)
+  elif member.islnk():
+    target = member.linkname
+  elif member.isfile() or member.isdir():
+    return
+  else:
+    raise BotArchiveError('Prebuilt bot archive has a special file: {}'.format(member.name))
+  if os.path.isabs(member.linkname) or not _inside(target):
+    raise BotArchiveError('Prebuilt bot archive links outside the bot: {}'.format(member.name))
+
+
+def unpack(archive, dest):
+  """
+  Extracts an archive made by pack into dest and returns the bot directory inside it.
+
+  Archives come back from the shared cache and S3, so every member is checked before
+  anything is written: paths and link targets must stay inside dest, and only regular
+  files, directories and links are allowed. Pythons with tarfile's extraction filters
+  also apply the 'data' filter.
+  """
+  try:
+    with tarfile.open(fileobj=archive, mode='r:gz') as tar:
+      bot_dir = tar.pax_headers.get(BOT_DIR_HEADER)
+      if bot_dir is None or not _inside(bot_dir):
+        raise BotArchiveError('Prebuilt bot archive does not say where its bot is')
+      members = tar.getmembers()
+      for member in members:
+        _check_member(member)
+      if hasattr(tarfile, 'data_filter'):
+        tar.extractall(dest, members, filter='data')
+      else:
+        tar.extractall(dest, members)
+  except (tarfile.TarError, EOFError, zlib.error):
+    raise BotArchiveError('Prebuilt bot archive is malformed')
+  return os.path.normpath(os.path.join(dest, bot_dir))
@@ -0,0 +1,150 @@
+import contextlib
+import fcntl
+import hashlib
+import json
+import os
+import shutil
+import time
+
+
+def cache_key(s3_key, etag):
+  """Content address of a bot artifact: its S3 key plus the object's ETag."""
+  return hashlib.sha256('{}\0{}'.format(s3_key, etag).encode()).hexdigest()
+
+
+def _tree_size(path):
+  total = 0
+  for root, dirs, files in os.walk(path):
+    for name in files:
+      try:
+        total += os.lstat(os.path.join(root, name)).st_size
+      except OSError:
+        pass
+  return total
+
+
+class BotCache(object):
+  """
+  On-disk cache of downloaded, extracted and built bots.
+
+  Each entry is a directory named by cache_key holding the built source tree and a
+  meta.json. Entries are evicted least recently used first once the cache grows past
+  max_bytes. A lock file serializes publishing and eviction against readers, across
+  both threads and worker processes.
+  """
+
+  META_FILE = 'meta.json'
+  SOURCE_DIR = 'source'
+  STAGING_PREFIX = '.staging-'
+  # staging directories older than this were left by a worker that died mid-store
+  STAGING_MAX_AGE = 60 * 60
+
+  def __init__(self, root, max_bytes):
+    self.root = root
+    self.max_bytes = max_bytes
+    os.makedirs(self.root, exist_ok=True)
+    self.lock_path = os.path.join(self.root, '.lock')
+
+  @contextlib.contextmanager
+  def _locked(self, mode):
+    with open(self.lock_path, 'a') as lock_file:
+      fcntl.flock(lock_file, mode)
+      try:
+        yield
+      finally:
+        fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+  def _entry_dir(self, key):
+    return os.path.join(self.root, key)
+
+  def _read_meta(self, entry_dir):
+    try:
+      with open(os.path.join(entry_dir, self.META_FILE)) as meta_file:
+        return json.load(meta_file)
+    except (OSError, ValueError):
+      return None
+
+  def checkout(self, key, dest_dir):
+    """
+    Copies a cached bot into dest_dir.
+
+    Returns the path of the bot directory (the one holding commands.json) inside
+    dest_dir, or None on a cache miss.
+    """
+    entry_dir = self._entry_dir(key)
+    with self._locked(fcntl.LOCK_SH):
+      meta = self._read_meta(entry_dir)
+      if meta is None:
+        return None
+      shutil.copytree(os.path.join(entry_dir, self.SOURCE_DIR), dest_dir, symlinks=True)
+      # bump the entry for LRU eviction
+      os.utime(os.path.join(entry_dir, self.META_FILE))
+    return os.path.join(dest_dir, meta['bot_dir'])
+
+  def store(self, key, source_dir, bot_dir, **info):
+    """
+    Publishes a built source tree under key, evicting old entries to make room.
+
+    bot_dir is the directory inside source_dir that holds commands.json. Extra
+    keyword arguments are recorded in the entry's metadata.
+    """
+    size = _tree_size(source_dir)
+    if size > self.max_bytes:
+      return False
+    staging_dir = os.path.join(self.root, self.STAGING_PREFIX + os.urandom(8).hex())
+    published = False
+    try:
+      shutil.copytree(source_dir, os.path.join(staging_dir, self.SOURCE_DIR), symlinks=True)
+      meta = dict(info, bot_dir=os.path.relpath(bot_dir, source_dir), size=size, stored_at=time.time())
+      with open(os.path.join(staging_dir, self.META_FILE), 'w') as meta_file:
+        json.dump(meta, meta_file)
+
+      with self._locked(fcntl.LOCK_EX):
+        # another worker may have published this bot first
+        if self._read_meta(self._entry_dir(key)) is None:
+          self._evict(self.max_bytes - size)
+          os.rename(staging_dir, self._entry_dir(key))
+          published = True
+    finally:
+      if not published:
+        shutil.rmtree(staging_dir, ignore_errors=True)
+    return True
+
+  def _entries(self):
+    entries = []
+    for name in os.listdir(self.root):
+      if name.startswith(self.STAGING_PREFIX):
+        self._remove_abandoned(os.path.join(self.root, name))
+      if name.startswith('.'):
+        continue
+      entry_dir = self._entry_dir(name)
+      meta = self._read_meta(entry_dir)
+      if meta is None:
+        shutil.rmtree(entry_dir, ignore_errors=True)
+        continue
+      last_used = os.path.getmtime(os.path.join(entry_dir, self.META_FILE))
+      entries.append((last_used, meta['size'], entry_dir))
+    return entries
+
+  def _remove_abandoned(self, staging_dir):
+    try:
+      abandoned = time.time() - os.path.getmtime(staging_dir) > self.STAGING_MAX_AGE
+    except OSError:
+      return
+    if abandoned:
+      shutil.rmtree(staging_dir, ignore_errors=True)
+
+  def _evict(self, budget):
+    """Removes least recently used entries until the cache holds at most budget bytes."""
+    entries = sorted(self._entries())
+    total = sum(size for _, size, _ in entries)
+    for _, size, entry_dir in entries:
+      if total <= budget:
+        break
+      shutil.rmtree(entry_dir, ignore_errors=True)
+      total -= size
+
+  @property
+  def total_bytes(self):
+    with self._locked(fcntl.LOCK_SH):
+      return sum(size for _, size, _ in self._entries())
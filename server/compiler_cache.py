@@ -0,0 +1,236 @@
+"""
+Shared compiler caches for bot builds, reused across bots and games on a worker.
+
+Bot builds run arbitrary commands from commands.json, so the caches sit in the build
+environment rather than in the commands: build_environment puts ccache's compiler
+symlinks (gcc, g++, c++, ...) and a caching javac shim at the front of PATH.
+
+- C++: ccache keeps object files keyed by the preprocessed source and the compiler
+  flags. Bots are built in throwaway temporary directories, so absolute paths under the
+  temporary directory are rewritten to relative ones (CCACHE_BASEDIR) and the working
+  directory is left out of the hash, which lets identical skeleton code hit across bots.
+- Java: compiler_shims/javac keys each javac run by its arguments, the javac it resolves
+  to and every .java, .class and .jar file under the working directory, and keeps the
+  .class files that run wrote in a BotCache. A hit copies them back without running javac.
+
+Only the standard library is imported here, since the javac shim loads this module from
+inside a bot's build.
+"""
+import fcntl
+import hashlib
+import importlib.util
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+
+SHIM_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'compiler_shims')
+# where Debian and Homebrew put ccache's compiler symlinks
+CCACHE_MASQUERADE_DIRS = ('/usr/lib/ccache', '/usr/local/opt/ccache/libexec')
+JAVA_INPUT_SUFFIXES = ('.java', '.class', '.jar')
+# kept with a leading dot, which BotCache skips when it lists entries
+STATS_FILE = '.stats.json'
+# Redis hash of hits and misses summed over all workers, with fields like "c++:hits"
+STATS_KEY = 'compiler_cache:stats'
+
+
+def build_environment(env, cache_dir, max_bytes):
+  """Returns a copy of env that builds with the compiler caches in cache_dir."""
+  env = dict(env)
+  path = [SHIM_DIR]
+  masquerade_dir = next((d for d in CCACHE_MASQUERADE_DIRS if os.path.isdir(d)), None)
+  if masquerade_dir is not None:
+    path.append(masquerade_dir)
+  env['PATH'] = os.pathsep.join(path + [env.get('PATH', os.defpath)])
+  env.update({
+    'CCACHE_DIR': os.path.join(cache_dir, 'ccache'),
+    # a bare number would be read as gigabytes
+    'CCACHE_MAXSIZE': '{}M'.format(max(1, max_bytes // 2 // 1024 ** 2)),
+    'CCACHE_BASEDIR': tempfile.gettempdir(),
+    'CCACHE_NOHASHDIR': '1',
+    'JAVAC_CACHE_DIR': os.path.join(cache_dir, 'javac'),
+    'JAVAC_CACHE_MAX_BYTES': str(max_bytes // 2)
+  })
+  return env
+
+
+def _run_ccache(cache_dir, option):
+  try:
+    return subprocess.run(
+      ['ccache', option],
+      env=dict(os.environ, CCACHE_DIR=os.path.join(cache_dir, 'ccache')),
+      stdout=subprocess.PIPE,
+      stderr=subprocess.DEVNULL,
+      check=True
+    ).stdout.decode()
+  except (OSError, subprocess.CalledProcessError):
+    return None
+
+
+def _parse_ccache_summary(output):
+  """
+  (hits, misses) from `ccache -s`: "cache hit (direct)  N" lines before ccache 4.5,
+  "Hits:  N / M" and "Misses:  N" after.
+  """
+  hits = misses = 0
+  for line in output.splitlines():
+    words = line.split()
+    if line.startswith('cache hit (') and words[-1].isdigit():
+      hits += int(words[-1])
+    elif line.startswith('cache miss') and words[-1].isdigit():
+      misses += int(words[-1])
+    elif line.startswith('  Hits:'):
+      hits = int(words[1])
+    elif line.startswith('  Misses:'):
+      misses = int(words[1])
+  return hits, misses
+
+
+def _ccache_stats(cache_dir):
+  """
+  (hits, misses) from `ccache --print-stats`, falling back to `ccache -s` on versions
+  without it, or None without ccache.
+  """
+  output = _run_ccache(cache_dir, '--print-stats')
+  if output is None:
+    output = _run_ccache(cache_dir, '-s')
+    return None if output is None else _parse_ccache_summary(output)
+  counters = dict(line.split('\t', 1) for line in output.splitlines() if '\t' in line)
+  hits = sum(int(counters.get(name, 0)) for name in ('direct_cache_hit', 'preprocessed_cache_hit'))
+  return hits, int(counters.get('cache_miss', 0))
+
+
+def _read_stats(stats_dir):
+  try:
+    with open(os.path.join(stats_dir, STATS_FILE)) as stats_file:
+      return json.load(stats_file)
+  except (OSError, ValueError):
+    return {'hits': 0, 'misses': 0}
+
+
+def _record(stats_dir, hit):
+  os.makedirs(stats_dir, exist_ok=True)
+  with open(os.path.join(stats_dir, '.stats.lock'), 'a') as lock_file:
+    fcntl.flock(lock_file, fcntl.LOCK_EX)
+    stats = _read_stats(stats_dir)
+    stats['hits' if hit else 'misses'] += 1
+    staging_path = os.path.join(stats_dir, '{}-{}'.format(STATS_FILE, os.getpid()))
+    with open(staging_path, 'w') as stats_file:
+      json.dump(stats, stats_file)
+    os.rename(staging_path, os.path.join(stats_dir, STATS_FILE))
+
+
+def stats(cache_dir):
+  """Cumulative {language: {'hits', 'misses'}} for the caches in cache_dir."""
+  result = {}
+  ccache = _ccache_stats(cache_dir)
+  if ccache is not None:
+    result['c++'] = {'hits': ccache[0], 'misses': ccache[1]}
+  result['java'] = _read_stats(os.path.join(cache_dir, 'javac'))
+  return result
+
+
+def hit_rates(totals):
+  """Turns the STATS_KEY hash into {language: {'hits', 'misses', 'hit_rate'}}."""
+  rates = {}
+  for field, count in totals.items():
+    field = field.decode() if isinstance(field, bytes) else field
+    language, name = field.rsplit(':', 1)
+    rates.setdefault(language, {'hits': 0, 'misses': 0})[name] = int(count)
+  for counts in rates.values():
+    builds = counts['hits'] + counts['misses']
+    counts['hit_rate'] = round(counts['hits'] / builds, 3) if builds else None
+  return rates
+
+
+def _load_bot_cache():
+  spec = importlib.util.spec_from_file_location(
+    'pokerbots_bot_cache', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'bot_cache.py'))
+  module = importlib.util.module_from_spec(spec)
+  spec.loader.exec_module(module)
+  return module
+
+
+def _find_real_javac():
+  for directory in os.environ.get('PATH', os.defpath).split(os.pathsep):
+    candidate = os.path.join(directory, 'javac')
+    if os.path.realpath(directory) != os.path.realpath(SHIM_DIR) and os.access(candidate, os.X_OK):
+      return candidate
+  return None
+
+
+def _java_files(root):
+  """Modification times of the javac inputs and outputs under root, by relative path."""
+  files = {}
+  for directory, dirs, names in os.walk(root):
+    dirs.sort()
+    for name in sorted(names):
+      if name.endswith(JAVA_INPUT_SUFFIXES):
+        path = os.path.join(directory, name)
+        files[os.path.relpath(path, root)] = os.stat(path).st_mtime_ns
+  return files
+
+
+def _javac_key(javac, args, files):
+  digest = hashlib.sha256()
+  real_javac = os.path.realpath(javac)
+  javac_stat = os.stat(real_javac)
+  digest.update(json.dumps([real_javac, javac_stat.st_size, javac_stat.st_mtime_ns, args,
+                            os.environ.get('CLASSPATH')]).encode())
+  for relative_path in files:
+    digest.update(relative_path.encode() + b'\0')
+    with open(relative_path, 'rb') as input_file:
+      digest.update(hashlib.sha256(input_file.read()).digest())
+  return digest.hexdigest()
+
+
+def _cacheable(args):
+  # argument files and output directories outside the bot would hide inputs or outputs
+  for i, arg in enumerate(args):
+    if arg.startswith('@'):
+      return False
+    if arg == '-d' and i + 1 < len(args):
+      output_dir = os.path.realpath(args[i + 1])
+      if os.path.commonpath([output_dir, os.path.realpath('.')]) != os.path.realpath('.'):
+        return False
+  return True
+
+
+def javac_main(args):
+  """Runs javac with args through the cache; returns its exit code."""
+  javac = _find_real_javac()
+  if javac is None:
+    print('javac: command not found', file=sys.stderr)
+    return 127
+  cache_dir = os.environ.get('JAVAC_CACHE_DIR')
+  if cache_dir is None or not _cacheable(args):
+    return subprocess.call([javac] + args)
+
+  bot_cache = _load_bot_cache()
+  cache = bot_cache.BotCache(cache_dir, int(os.environ.get('JAVAC_CACHE_MAX_BYTES', 512 * 1024 ** 2)))
+  before = _java_files('.')
+  key = _javac_key(javac, args, before)
+  with tempfile.TemporaryDirectory() as tmp_dir:
+    classes_dir = cache.checkout(key, os.path.join(tmp_dir, 'classes'))
+    if classes_dir is not None:
+      for directory, _, names in os.walk(classes_dir):
+        for name in names:
+          relative_path = os.path.relpath(os.path.join(directory, name), classes_dir)
+          os.makedirs(os.path.dirname(relative_path) or '.', exist_ok=True)
+          shutil.copy2(os.path.join(directory, name), relative_path)
+      _record(cache_dir, hit=True)
+      return 0
+
+    returncode = subprocess.call([javac] + args)
+    if returncode == 0:
+      classes_dir = os.path.join(tmp_dir, 'classes')
+      os.mkdir(classes_dir)
+      for relative_path, mtime in _java_files('.').items():
+        if relative_path.endswith('.class') and before.get(relative_path) != mtime:
+          os.makedirs(os.path.join(classes_dir, os.path.dirname(relative_path)), exist_ok=True)
+          shutil.copy2(relative_path, os.path.join(classes_dir, relative_path))
+      cache.store(key, classes_dir, classes_dir)
+    _record(cache_dir, hit=False)
+    return returncode
@@ -1,11 +1,115 @@
 import os
+import tempfile
 
 # Note, it's very important that keys read from the environment have the same name as in the config
 
+# The web process serves requests but hosts no games, so it skips the worker sizing below
+IS_WEB = bool(os.environ.get('WEB', False))
+
+
+def _read_first_line(path):
+  try:
+    with open(path) as f:
+      return f.readline().strip()
+  except OSError:
+    return None
+
+
+def available_cpus():
+  """CPUs this container may use, honouring a cgroup CPU quota when there is one."""
+  cpus = len(os.sched_getaffinity(0)) if hasattr(os, 'sched_getaffinity') else os.cpu_count() or 1
+  quota = _read_first_line('/sys/fs/cgroup/cpu.max')  # cgroup v2: "<quota> <period>"
+  if quota is not None and not quota.startswith('max'):
+    limit, period = quota.split()
+    cpus = min(cpus, int(limit) / int(period))
+  else:
+    limit = _read_first_line('/sys/fs/cgroup/cpu/cpu.cfs_quota_us')
+    period = _read_first_line('/sys/fs/cgroup/cpu/cpu.cfs_period_us')
+    if limit and period and int(limit) > 0:
+      cpus = min(cpus, int(limit) / int(period))
+  return cpus
+
+
+def available_memory():
+  """Bytes of memory this container may use, honouring a cgroup memory limit when there is one."""
+  memory = os.sysconf('SC_PAGE_SIZE') * os.sysconf('SC_PHYS_PAGES')
+  for path in ('/sys/fs/cgroup/memory.max', '/sys/fs/cgroup/memory/memory.limit_in_bytes'):
+    limit = _read_first_line(path)
+    if limit and limit.isdigit():
+      memory = min(memory, int(limit))
+  return memory
+
+
+def max_concurrent_games(games_per_cpu, game_memory, worker_memory):
+  """How many live games one worker can host without oversubscribing CPU or memory."""
+  by_cpu = int(available_cpus() * games_per_cpu)
+  by_memory = (available_memory() - worker_memory) // game_memory
+  return max(1, min(by_cpu, by_memory))
+
+
 class Config(object):
   SQLALCHEMY_DATABASE_URI = 'sqlite://:memory:'
   SQLALCHEMY_TRACK_MODIFICATIONS = False
   ADMIN_PASSWORD = os.getenv('ADMIN_PASSWORD', 'abc123')
+  # 'daemon' hosts games on threads of a resident engine, 'subprocess' starts engine.py per game
+  # and 'zygote' forks each game's engine from a process that has already imported it
+  ENGINE_MODE = os.getenv('ENGINE_MODE', 'daemon')
+  # Seconds to wait for a subprocess or zygote engine to report its port before giving up
+  ENGINE_READY_TIMEOUT = 30
+  # Downloaded and built bots are kept here, keyed by S3 key and ETag
+  BOT_CACHE_DIR = os.getenv('BOT_CACHE_DIR', os.path.join(tempfile.gettempdir(), 'pokerbots-bot-cache'))
+  BOT_CACHE_MAX_BYTES = int(os.getenv('BOT_CACHE_MAX_BYTES', 2 * 1024 ** 3))
+  # Seconds a bot zip's ETag is trusted before the cache lookup checks S3 for a new upload again
+  BOT_ETAG_TTL = int(os.getenv('BOT_ETAG_TTL', 60))
+  BOT_BUILD_TIMEOUT = 120
+  # Bot builds share a ccache for C++ and a cache of javac output here; half of the budget each
+  COMPILER_CACHE_DIR = os.getenv('COMPILER_CACHE_DIR', os.path.join(tempfile.gettempdir(), 'pokerbots-compiler-cache'))
+  COMPILER_CACHE_MAX_BYTES = int(os.getenv('COMPILER_CACHE_MAX_BYTES', 2 * 1024 ** 3))
+  # Bot zips are downloaded into memory, spilling to a temporary file past BOT_ZIP_SPOOL_BYTES.
+  # Larger zips, and zips that unpack to too many bytes or files, are rejected.
+  BOT_ZIP_SPOOL_BYTES = int(os.getenv('BOT_ZIP_SPOOL_BYTES', 32 * 1024 ** 2))
+  BOT_ZIP_MAX_BYTES = int(os.getenv('BOT_ZIP_MAX_BYTES', 256 * 1024 ** 2))
+  BOT_UNZIPPED_MAX_BYTES = int(os.getenv('BOT_UNZIPPED_MAX_BYTES', 1024 ** 3))
+  BOT_ZIP_MAX_ENTRIES = int(os.getenv('BOT_ZIP_MAX_ENTRIES', 10000))
+  # One S3 client, and one thread per pooled connection, is shared by every thread of a worker.
+  # Bot zips larger than one part are downloaded as parallel byte-range GETs, with at most
+  # S3_RANGED_GET_WORKERS parts in flight or buffered per download.
+  S3_MAX_POOL_CONNECTIONS = int(os.getenv('S3_MAX_POOL_CONNECTIONS', 50))
+  S3_RANGED_GET_PART_BYTES = int(os.getenv('S3_RANGED_GET_PART_BYTES', 8 * 1024 ** 2))
+  S3_RANGED_GET_WORKERS = int(os.getenv('S3_RANGED_GET_WORKERS', 8))
+  # Live game state is kept in Redis for LIVE_GAME_TTL seconds; mid-hand updates reach the
+  # database at most LIVE_GAME_PERSIST_INTERVAL seconds after they are sent.
+  LIVE_GAME_TTL = 24 * 60 * 60
+  LIVE_GAME_PERSIST_INTERVAL = 10
+  # The admin page reports start-up phase percentiles over this many of the latest games
+  STARTUP_TIMELINE_WINDOW = 1000
+  # Tables kept launched and parked at the first hand for the WARM_POOL_SIZE most requested bots,
+  # WARM_POOL_DEPTH of them per bot, per worker. Parked tables are relaunched after
+  # WARM_POOL_MAX_AGE seconds so they don't go stale.
+  WARM_POOL_SIZE = int(os.getenv('WARM_POOL_SIZE', 2))
+  WARM_POOL_DEPTH = int(os.getenv('WARM_POOL_DEPTH', 1))
+  WARM_POOL_MAX_AGE = 30 * 60
+  WARM_POOL_REFILL_INTERVAL = 30
+  WARM_POOL_LAUNCH_TIMEOUT = 300
+  # Live games per worker process. Humans think slowly, so a game rarely keeps a CPU busy;
+  # memory for the bot process is usually the limit. MAX_CONCURRENT_GAMES overrides the estimate,
+  # which only workers make. Warm tables are parked games and share this budget: the pool only
+  # fills slots no game is using, and a game that starts cold takes a parked table's slot back.
+  GAMES_PER_CPU = float(os.getenv('GAMES_PER_CPU', 4))
+  GAME_MEMORY_BYTES = int(os.getenv('GAME_MEMORY_BYTES', 150 * 1024 ** 2))
+  WORKER_MEMORY_BYTES = int(os.getenv('WORKER_MEMORY_BYTES', 150 * 1024 ** 2))
+  MAX_CONCURRENT_GAMES = int(os.getenv('MAX_CONCURRENT_GAMES', 0)) or \
+    (1 if IS_WEB else max_concurrent_games(GAMES_PER_CPU, GAME_MEMORY_BYTES, WORKER_MEMORY_BYTES))
+  # Each game runs on its own worker thread, and fetches at most one task ahead
+  CELERYD_POOL = 'threads'
+  CELERYD_CONCURRENCY = MAX_CONCURRENT_GAMES
+  CELERYD_PREFETCH_MULTIPLIER = 1
+  # Imported bots are prebuilt on their own queue, so builds never hold up live games. Run
+  # `celery -A server.celery_app worker -Q builds` for it; built bots are stored in S3 under
+  # PREBUILT_BOT_PREFIX for every worker to use.
+  BUILD_QUEUE = 'builds'
+  CELERY_ROUTES = {'server.tasks.prebuild_bot_task': {'queue': BUILD_QUEUE}}
+  PREBUILT_BOT_PREFIX = 'prebuilt/'
 
 class ProdConfig(Config):
   ENV = 'production'
@@ -19,6 +123,8 @@ class ProdConfig(Config):
   S3_REGION = os.getenv('S3_REGION', None)
   S3_BUCKET = os.getenv('S3_BUCKET', None)
   PREFERRED_URL_SCHEME = 'https'
+  # a connection per game thread, plus headroom; the web process keeps the default pool
+  SQLALCHEMY_ENGINE_OPTIONS = {} if IS_WEB else {'pool_size': Config.MAX_CONCURRENT_GAMES + 2}
 
 class DevConfig(Config):
   ENV = 'development'
@@ -26,6 +132,8 @@ class DevConfig(Config):
   # SQLALCHEMY_DATABASE_URI = 'sqlite:///' + os.path.join(os.path.dirname(__file__), '..', 'dev.db')
   SQLALCHEMY_DATABASE_URI = 'postgresql://postgres:@localhost:5432/pbots'
   SQLALCHEMY_TRACK_MODIFICATIONS = True
+  # a connection per game thread, plus headroom; the web process keeps the default pool
+  SQLALCHEMY_ENGINE_OPTIONS = {} if IS_WEB else {'pool_size': Config.MAX_CONCURRENT_GAMES + 2}
   SECRET_KEY = 'SUPER SECRET KEY'
   PREFERRED_URL_SCHEME = 'http'
   S3_BUCKET = 'pokerbots-dev'
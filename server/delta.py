@@ -0,0 +1,30 @@
+def diff(previous, data):
+  """
+  Describes the message data relative to previous, or returns None if a full snapshot is
+  needed.
+
+  'delta' holds the top-level fields that changed, 'removed' the ones that went away
+  and 'new_moves' the moves appended to move_history. A move history that doesn't
+  extend the previous one (a new hand) is sent whole inside 'delta'.
+  """
+  if not isinstance(previous, dict) or not isinstance(data, dict):
+    return None
+  delta = {key: value for key, value in data.items() if key != 'move_history' and previous.get(key) != value}
+  removed = [key for key in previous if key not in data]
+  new_moves = []
+  moves, old_moves = data.get('move_history'), previous.get('move_history')
+  if moves is not None and old_moves is not None and moves[:len(old_moves)] == old_moves:
+    new_moves = moves[len(old_moves):]
+  elif moves is not None and moves != old_moves:
+    delta['move_history'] = moves
+  return {'delta': delta, 'removed': removed, 'new_moves': new_moves}
+
+
+def apply(message, update):
+  """Returns message with an update made by diff applied, the way the client does it."""
+  message = dict(message or {}, **update['delta'])
+  for key in update['removed']:
+    message.pop(key, None)
+  if update['new_moves']:
+    message['move_history'] = (message.get('move_history') or []) + update['new_moves']
+  return message
@@ -0,0 +1,90 @@
+import socket
+import threading
+
+
+class Table(object):
+  """
+  One engine game running on a thread, with the hero seat wired to a socketpair.
+
+  The bot is built and run with env as its environment. Without one it inherits the
+  worker's environment, secrets included.
+  """
+
+  def __init__(self, engine, game_dir, bot_dir, bot_prebuilt=False, hold=False, env=None):
+    self.game = engine.Game(log_dir=game_dir, hold=hold)
+    engine_sock, self.sock = socket.socketpair()
+    engine_sock.settimeout(engine.CONNECT_TIMEOUT)
+    hero = engine.Player(engine.PLAYER_1_NAME, None, game_dir)
+    hero.socketfile = engine_sock.makefile('rw')
+    engine_sock.close()
+    self.players = [hero, engine.Player(engine.PLAYER_2_NAME, bot_dir, game_dir, bot_prebuilt, env=env)]
+    self.thread = threading.Thread(target=self._run, daemon=True)
+
+  def _run(self):
+    try:
+      self.game.run(players=self.players)
+    except Exception as e:
+      print('Engine table crashed: {}'.format(e))
+      for player in self.players:
+        if player.bot_subprocess is not None:
+          player.bot_subprocess.kill()
+
+  def start(self):
+    self.thread.start()
+    return self
+
+  def wait_parked(self, timeout=None):
+    """Waits until both players are connected and the game is about to deal the first hand."""
+    return self.game.parked.wait(timeout)
+
+  @property
+  def bot_connected(self):
+    return self.players[1].socketfile is not None
+
+  def release(self):
+    """Starts a table created with hold=True."""
+    self.game.release()
+
+  def close(self, timeout=None):
+    """Stops the game at the next round boundary and waits for the engine to shut the bot down."""
+    self.game.cancel()
+    try:
+      self.sock.shutdown(socket.SHUT_RDWR)
+    except OSError:
+      pass
+    self.sock.close()
+    self.thread.join(timeout)
+
+
+class EngineService(object):
+  """
+  A resident engine that hosts many concurrent games inside the worker process.
+
+  engine.py, eval7 and the game config are loaded once, by load_engine (the tournament
+  runner's, which imports engine.py with config_source as its config.py); every game then
+  gets its own Game instance on a thread and talks to the worker over an in-memory
+  socketpair instead of a fixed TCP port.
+  """
+
+  def __init__(self, load_engine, config_source):
+    self.engine = load_engine(config_source)
+    self.lock = threading.Lock()
+    self.tables = set()
+
+  def start_table(self, game_dir, bot_dir, bot_prebuilt=False, hold=False, env=None):
+    table = Table(self.engine, game_dir, bot_dir, bot_prebuilt, hold, env)
+    with self.lock:
+      self.tables.add(table)
+    return table.start()
+
+  def close_table(self, table, timeout=None):
+    try:
+      table.close(timeout)
+    finally:
+      with self.lock:
+        self.tables.discard(table)
+
+  @property
+  def num_tables(self):
+    with self.lock:
+      return len(self.tables)
@@ -0,0 +1,114 @@
+import json
+import os
+import select
+import signal
+import socket
+import subprocess
+import tempfile
+import time
+
+
+class ZygoteGame(object):
+  """
+  An engine forked from the zygote for one game.
+
+  Stands in for the subprocess.Popen of a cold engine: ready_fd yields the engine's
+  "<name> <port>" lines, and kill() and wait() act on the forked process. The caller
+  closes ready_fd, just like the read end of a readiness pipe.
+  """
+
+  def __init__(self, sock, pid):
+    self.sock = sock
+    self.pid = pid
+    self.ready_fd = os.dup(sock.fileno())
+    self.returncode = None
+
+  def kill(self):
+    try:
+      os.killpg(self.pid, signal.SIGKILL)
+    except OSError:
+      pass
+
+  def wait(self, timeout=None):
+    """Waits for the game's connection to close, which happens when the process exits."""
+    deadline = None if timeout is None else time.monotonic() + timeout
+    data = b''
+    while self.sock is not None:
+      remaining = None if deadline is None else deadline - time.monotonic()
+      if remaining is not None and remaining <= 0:
+        raise subprocess.TimeoutExpired('zygote game {}'.format(self.pid), timeout)
+      readable, _, _ = select.select([self.sock], [], [], remaining)
+      if not readable:
+        continue
+      try:
+        chunk = self.sock.recv(4096)
+      except OSError:
+        chunk = b''
+      data += chunk
+      if not chunk:
+        self.sock.close()
+        self.sock = None
+    for line in data.decode(errors='replace').splitlines():
+      if line.startswith('exit '):
+        self.returncode = int(line.split()[1])
+    return self.returncode
+
+
+class EngineZygote(object):
+  """
+  A zygote process (deps/engine-2025/zygote.py) that has already imported the engine and
+  eval7, and forks a fresh engine for every game instead of starting `python engine.py`.
+
+  The worker binds the listening socket and hands it to the zygote, so games can be
+  requested as soon as the zygote has been spawned. The zygote exits when the worker
+  does, since its stdin is a pipe from the worker.
+  """
+
+  def __init__(self, zygote_path, env=None, stdout=None):
+    self.sock_dir = tempfile.mkdtemp(prefix='engine-zygote-')
+    self.path = os.path.join(self.sock_dir, 'zygote.sock')
+    listener = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    listener.bind(self.path)
+    listener.listen(64)
+    self.process = subprocess.Popen(
+      ['python', zygote_path, '--listen-fd', str(listener.fileno())],
+      cwd=os.path.dirname(zygote_path),
+      env=env,
+      stdin=subprocess.PIPE,
+      stdout=stdout,
+      pass_fds=(listener.fileno(),)
+    )
+    listener.close()
+
+  @property
+  def alive(self):
+    return self.process.poll() is None
+
+  def spawn(self, game_dir, config_source, timeout=None):
+    """Forks an engine for the game in game_dir and returns its ZygoteGame."""
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+      sock.settimeout(timeout)
+      sock.connect(self.path)
+      sock.sendall((json.dumps({'game_dir': game_dir, 'config': config_source}) + '\n').encode())
+      # the child's pid comes first, before anything the engine writes
+      line = b''
+      while not line.endswith(b'\n'):
+        chunk = sock.recv(1)
+        if not chunk:
+          raise OSError('Engine zygote closed the connection before forking')
+        line += chunk
+      sock.settimeout(None)
+    except Exception:
+      sock.close()
+      raise
+    return ZygoteGame(sock, int(line.split()[1]))
+
+  def close(self):
+    self.process.stdin.close()
+    self.process.wait()
+    try:
+      os.unlink(self.path)
+      os.rmdir(self.sock_dir)
+    except OSError:
+      pass
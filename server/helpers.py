@@ -1,22 +1,74 @@
+import concurrent.futures
+import threading
+
 import requests
 import boto3
 from botocore.client import Config
+from botocore.exceptions import ClientError
 
 from server import app
+from server.s3_download import RangedObject
+
+_s3_client = None
+_s3_client_lock = threading.Lock()
+_s3_executor = None
+_s3_executor_lock = threading.Lock()
+
 
 def _get_s3_context():
-  if app.debug:
-    return boto3.client('s3', config=Config(signature_version='s3v4'))
-  else:
-    return boto3.client(
-      's3',
-      region_name=app.config['S3_REGION'],
-      aws_access_key_id=app.config['AWS_ACCESS_KEY_ID'],
-      aws_secret_access_key=app.config['AWS_SECRET_ACCESS_KEY'],
-      config=Config(signature_version='s3v4')
-    )
-
-
-def get_s3_object(key):
+  """
+  The process-wide S3 client. Clients are thread-safe, and building one resolves
+  credentials and opens a fresh connection pool, so it is only done once.
+  """
+  global _s3_client
+  with _s3_client_lock:
+    if _s3_client is None:
+      config = Config(signature_version='s3v4', max_pool_connections=app.config['S3_MAX_POOL_CONNECTIONS'])
+      if app.debug:
+        _s3_client = boto3.client('s3', config=config)
+      else:
+        _s3_client = boto3.client(
+          's3',
+          region_name=app.config['S3_REGION'],
+          aws_access_key_id=app.config['AWS_ACCESS_KEY_ID'],
+          aws_secret_access_key=app.config['AWS_SECRET_ACCESS_KEY'],
+          config=config
+        )
+    return _s3_client
+
+
+def _get_s3_executor():
+  """The process-wide threads ranged GETs run on, one per pooled connection."""
+  global _s3_executor
+  with _s3_executor_lock:
+    if _s3_executor is None:
+      _s3_executor = concurrent.futures.ThreadPoolExecutor(max_workers=app.config['S3_MAX_POOL_CONNECTIONS'])
+    return _s3_executor
+
+
+def get_s3_object(key, ranged=False):
+  """
+  Returns a readable body for the object. With ranged=True, objects larger than
+  S3_RANGED_GET_PART_BYTES are fetched as parallel byte-range GETs, at most
+  S3_RANGED_GET_WORKERS parts ahead of the reader.
+  """
   client = _get_s3_context()
+  if ranged:
+    try:
+      return RangedObject(client, app.config['S3_BUCKET'], key, app.config['S3_RANGED_GET_PART_BYTES'],
+                          _get_s3_executor(), app.config['S3_RANGED_GET_WORKERS'])
+    except ClientError as e:
+      # an empty object has no byte range to ask for
+      if e.response.get('Error', {}).get('Code') != 'InvalidRange':
+        raise
   return client.get_object(Bucket=app.config['S3_BUCKET'], Key=key)['Body']
+
+
+def get_s3_object_etag(key):
+  client = _get_s3_context()
+  return client.head_object(Bucket=app.config['S3_BUCKET'], Key=key)['ETag'].strip('"')
+
+
+def put_s3_object(key, fileobj):
+  client = _get_s3_context()
+  client.upload_fileobj(fileobj, app.config['S3_BUCKET'], key)
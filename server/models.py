@@ -1,6 +1,19 @@
-import enum, datetime, uuid, json
+import enum, datetime, uuid, json, threading
+
+from sqlalchemy import orm
+
+from server import app, db, socketio, redis
+from server import delta
+
+# Workers run several games on threads, and the socketio message queue client is not thread-safe
+_emit_lock = threading.Lock()
+
+class BuildStatus(enum.Enum):
+  pending = 'pending'      # Bot has been imported, its prebuild has not started.
+  building = 'building'    # Bot is being downloaded and built on the builds queue
+  ready = 'ready'          # Bot's built artifact has been stored; games skip the build
+  failed = 'failed'        # Bot could not be downloaded or built; games build it themselves
 
-from server import app, db, socketio
 
 class Bot(db.Model):
   __tablename__ = 'bots'
@@ -9,11 +22,15 @@ class Bot(db.Model):
   team = db.relationship("Team", foreign_keys=team_id, back_populates="bots")
   name = db.Column(db.String(128), nullable=False)
   s3_key = db.Column(db.String(256), nullable=False)
+  build_status = db.Column(db.Enum(BuildStatus), nullable=False, default=BuildStatus.pending)
+  # Seconds the prebuild took, download included
+  build_seconds = db.Column(db.Float)
 
   def __init__(self, team, name, s3_key):
     self.team = team
     self.name = name
     self.s3_key = s3_key
+    self.build_status = BuildStatus.pending
 
 
 class Team(db.Model):
@@ -42,29 +59,153 @@ class Game(db.Model):
   status = db.Column(db.Enum(GameStatus), nullable=False)
 
   last_message_json = db.Column(db.Text)
+  # Seconds spent in each start-up phase; see server/startup_timeline.py
+  startup_timeline_json = db.Column(db.Text)
 
   def __init__(self, bot):
     self.bot = bot
     self.status = GameStatus.created
     self.uuid = str(uuid.uuid4())
+    self._init_live_state()
+
+  @orm.reconstructor
+  def _init_live_state(self):
+    """Per-process state of a live game, which SQLAlchemy doesn't load or store."""
+    # sequence number and body of the last message sent
+    self._seq = 0
+    self._sent = None
+    # the last message known to be in the database, and the timer that will write a newer one
+    self._persisted_seq = 0
+    self._persisted_json = self.last_message_json
+    self._persist_timer = None
+    self._live_lock = threading.Lock()
 
   @property
   def last_message(self):
     return json.loads(self.last_message_json) if self.last_message_json is not None else None
 
-  def send_message(self, data):
-    self.last_message_json = json.dumps(data)
-    db.session.commit()
-    socketio.emit('game_update', self.as_json(), room=self.uuid)
+  @property
+  def startup_timeline(self):
+    return json.loads(self.startup_timeline_json) if self.startup_timeline_json is not None else None
 
-  def as_json(self):
+  @property
+  def live_key(self):
+    return 'game:{}:last_message'.format(self.uuid)
+
+  @property
+  def live_deltas_key(self):
+    return 'game:{}:deltas'.format(self.uuid)
+
+  def live_snapshot(self):
+    """
+    Returns (seq, message_json) for the newest message, which may be ahead of the
+    database while the game is being played.
+
+    Redis holds the message as of the last persisted one plus the deltas sent since,
+    which are applied here; the list is reset at every round boundary.
+    """
+    with redis.pipeline() as pipe:
+      pipe.hmget(self.live_key, 'seq', 'message')
+      pipe.lrange(self.live_deltas_key, 0, -1)
+      (seq, live), updates = pipe.execute()
+    if live is None:
+      return self._seq, self.last_message_json
+    if not updates:
+      return int(seq), live.decode()
+    message = json.loads(live)
+    for update in updates:
+      message = delta.apply(message, json.loads(update))
+    return int(seq), json.dumps(message)
+
+  def send_message(self, data, persist=True):
+    """
+    Publishes a message to the game's room and stores it as the live state in Redis.
+
+    Every message gets the next sequence number for this game. Clients that already hold
+    the previous message are sent a delta with only the changed fields and the new moves;
+    see delta.diff. Mid-hand messages only append that delta to Redis, so an action costs
+    the same however long the move history is; live_snapshot rebuilds the full message.
+    The full message is serialized and written only when persist is set (round
+    boundaries, status changes and the end of the game) and committed to the database
+    then. Other messages reach the database within LIVE_GAME_PERSIST_INTERVAL, from a
+    timer, even if the hand stalls and nothing else is sent.
+    """
+    previous = self._sent
+    with self._live_lock:
+      self._seq += 1
+      self._sent = data
+    update = delta.diff(previous, data)
+    ttl = app.config['LIVE_GAME_TTL']
+    with redis.pipeline() as pipe:
+      if persist or update is None:
+        self.last_message_json = json.dumps(data)
+        pipe.hset(self.live_key, mapping={'seq': self._seq, 'message': self.last_message_json})
+        pipe.delete(self.live_deltas_key)
+      else:
+        pipe.hset(self.live_key, 'seq', self._seq)
+        pipe.rpush(self.live_deltas_key, json.dumps(update))
+        pipe.expire(self.live_deltas_key, ttl)
+      pipe.expire(self.live_key, ttl)
+      pipe.execute()
+    if persist:
+      db.session.commit()
+      with self._live_lock:
+        if self._persisted_seq < self._seq:
+          self._persisted_seq, self._persisted_json = self._seq, self.last_message_json
+    else:
+      self._schedule_persist()
+
+    if update is None:
+      update = self.as_json()
+    else:
+      update.update(uuid=self.uuid, status=self.status.value)
+    update['seq'] = self._seq
+    with _emit_lock:
+      socketio.emit('game_update', update, room=self.uuid)
+
+  def _schedule_persist(self):
+    game_id = self.id
+    with self._live_lock:
+      if self._persist_timer is None:
+        self._persist_timer = threading.Timer(
+          app.config['LIVE_GAME_PERSIST_INTERVAL'], self._persist_latest, args=(game_id,))
+        self._persist_timer.daemon = True
+        self._persist_timer.start()
+
+  def _persist_latest(self, game_id):
+    """
+    Writes the newest message to the database from the timer's thread, in a session of
+    its own. The write only applies if the row still holds the last message this process
+    persisted, so it never overwrites a newer one the game's thread committed meanwhile.
+    """
+    with self._live_lock:
+      self._persist_timer = None
+      if self._persisted_seq >= self._seq:
+        return
+      seq, message_json, expected = self._seq, json.dumps(self._sent), self._persisted_json
+    with app.app_context():
+      try:
+        column = Game.last_message_json
+        stored = column.is_(None) if expected is None else column == expected
+        updated = Game.query.filter(Game.id == game_id, stored).update(
+          {'last_message_json': message_json}, synchronize_session=False)
+        db.session.commit()
+      finally:
+        db.session.remove()
+    if updated:
+      with self._live_lock:
+        if self._persisted_seq < seq:
+          self._persisted_seq, self._persisted_json = seq, message_json
+
+  def as_json(self, live=False):
+    seq, message_json = self.live_snapshot() if live else (self._seq, self.last_message_json)
     return {
       'uuid': self.uuid,
+      'seq': seq,
       'bot': {
         'team': self.bot.team.name,
         'name': self.bot.name
       },
       'status': self.status.value,
-      'last_message': self.last_message
+      'last_message': json.loads(message_json) if message_json is not None else None
     }
-
@@ -63,12 +63,11 @@ class Runner():
                     hands[active] = clause[1:].split(',')
                     pips = [SMALL_BLIND, BIG_BLIND]
                     stacks = [STARTING_STACK - SMALL_BLIND, STARTING_STACK - BIG_BLIND]
-                    round_state = RoundState(0, 0, pips, stacks, hands, None, [], None)
+                    round_state = RoundState(0, 0, pips, stacks, hands, None, [])
                 elif clause[0] == 'G':
                     bounties = ['-1', '-1']
                     bounties[active] = clause[1:]
-                    round_state = RoundState(round_state.button, round_state.street, round_state.pips, round_state.stacks,
-                                             round_state.hands, bounties, round_state.deck, round_state.previous_state)
+                    round_state.bounties = bounties
                     if round_flag:
                         self.pokerbot.handle_new_round(game_state, round_state, active)
                         round_flag = False
@@ -81,16 +80,11 @@ class Runner():
                 elif clause[0] == 'R':
                     round_state = round_state.proceed(RaiseAction(int(float(clause[1:]))))
                 elif clause[0] == 'B':
-                    round_state = RoundState(round_state.button, round_state.street, round_state.pips, round_state.stacks,
-                                             round_state.hands, round_state.bounties, clause[1:].split(','), round_state.previous_state)
+                    round_state.deck = clause[1:].split(',')
                 elif clause[0] == 'O':
-                    # backtrack
+                    # the final state is updated in place, so only the terminal wrapper is replaced
                     round_state = round_state.previous_state
-                    revised_hands = list(round_state.hands)
-                    revised_hands[1-active] = clause[1:].split(',')
-                    # rebuild history
-                    round_state = RoundState(round_state.button, round_state.street, round_state.pips, round_state.stacks,
-                                             revised_hands, round_state.bounties, round_state.deck, round_state.previous_state)
+                    round_state.hands[1-active] = clause[1:].split(',')
                     round_state = TerminalState([0, 0], None, round_state)
                 elif clause[0] == 'D':
                     assert isinstance(round_state, TerminalState)
@@ -122,17 +116,34 @@ def parse_args():
     '''
     parser = argparse.ArgumentParser(prog='python3 player.py')
     parser.add_argument('--host', type=str, default='localhost', help='Host to connect to, defaults to localhost')
-    parser.add_argument('port', type=int, help='Port on host to connect to')
+    parser.add_argument('port', type=str, help='Port on host to connect to, or unix:<path> for a Unix domain socket')
     return parser.parse_args()
 
+def connect(host, port):
+    '''
+    Connects to the engine, over a Unix domain socket if port is "unix:<path>".
+    '''
+    if port.startswith('unix:'):
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            sock.connect(port[len('unix:'):])
+        except OSError:
+            sock.close()
+            raise
+        return sock
+    sock = socket.create_connection((host, int(port)))
+    # each action is one short line, sent as soon as it is decided
+    sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+    return sock
+
 def run_bot(pokerbot, args):
     '''
     Runs the pokerbot.
     '''
     assert isinstance(pokerbot, Bot)
     try:
-        sock = socket.create_connection((args.host, args.port))
-    except OSError:
+        sock = connect(args.host, args.port)
+    except (OSError, ValueError):
         print('Could not connect to {}:{}'.format(args.host, args.port))
         return
     socketfile = sock.makefile('rw')
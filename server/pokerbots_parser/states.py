@@ -12,11 +12,65 @@ STARTING_STACK = 400
 BIG_BLIND = 2
 SMALL_BLIND = 1
 
+# Sets of cards are bitmasks in the engine's (eval7's) layout: bit 13 * suit + rank, with
+# suits in cdhs order. RANK_MASKS selects all four cards of a rank.
+RANKS = '23456789TJQKA'
+SUITS = 'cdhs'
+CARD_MASKS = {rank + suit: 1 << (13 * s + r) for r, rank in enumerate(RANKS) for s, suit in enumerate(SUITS)}
+RANK_MASKS = {rank: sum(1 << (13 * s + r) for s in range(4)) for r, rank in enumerate(RANKS)}
 
-class RoundState(namedtuple('_RoundState', ['button', 'street', 'pips', 'stacks', 'hands', 'bounties', 'deck', 'previous_state'])):
+
+def card_mask(cards):
+    '''
+    Returns the bitmask of a list of cards like ['Ah', 'Td'].
+    '''
+    mask = 0
+    for card in cards:
+        mask |= CARD_MASKS[card]
+    return mask
+
+
+class RoundState():
     '''
     Encodes the game tree for one round of poker.
+
+    proceed updates the state in place and appends to a flat action log rather than
+    building a new state linked to the old one; previous_state replays that log. The log
+    also records how many board cards were known at each action, so replayed states see
+    the board as it was then.
     '''
+    __slots__ = ('button', 'street', 'pips', 'stacks', 'hands', 'bounties', 'deck', 'actions', 'deck_sizes')
+
+    def __init__(self, button, street, pips, stacks, hands, bounties, deck, actions=None, deck_sizes=None):
+        self.button = button
+        self.street = street
+        self.pips = pips
+        self.stacks = stacks
+        self.hands = hands
+        self.bounties = bounties
+        self.deck = deck
+        self.actions = [] if actions is None else actions
+        self.deck_sizes = [] if deck_sizes is None else deck_sizes
+
+    def __repr__(self):
+        return 'RoundState(button={}, street={}, pips={}, stacks={}, actions={})'.format(
+            self.button, self.street, self.pips, self.stacks, self.actions)
+
+    @property
+    def previous_state(self):
+        '''
+        The state before the last action, or None at the start of the round.
+        '''
+        if not self.actions:
+            return None
+        pips = [SMALL_BLIND, BIG_BLIND]
+        stacks = [STARTING_STACK - SMALL_BLIND, STARTING_STACK - BIG_BLIND]
+        round_state = RoundState(0, 0, pips, stacks, self.hands, self.bounties, [])
+        for action, deck_size in zip(self.actions[:-1], self.deck_sizes):
+            round_state.deck = self.deck[:deck_size]
+            round_state.proceed(action)
+        round_state.deck = self.deck[:self.deck_sizes[-1]]
+        return round_state
 
     def get_bounty_hits(self):
         '''
@@ -31,10 +85,12 @@ class RoundState(namedtuple('_RoundState', ['button', 'street', 'pips', 'stacks'
                 - First boolean indicates if Player 1's bounty was hit
                 - Second boolean indicates if Player 2's bounty was hit
         '''
-        cards0 = self.hands[0] + self.deck
-        cards1 = self.hands[1] + self.deck
-        return (self.bounties[0] in [card[0] for card in cards0],
-                self.bounties[1] in [card[0] for card in cards1])
+        # the opponent's bounty is hidden ('-1'), so usually only one side needs checking
+        bounty0 = RANK_MASKS.get(self.bounties[0], 0)
+        bounty1 = RANK_MASKS.get(self.bounties[1], 0)
+        board = card_mask(self.deck)
+        return (bounty0 != 0 and ((card_mask(self.hands[0]) | board) & bounty0) != 0,
+                bounty1 != 0 and ((card_mask(self.hands[1]) | board) & bounty1) != 0)
 
     def showdown(self):
         '''
@@ -73,37 +129,44 @@ class RoundState(namedtuple('_RoundState', ['button', 'street', 'pips', 'stacks'
         '''
         if self.street == 5:
             return self.showdown()
-        new_street = 3 if self.street == 0 else self.street + 1
-        return RoundState(1, new_street, [0, 0], self.stacks, self.hands, self.bounties, self.deck, self)
+        self.street = 3 if self.street == 0 else self.street + 1
+        self.button = 1
+        self.pips[0] = self.pips[1] = 0
+        return self
 
     def proceed(self, action):
         '''
         Advances the game tree by one action performed by the active player.
         '''
         active = self.button % 2
+        pips = self.pips
+        stacks = self.stacks
+        self.actions.append(action)
+        self.deck_sizes.append(len(self.deck))
         if isinstance(action, FoldAction):
-            delta = self.stacks[0] - STARTING_STACK if active == 0 else STARTING_STACK - self.stacks[1]
+            delta = stacks[0] - STARTING_STACK if active == 0 else STARTING_STACK - stacks[1]
             return TerminalState([delta, -delta], self.get_bounty_hits(), self)
         if isinstance(action, CallAction):
             if self.button == 0:  # sb calls bb
-                return RoundState(1, 0, [BIG_BLIND] * 2, [STARTING_STACK - BIG_BLIND] * 2, self.hands, self.bounties, self.deck, self)
+                self.button = 1
+                pips[0] = pips[1] = BIG_BLIND
+                stacks[0] = stacks[1] = STARTING_STACK - BIG_BLIND
+                return self
             # both players acted
-            new_pips = list(self.pips)
-            new_stacks = list(self.stacks)
-            contribution = new_pips[1-active] - new_pips[active]
-            new_stacks[active] -= contribution
-            new_pips[active] += contribution
-            state = RoundState(self.button + 1, self.street, new_pips, new_stacks, self.hands, self.bounties, self.deck, self)
-            return state.proceed_street()
+            contribution = pips[1-active] - pips[active]
+            stacks[active] -= contribution
+            pips[active] += contribution
+            self.button += 1
+            return self.proceed_street()
         if isinstance(action, CheckAction):
             if (self.street == 0 and self.button > 0) or self.button > 1:  # both players acted
                 return self.proceed_street()
             # let opponent act
-            return RoundState(self.button + 1, self.street, self.pips, self.stacks, self.hands, self.bounties, self.deck, self)
+            self.button += 1
+            return self
         # isinstance(action, RaiseAction)
-        new_pips = list(self.pips)
-        new_stacks = list(self.stacks)
-        contribution = action.amount - new_pips[active]
-        new_stacks[active] -= contribution
-        new_pips[active] += contribution
-        return RoundState(self.button + 1, self.street, new_pips, new_stacks, self.hands, self.bounties, self.deck, self)
+        contribution = action.amount - pips[active]
+        stacks[active] -= contribution
+        pips[active] += contribution
+        self.button += 1
+        return self
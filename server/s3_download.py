@@ -0,0 +1,96 @@
+import collections
+import threading
+
+
+def _total_size(response):
+  # "bytes <first>-<last>/<total>" for a ranged response
+  if 'ContentRange' in response:
+    return int(response['ContentRange'].rsplit('/', 1)[1])
+  return response['ContentLength']
+
+
+class RangedObject(object):
+  """
+  A file-like, read-only view of an S3 object that is fetched as parallel byte-range GETs.
+
+  The first part is requested on its own, and its Content-Range header gives the object's
+  size, so no HEAD request is needed. After that, up to read_ahead parts are in flight or
+  waiting on executor, which downloads share, and finishing one part queues the next. So
+  at most read_ahead + 1 parts are held in memory, whatever the object's size. An object
+  that fits in one part costs exactly one GET, as a plain get_object would.
+
+  client is a boto3 S3 client, or anything with a compatible get_object.
+  """
+
+  def __init__(self, client, bucket, key, part_size, executor, read_ahead):
+    self.client = client
+    self.bucket = bucket
+    self.key = key
+    self.part_size = part_size
+    self.executor = executor
+    self.read_ahead = read_ahead
+    first = client.get_object(Bucket=bucket, Key=key, Range='bytes=0-{}'.format(part_size - 1))
+    self.size = _total_size(first)
+    self._body = first['Body']
+    self._parts = collections.deque()
+    self._next_start = part_size
+    self._lock = threading.Lock()
+    self._fill()
+
+  def _fill(self):
+    while len(self._parts) < self.read_ahead and self._next_start < self.size:
+      start = self._next_start
+      end = min(start + self.part_size, self.size) - 1
+      self._parts.append(self.executor.submit(self._get_range, start, end))
+      self._next_start = end + 1
+
+  def _get_range(self, start, end):
+    response = self.client.get_object(Bucket=self.bucket, Key=self.key, Range='bytes={}-{}'.format(start, end))
+    body = response['Body']
+    try:
+      return body.read()
+    finally:
+      body.close()
+
+  def read(self, amt=None):
+    """Returns up to amt bytes, or everything that is left if amt is None."""
+    with self._lock:
+      if amt is None:
+        return b''.join(iter(lambda: self._read(1024 ** 2), b''))
+      return self._read(amt)
+
+  def _read(self, amt):
+    while self._body is not None:
+      chunk = self._body.read(amt)
+      if chunk:
+        return chunk
+      self._body.close()
+      self._body = _Buffer(self._parts.popleft().result()) if self._parts else None
+      self._fill()
+    return b''
+
+  def close(self):
+    """Stops fetching the parts that have not been read."""
+    for part in self._parts:
+      part.cancel()
+    self._parts.clear()
+    self._next_start = self.size
+    if self._body is not None:
+      self._body.close()
+      self._body = None
+
+
+class _Buffer(object):
+  """A fetched part, read in chunks like a response body."""
+
+  def __init__(self, data):
+    self.data = memoryview(data)
+    self.offset = 0
+
+  def read(self, amt):
+    chunk = self.data[self.offset:self.offset + amt].tobytes()
+    self.offset += len(chunk)
+    return chunk
+
+  def close(self):
+    self.data = None
@@ -0,0 +1,59 @@
+import json
+import time
+
+from server.bot import percentile
+
+
+class StartupTimeline(object):
+  """
+  How long each start-up phase of a live game took, from the worker picking the game up
+  to the first hand being dealt to the hero.
+
+  Phases are marked as they end, with a monotonic clock, so each one's duration is the
+  time since the previous mark. A phase that happens twice (it shouldn't) adds up.
+  """
+
+  def __init__(self):
+    self.started_at = time.monotonic()
+    self.marked_at = self.started_at
+    self.phases = {}
+
+  def mark(self, phase):
+    now = time.monotonic()
+    self.phases[phase] = self.phases.get(phase, 0) + now - self.marked_at
+    self.marked_at = now
+
+  def as_json(self):
+    """Seconds per phase, in the order the phases ended, plus the total so far."""
+    data = {phase: round(seconds, 4) for phase, seconds in self.phases.items()}
+    data['total'] = round(self.marked_at - self.started_at, 4)
+    return data
+
+
+def summarize(timelines):
+  """
+  Aggregates timelines (as_json dicts) into {phase: {'games', 'p50', 'p95'}}, in seconds.
+  Phases only some games went through, such as the build on a cache miss, are summarized
+  over the games that had them.
+  """
+  samples = {}
+  for timeline in timelines:
+    for phase, seconds in timeline.items():
+      samples.setdefault(phase, []).append(seconds)
+  return {
+    phase: {
+      'games': len(values),
+      'p50': round(percentile(values, 0.5), 3),
+      'p95': round(percentile(values, 0.95), 3)
+    }
+    for phase, values in samples.items()
+  }
+
+
+def summarize_by_bot(games):
+  """Groups the start-up timelines of Game rows by bot id and summarizes each bot's."""
+  timelines = {}
+  for game in games:
+    if game.startup_timeline_json is not None:
+      timelines.setdefault(game.bot_id, []).append(json.loads(game.startup_timeline_json))
+  return {bot_id: summarize(bot_timelines) for bot_id, bot_timelines in timelines.items()}
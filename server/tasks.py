@@ -5,24 +5,54 @@ import os
 import sys
 import subprocess
 import datetime
-import zipfile
 import jinja2
 import socket
 import random
 import json
+import hashlib
+import select
+import threading
+import importlib.util
+import shutil
 
 from backports import tempfile
 
 from server import celery_app, app, db, socketio, redis
-from server.models import Bot, Team, Game, GameStatus
-from server.helpers import get_s3_object
+from server.models import Bot, BuildStatus, Team, Game, GameStatus
+from server.helpers import get_s3_object, get_s3_object_etag, put_s3_object
 from server.pokerbots_parser.runner import Runner
 from server.bot import Player
-
+from server.engine_service import EngineService
+from server.engine_zygote import EngineZygote
+from server.bot_archive import BotArchiveError, extract, pack, spool, unpack
+from server.bot_cache import BotCache, cache_key
+from server import compiler_cache
+from server.startup_timeline import StartupTimeline
+from server.warm_pool import WarmPool, WarmTable, most_requested
+
+from botocore.exceptions import ClientError
+from celery.signals import worker_ready
 from sqlalchemy.orm import raiseload
 
 DEPS_PATH = os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir, 'deps'))
 ENGINE_PATH = os.path.join(DEPS_PATH, 'engine-2025', 'engine.py')
+TEST_BOT_PATH = os.path.join(DEPS_PATH, 'test_bot.zip')
+TOURNAMENT_PATH = os.path.join(DEPS_PATH, 'engine-2025', 'tournament.py')
+ZYGOTE_PATH = os.path.join(DEPS_PATH, 'engine-2025', 'zygote.py')
+
+_engine_service = None
+_engine_service_lock = threading.Lock()
+_engine_zygote = None
+_engine_zygote_lock = threading.Lock()
+_bot_cache = None
+_bot_cache_lock = threading.Lock()
+# s3_key -> (ETag, monotonic time it was fetched)
+_bot_etags = {}
+_bot_etags_lock = threading.Lock()
+_warm_pool = None
+_warm_pool_lock = threading.Lock()
+_compiler_cache_reported = None
+_compiler_cache_lock = threading.Lock()
 
 
 # A large portion of this code is copied from mitpokerbots/scrimmage/scrimmage/tasks.py
@@ -34,17 +64,6 @@ def render_template(tpl_path, **context):
   ).get_template(filename).render(context)
 
 
-def _verify_zip(zip_file_path):
-  try:
-    total_size = 0
-    with zipfile.ZipFile(zip_file_path, 'r') as zip_ref:
-      for info in zip_ref.infolist():
-        total_size += info.file_size
-    return True, None
-  except zipfile.BadZipfile:
-    return False, 'Bot zip file is malformed'
-
-
 def _run_compile_command(command, bot_dir):
   command = subprocess.Popen(
     command,
@@ -74,30 +93,35 @@ def _compile_bot(bot_dir):
 
   return success, result
 
-def _download_and_verify(bot, tmp_dir):
-  bot_dir = os.path.join(tmp_dir, os.urandom(10).hex())
+def _download_and_verify(bot, bot_dir, timeline=None):
+  """
+  Streams the bot's zip into memory, or a spooled temporary file for large bots, and
+  extracts it straight into bot_dir/source. Archives over the size or entry limits are
+  rejected before they reach the disk.
+  """
+  timeline = timeline or StartupTimeline()
   os.mkdir(bot_dir)
-  bot_download_dir = os.path.join(bot_dir, 'download')
-  os.mkdir(bot_download_dir)
   bot_extract_dir = os.path.join(bot_dir, 'source')
   os.mkdir(bot_extract_dir)
 
-  bot_zip_path = os.path.join(bot_download_dir, 'bot.zip')
-  with open(bot_zip_path, 'wb') as bot_zip_file:
+  try:
     if app.debug:
-      with open(os.path.join(DEPS_PATH, 'test_bot.zip'), 'rb') as f:
-        bot_zip_file.write(f.read())
+      with open(TEST_BOT_PATH, 'rb') as f:
+        archive = spool(f, app.config['BOT_ZIP_MAX_BYTES'], app.config['BOT_ZIP_SPOOL_BYTES'])
     else:
-      bot_zip_file.write(get_s3_object(bot.s3_key).read())
-
-  valid_zip, msg = _verify_zip(bot_zip_path)
-  if not valid_zip:
-    return False, msg
+      body = get_s3_object(bot.s3_key, ranged=True)
+      try:
+        archive = spool(body, app.config['BOT_ZIP_MAX_BYTES'], app.config['BOT_ZIP_SPOOL_BYTES'])
+      finally:
+        body.close()
+    timeline.mark('download')
+    with archive:
+      extract(archive, bot_extract_dir, app.config['BOT_UNZIPPED_MAX_BYTES'], app.config['BOT_ZIP_MAX_ENTRIES'])
+  except BotArchiveError as e:
+    return False, str(e)
+  timeline.mark('extract')
 
   try:
-    with zipfile.ZipFile(bot_zip_path, 'r') as z:
-      z.extractall(bot_extract_dir)
-
     bot_dir = None
     for root, dirs, files in os.walk(bot_extract_dir):
       if 'commands.json' in files:
@@ -112,22 +136,244 @@ def _download_and_verify(bot, tmp_dir):
     return False, 'Bot zip is missing files. (Maybe missing commands.json?)'
 
 
+def _build_bot(bot_dir):
+  try:
+    with open(os.path.join(bot_dir, 'commands.json'), 'r') as commands_file:
+      build_command = json.load(commands_file)['build']
+  except (OSError, ValueError, KeyError, TypeError):
+    return False, 'commands.json is missing or misformatted'
+  if not build_command:
+    return True, ''
+  _report_compiler_cache()
+  try:
+    process = subprocess.run(
+      build_command,
+      cwd=bot_dir,
+      env=_get_environment(),
+      stdout=subprocess.PIPE,
+      stderr=subprocess.STDOUT,
+      timeout=app.config['BOT_BUILD_TIMEOUT']
+    )
+  except subprocess.TimeoutExpired:
+    return False, 'Timed out building the bot'
+  except (OSError, TypeError, ValueError) as e:
+    return False, 'Build command failed: {}'.format(e)
+  finally:
+    _report_compiler_cache()
+  return process.returncode == 0, process.stdout.decode(errors='replace')
+
+
+def _report_compiler_cache():
+  """
+  Adds the compiler cache hits and misses since the last report to the totals in Redis.
+  The first call only takes the baseline, so counts from earlier worker runs are skipped.
+  """
+  global _compiler_cache_reported
+  with _compiler_cache_lock:
+    current = compiler_cache.stats(app.config['COMPILER_CACHE_DIR'])
+    if _compiler_cache_reported is not None:
+      for language, counts in current.items():
+        for name, count in counts.items():
+          delta = count - _compiler_cache_reported.get(language, {}).get(name, 0)
+          if delta > 0:
+            redis.hincrby(compiler_cache.STATS_KEY, '{}:{}'.format(language, name), delta)
+    _compiler_cache_reported = current
+
+
+def get_bot_cache():
+  global _bot_cache
+  with _bot_cache_lock:
+    if _bot_cache is None:
+      _bot_cache = BotCache(app.config['BOT_CACHE_DIR'], app.config['BOT_CACHE_MAX_BYTES'])
+    return _bot_cache
+
+
+def _get_bot_etag(s3_key):
+  """
+  The bot zip's ETag, remembered for BOT_ETAG_TTL seconds so that games served from the
+  cache don't each pay a HEAD request. A zip re-uploaded under the same key is picked up
+  once the remembered ETag expires.
+  """
+  now = time.monotonic()
+  with _bot_etags_lock:
+    etag, fetched_at = _bot_etags.get(s3_key, (None, None))
+  if etag is not None and now - fetched_at < app.config['BOT_ETAG_TTL']:
+    return etag
+  etag = get_s3_object_etag(s3_key)
+  with _bot_etags_lock:
+    _bot_etags[s3_key] = (etag, now)
+  return etag
+
+
+def _get_bot_cache_key(bot):
+  if app.debug:
+    with open(TEST_BOT_PATH, 'rb') as f:
+      return cache_key(bot.s3_key, hashlib.md5(f.read()).hexdigest())
+  return cache_key(bot.s3_key, _get_bot_etag(bot.s3_key))
+
+
+def _prebuilt_key(key):
+  return '{}{}.tar.gz'.format(app.config['PREBUILT_BOT_PREFIX'], key)
+
+
+def _fetch_prebuilt(key, bot_root):
+  """
+  Downloads the bot the builds queue stored under key into bot_root/source. Returns the
+  bot directory, or None if there is no usable prebuilt bot.
+  """
+  source_dir = os.path.join(bot_root, 'source')
+  try:
+    body = get_s3_object(_prebuilt_key(key), ranged=True)
+    try:
+      archive = spool(body, app.config['BOT_UNZIPPED_MAX_BYTES'], app.config['BOT_ZIP_SPOOL_BYTES'])
+    finally:
+      body.close()
+    with archive:
+      os.makedirs(source_dir)
+      return unpack(archive, source_dir)
+  except (ClientError, BotArchiveError) as e:
+    print('Could not fetch prebuilt bot {}: {}'.format(key, e))
+    return None
+
+
+def _prepare_bot(bot, tmp_dir, timeline=None):
+  """
+  Returns (success, bot_dir or error message, prebuilt).
+
+  Bots are served from the artifact cache when possible, which skips the download,
+  the unzip and the build. On a miss the bot built by the builds queue is fetched if
+  there is one; otherwise the bot is downloaded and built here. Either way it is cached
+  if it built; a failed build is left for the engine to retry and report.
+  """
+  timeline = timeline or StartupTimeline()
+  bot_cache = get_bot_cache()
+  key = _get_bot_cache_key(bot)
+  timeline.mark('cache_lookup')
+  bot_dir = bot_cache.checkout(key, os.path.join(tmp_dir, 'cached'))
+  if bot_dir is not None:
+    timeline.mark('cache_checkout')
+    return True, bot_dir, True
+
+  bot_root = os.path.join(tmp_dir, os.urandom(10).hex())
+  if bot.build_status == BuildStatus.ready and not app.debug:
+    bot_dir = _fetch_prebuilt(key, bot_root)
+    timeline.mark('prebuilt_download')
+    if bot_dir is not None:
+      bot_cache.store(key, os.path.join(bot_root, 'source'), bot_dir, s3_key=bot.s3_key)
+      timeline.mark('cache_store')
+      return True, bot_dir, True
+    shutil.rmtree(bot_root, ignore_errors=True)
+
+  success, bot_dir = _download_and_verify(bot, bot_root, timeline)
+  if not success:
+    return False, bot_dir, False
+
+  built, output = _build_bot(bot_dir)
+  timeline.mark('build')
+  if built:
+    bot_cache.store(key, os.path.join(bot_root, 'source'), bot_dir, s3_key=bot.s3_key)
+    timeline.mark('cache_store')
+  return True, bot_dir, built
+
+
+def prebuild_bot(bot):
+  """
+  Downloads and builds an imported bot ahead of its first game, and stores the built tree
+  in S3 (and this worker's cache) for game workers to fetch instead of building it.
+  Records the outcome and how long it took on the bot.
+  """
+  start_time = time.monotonic()
+  bot.build_status = BuildStatus.building
+  bot.build_seconds = None
+  db.session.commit()
+
+  status = BuildStatus.failed
+  with tempfile.TemporaryDirectory() as tmp_dir:
+    key = _get_bot_cache_key(bot)
+    bot_root = os.path.join(tmp_dir, 'bot')
+    success, bot_dir = _download_and_verify(bot, bot_root)
+    if success:
+      built, output = _build_bot(bot_dir)
+      if built:
+        source_dir = os.path.join(bot_root, 'source')
+        if not app.debug:
+          with pack(source_dir, bot_dir, app.config['BOT_ZIP_SPOOL_BYTES']) as archive:
+            put_s3_object(_prebuilt_key(key), archive)
+        get_bot_cache().store(key, source_dir, bot_dir, s3_key=bot.s3_key)
+        status = BuildStatus.ready
+      else:
+        print('Prebuild of bot {} failed:\n{}'.format(bot.id, output))
+    else:
+      print('Prebuild of bot {} failed: {}'.format(bot.id, bot_dir))
+
+  bot.build_status = status
+  bot.build_seconds = round(time.monotonic() - start_time, 3)
+  db.session.commit()
+
+
 def _get_environment():
   base = os.environ.copy()
   for key in app.config.keys():
     if key in os.environ:
       del base[key]
-  return base
+  return compiler_cache.build_environment(base, app.config['COMPILER_CACHE_DIR'], app.config['COMPILER_CACHE_MAX_BYTES'])
 
 
-def write_config(game_dir, bot_dir):
+def write_config(game_dir, bot_dir, bot_prebuilt=False):
   with open(os.path.join(game_dir, 'config.py'), 'w') as config_file:
-    config_txt = render_template('config.txt', bot_path=bot_dir)
+    config_txt = render_template('config.txt', bot_path=bot_dir, bot_prebuilt=bot_prebuilt)
     config_file.write(config_txt)
 
+
+class EngineNotReadyError(Exception):
+  pass
+
+
+def _wait_for_engine(engine_process, ready_fd, timeout):
+  """
+  Blocks until the engine reports the address it is listening on for the hero: a port,
+  or "unix:<path>" for a Unix domain socket.
+
+  The engine writes "<name> <address>" to the readiness pipe as soon as it is listening,
+  so there is no fixed start-up delay. Raises EngineNotReadyError if the engine exits
+  or stays silent for timeout seconds.
+  """
+  deadline = time.monotonic() + timeout
+  data = b''
+  while not data.endswith(b'\n'):
+    remaining = deadline - time.monotonic()
+    if remaining <= 0:
+      raise EngineNotReadyError('Engine did not become ready within {}s'.format(timeout))
+    readable, _, _ = select.select([ready_fd], [], [], remaining)
+    if not readable:
+      continue
+    chunk = os.read(ready_fd, 64)
+    if not chunk:
+      try:
+        returncode = engine_process.wait(timeout=1)
+      except subprocess.TimeoutExpired:
+        returncode = None
+      raise EngineNotReadyError('Engine closed its readiness pipe (exit code {}) before becoming ready'.format(returncode))
+    data += chunk
+  name, address = data.decode().split()
+  if name == 'exit':
+    # a zygote engine reports its exit code on the same connection
+    raise EngineNotReadyError('Engine exited with code {} before becoming ready'.format(address))
+  return address
+
+
 def create_runner(bot, host, port):
     try:
-        sock = socket.create_connection((host, port))
+        if port.startswith('unix:'):
+            sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            try:
+                sock.connect(port[len('unix:'):])
+            except socket.error:
+                sock.close()
+                raise
+        else:
+            sock = socket.create_connection((host, int(port)))
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
     except socket.error as e:
         print('Error connecting to {}:{}. Aborting. The exact error was {}'.format(host, port, e))
         return None, None
@@ -136,69 +382,309 @@ def create_runner(bot, host, port):
     runner = Runner(bot, socketfile)
     return runner, sock
 
-def run_bot_and_game(game, tmp_dir, bot_dir):
+def get_engine_service():
+  global _engine_service
+  with _engine_service_lock:
+    if _engine_service is None:
+      _engine_service = EngineService(load_tournament().load_engine, render_template('config.txt', bot_path='', bot_prebuilt=False))
+    return _engine_service
+
+
+def get_engine_zygote():
+  """Returns this worker's engine zygote, starting it again if it has died."""
+  global _engine_zygote
+  with _engine_zygote_lock:
+    if _engine_zygote is None or not _engine_zygote.alive:
+      _engine_zygote = EngineZygote(ZYGOTE_PATH, env=_get_environment())
+    return _engine_zygote
+
+
+def _start_engine_process(game_dir, bot_dir, bot_prebuilt):
+  """
+  Starts an engine for one game and returns (process, readiness fd).
+
+  In 'zygote' mode the engine is forked from the already warm zygote and gets its config
+  directly; otherwise `python engine.py` starts cold and reads config.py from game_dir.
+  """
+  if app.config['ENGINE_MODE'] == 'zygote':
+    config_source = render_template('config.txt', bot_path=bot_dir, bot_prebuilt=bot_prebuilt)
+    engine_process = get_engine_zygote().spawn(game_dir, config_source, app.config['ENGINE_READY_TIMEOUT'])
+    return engine_process, engine_process.ready_fd
+  write_config(game_dir, bot_dir, bot_prebuilt)
+  ready_read, ready_write = os.pipe()
+  engine_process = subprocess.Popen(
+    ['python', ENGINE_PATH, '--ready-fd', str(ready_write)],
+    cwd=game_dir,
+    env=_get_environment(),
+    pass_fds=(ready_write,)
+  )
+  os.close(ready_write)
+  return engine_process, ready_read
+
+
+def _close_hero(game, player):
+  player.close()
+  latency = player.latency_summary()
+  if latency is not None:
+    print('Click-to-engine latency (ms, *_cross_host spans two clocks) for game {}: {}'.format(game.uuid, json.dumps(latency)))
+
+
+def _play_hero(game, sock, timeline=None):
+  pubsub = redis.pubsub()
+  pubsub.subscribe(game.uuid)
+  player = Player(db_game=game, pubsub=pubsub, timeline=timeline)
+  player.set_sock(sock)
+  runner = Runner(player, sock.makefile('rw'))
+  try:
+    runner.run()
+  except socket.error:
+    pass
+  finally:
+    _close_hero(game, player)
+  return player
+
+
+def _play_on_table(game, table, timeline=None):
+  engine_service = get_engine_service()
+  try:
+    game.send_message({
+      'status': 'starting_game'
+    })
+    table.release()
+    player = _play_hero(game, table.sock, timeline)
+  finally:
+    engine_service.close_table(table)
+
+  return "The game is done! Your final bankroll: {}".format(player.bankroll)
+
+
+def run_bot_and_game_in_daemon(game, tmp_dir, bot_dir, bot_prebuilt, timeline=None):
+  game_dir = os.path.join(tmp_dir, 'game')
+  os.mkdir(game_dir)
+  # the bot must not see the worker's credentials
+  table = get_engine_service().start_table(game_dir, bot_dir, bot_prebuilt, env=_get_environment())
+  if timeline is not None:
+    timeline.mark('engine_start')
+    # the table's thread builds the bot unless it is prebuilt, then runs it and waits for it
+    if table.wait_parked(app.config['ENGINE_READY_TIMEOUT']) and table.bot_connected:
+      timeline.mark('connect')
+  return _play_on_table(game, table, timeline)
+
+
+def run_bot_and_game(game, tmp_dir, bot_dir, bot_prebuilt=False, timeline=None):
+  if app.config['ENGINE_MODE'] == 'daemon':
+    return run_bot_and_game_in_daemon(game, tmp_dir, bot_dir, bot_prebuilt, timeline)
+
   game_dir = os.path.join(tmp_dir, 'game')
   os.mkdir(game_dir)
-  write_config(game_dir, bot_dir)
-  engine_process = subprocess.Popen(['python', ENGINE_PATH], cwd=game_dir, env=_get_environment())
+  start_time = time.monotonic()
+  engine_process, ready_read = _start_engine_process(game_dir, bot_dir, bot_prebuilt)
+  player = None
   try:
     game.send_message({
       'status': 'starting_game'
     })
-    # Give the Java VM some time to start up.
-    time.sleep(2)
+    port = _wait_for_engine(engine_process, ready_read, app.config['ENGINE_READY_TIMEOUT'])
+    print('Engine for game {} listening after {:.3f}s ({} mode)'.format(
+      game.uuid, time.monotonic() - start_time, app.config['ENGINE_MODE']))
+    if timeline is not None:
+      timeline.mark('engine_start')
     pubsub = redis.pubsub()
     pubsub.subscribe(game.uuid)
-    player = Player(db_game=game, pubsub=pubsub)
-    runner, sock = create_runner(player, 'localhost', 4514)
+    player = Player(db_game=game, pubsub=pubsub, timeline=timeline)
+    runner, sock = create_runner(player, 'localhost', port)
     if runner is None or sock is None:
-      os.listdir(game_dir)
-      os.listdir(bot_dir)
-      os.listdir(tmp_dir)
-      raise Exception("Couldn't connect to socket")
+      raise EngineNotReadyError("Couldn't connect to the engine at {}".format(port))
+    if timeline is not None:
+      timeline.mark('connect')
     player.set_sock(sock)
     runner.run()
   except socket.error:
     pass
   finally:
+    if player is not None:
+      _close_hero(game, player)
+    os.close(ready_read)
     engine_process.kill()
     engine_process.wait()
 
   return "The game is done! Your final bankroll: {}".format(player.bankroll)
 
 
-def play_live_game(game):
+def _warm_key(bot):
+  return (bot.id, bot.s3_key)
+
+
+def _popular_warm_keys(count):
+  with app.app_context():
+    bot_ids = most_requested(redis, count)
+    bots = {bot.id: bot for bot in Bot.query.filter(Bot.id.in_(bot_ids))} if bot_ids else {}
+    return [_warm_key(bots[bot_id]) for bot_id in bot_ids if bot_id in bots]
+
+
+def _launch_warm_table(key):
+  """Prepares the bot for key and parks a held table for it once the bot has connected."""
+  bot_id, s3_key = key
+  with app.app_context():
+    bot = Bot.query.get(bot_id)
+    if bot is None or bot.s3_key != s3_key:
+      return None
+    tmp_dir = tempfile.TemporaryDirectory()
+    try:
+      success, bot_dir, bot_prebuilt = _prepare_bot(bot, tmp_dir.name)
+      if success:
+        game_dir = os.path.join(tmp_dir.name, 'game')
+        os.mkdir(game_dir)
+        engine_service = get_engine_service()
+        # parked bots live for up to WARM_POOL_MAX_AGE, so they must not hold the worker's secrets
+        table = engine_service.start_table(game_dir, bot_dir, bot_prebuilt, hold=True, env=_get_environment())
+        if table.wait_parked(app.config['WARM_POOL_LAUNCH_TIMEOUT']) and table.bot_connected:
+          return WarmTable(key, table, tmp_dir)
+        engine_service.close_table(table)
+    except Exception:
+      tmp_dir.cleanup()
+      raise
+    tmp_dir.cleanup()
+    return None
+
+
+def get_warm_pool():
+  """Returns this worker's warm pool, or None if it is disabled."""
+  global _warm_pool
+  if app.config['ENGINE_MODE'] != 'daemon' or app.config['WARM_POOL_SIZE'] <= 0:
+    return None
+  with _warm_pool_lock:
+    if _warm_pool is None:
+      _warm_pool = WarmPool(
+        get_engine_service(),
+        _launch_warm_table,
+        _popular_warm_keys,
+        app.config['WARM_POOL_SIZE'],
+        app.config['WARM_POOL_DEPTH'],
+        app.config['WARM_POOL_MAX_AGE'],
+        app.config['WARM_POOL_REFILL_INTERVAL'],
+        app.config['MAX_CONCURRENT_GAMES']
+      ).start()
+    return _warm_pool
+
+
+def _consumed_queues(consumer):
+  task_consumer = getattr(consumer, 'task_consumer', None)
+  return {queue.name for queue in getattr(task_consumer, 'queues', [])}
+
+
+@worker_ready.connect
+def start_warm_pool(sender=None, **kwargs):
+  # workers that only consume the builds queue never host games
+  queues = _consumed_queues(sender)
+  if queues and queues <= {app.config['BUILD_QUEUE']}:
+    return
+  get_warm_pool()
+
+
+def _finish_game(game, message, timeline):
+  """Marks the game completed and sends its final message, with the start-up timeline."""
+  startup = timeline.as_json()
+  print('Startup timeline (s) for game {}: {}'.format(game.uuid, json.dumps(startup)))
+  game.startup_timeline_json = json.dumps(startup)
+  game.status = GameStatus.completed
+  game.send_message({
+    'message': message,
+    'startup_timeline': startup
+  })
+
+
+def play_live_game(game, timeline=None):
+  timeline = timeline or StartupTimeline()
   game.status = GameStatus.in_progress
+  bot = game.bot
+  # warm games report the same statuses as cold ones; the client waits for starting_game
   game.send_message({
     'status': 'download_and_compile'
   })
 
-  bot = game.bot
+  warm_pool = get_warm_pool()
+  warm_table = warm_pool.claim(_warm_key(bot)) if warm_pool is not None else None
+  if warm_table is not None:
+    timeline.mark('warm_table')
+    try:
+      message = _play_on_table(game, warm_table.table, timeline)
+    finally:
+      warm_table.tmp_dir.cleanup()
+    _finish_game(game, message, timeline)
+    return
+  if warm_pool is not None:
+    warm_pool.make_room()
 
   with tempfile.TemporaryDirectory() as tmp_dir:
-    success, bot_dir = _download_and_verify(bot, tmp_dir)
+    success, bot_dir, bot_prebuilt = _prepare_bot(bot, tmp_dir, timeline)
     if not success:
-      game.status = GameStatus.completed
-      game.send_message({
-        'message': 'The bot failed to compile, so you win!' + bot_dir
-      })
+      _finish_game(game, 'The bot failed to compile, so you win!' + bot_dir, timeline)
       return
 
-    message = run_bot_and_game(game, tmp_dir, bot_dir)
+    message = run_bot_and_game(game, tmp_dir, bot_dir, bot_prebuilt, timeline)
 
+  _finish_game(game, message, timeline)
 
-  game.status = GameStatus.completed
-  game.send_message({
-    'message': message
-  })
+
+def load_tournament():
+  """Imports the engine's tournament runner."""
+  module = sys.modules.get('pokerbots_tournament')
+  if module is None:
+    spec = importlib.util.spec_from_file_location('pokerbots_tournament', TOURNAMENT_PATH)
+    module = importlib.util.module_from_spec(spec)
+    # registered so that pool workers can find init_worker and play_match when unpickling
+    sys.modules[spec.name] = module
+    spec.loader.exec_module(module)
+  return module
+
+
+def run_tournament(bots, jobs=None, matches_per_pair=2, output_dir=None):
+  """
+  Plays a round robin between Bot rows with the live game config.
+
+  Returns the tournament runner's (standings, matches). Bots that fail to download are
+  left out.
+  """
+  tournament = load_tournament()
+  with tempfile.TemporaryDirectory() as tmp_dir:
+    bot_dirs = {}
+    for bot in bots:
+      bot_tmp_dir = os.path.join(tmp_dir, str(bot.id))
+      os.mkdir(bot_tmp_dir)
+      success, bot_dir, _ = _prepare_bot(bot, bot_tmp_dir)
+      if not success:
+        print('Skipping {} ({}): {}'.format(bot.name, bot.id, bot_dir))
+        continue
+      bot_dirs['{}/{}'.format(bot.team.name, bot.name)] = bot_dir
+    config_source = render_template('config.txt', bot_path='', bot_prebuilt=False)
+    return tournament.run_tournament(bot_dirs, config_source, jobs, matches_per_pair, output_dir=output_dir)
+
+
+@celery_app.task(ignore_result=True)
+def prebuild_bot_task(bot_id):
+  bot = Bot.query.get(bot_id)
+  if bot is None:
+    # replaced by a later import
+    return
+  try:
+    prebuild_bot(bot)
+  except:
+    bot.build_status = BuildStatus.failed
+    db.session.commit()
+    raise
 
 
 @celery_app.task(ignore_result=True)
 def play_live_game_task(game_id):
   game = Game.query.get(game_id)
+  timeline = StartupTimeline()
   try:
-      play_live_game(game)
+      play_live_game(game, timeline)
   except:
+      # failed start-ups belong in the start-up percentiles too; the final message commits it
+      timeline.mark('internal_error')
+      game.startup_timeline_json = json.dumps(timeline.as_json())
       game.status = GameStatus.internal_error
       game.send_message(None)
       raise
@@ -3,10 +3,14 @@ from flask import abort, session, g, Response, request, render_template, send_fr
 from flask_socketio import emit, join_room
 import json
 import os
+import time
 
 from server import app, db, socketio, redis
 from server.models import Game, GameStatus, Bot, Team
-from server.tasks import play_live_game_task
+from server.compiler_cache import STATS_KEY, hit_rates
+from server.startup_timeline import summarize_by_bot
+from server.tasks import play_live_game_task, prebuild_bot_task
+from server.warm_pool import POPULARITY_KEY, record_request
 
 def _check_auth(username, password):
   """This function is called to check if a username /
@@ -39,13 +43,20 @@ def replace_imported_bots(json_text):
     Bot.query.delete()
     Team.query.delete()
     data = json.loads(json_text)
+    new_bots = []
     for team in data['teams']:
         new_team = Team(team['name'])
         db.session.add(new_team)
         for bot in team['bots']:
             new_bot = Bot(new_team, bot['name'], bot['s3_key'])
             db.session.add(new_bot)
+            new_bots.append(new_bot)
     db.session.commit()
+    # bot ids change on import, so the old popularity counts no longer apply
+    redis.delete(POPULARITY_KEY)
+    # build every bot ahead of its first game, in parallel across the builds queue's workers
+    for new_bot in new_bots:
+        prebuild_bot_task.delay(new_bot.id)
 
 @app.route('/hello', methods=['GET', 'POST', 'OPTIONS'])
 def check():
@@ -58,7 +69,10 @@ def admin_page():
         replace_imported_bots(request.form['export_data'])
 
     teams = Team.query.all()
-    return render_template('admin.html', teams=teams)
+    recent_games = Game.query.filter(Game.startup_timeline_json.isnot(None)) \
+        .order_by(Game.id.desc()).limit(app.config['STARTUP_TIMELINE_WINDOW']).all()
+    return render_template('admin.html', teams=teams, startup=summarize_by_bot(recent_games),
+                           compiler_cache=hit_rates(redis.hgetall(STATS_KEY)))
 
 # Serve React App
 @app.route('/', defaults={'path': ''})
@@ -94,6 +108,7 @@ def on_create_game(bot_id):
   game = Game(bot)
   db.session.add(game)
   db.session.commit()
+  record_request(redis, bot.id)
   play_live_game_task.delay(game.id)
   return game.uuid
 
@@ -107,7 +122,7 @@ def on_join_game(game_uuid):
   if game.status == GameStatus.created or game.status == GameStatus.in_progress:
     join_room(game.uuid)
   
-  return game.as_json()
+  return game.as_json(live=True)
 
 
 @socketio.on('game_ping')
@@ -117,6 +132,9 @@ def on_ping(game_uuid):
 
 @socketio.on('game_action')
 def on_action(game_uuid, game_action):
+  if isinstance(game_action, dict):
+    # lets the worker measure click-to-engine latency
+    game_action = dict(game_action, published_at=time.time())
   redis.publish(game_uuid, json.dumps(game_action))
 
 
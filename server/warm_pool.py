@@ -0,0 +1,163 @@
+import threading
+import time
+
+POPULARITY_KEY = 'warm_pool:popularity'
+
+
+def record_request(redis, bot_id):
+  """Counts a game request towards the bot's place in the warm pool."""
+  redis.zincrby(POPULARITY_KEY, 1, bot_id)
+
+
+def most_requested(redis, count):
+  """Returns the ids of the count most requested bots, most popular first."""
+  if count <= 0:
+    return []
+  return [int(bot_id) for bot_id in redis.zrevrange(POPULARITY_KEY, 0, count - 1)]
+
+
+class WarmTable(object):
+  """An engine table whose bot is built, running and connected, parked before the first hand."""
+
+  def __init__(self, key, table, tmp_dir):
+    self.key = key
+    self.table = table
+    self.tmp_dir = tmp_dir
+    self.parked_at = time.monotonic()
+
+  @property
+  def age(self):
+    return time.monotonic() - self.parked_at
+
+  @property
+  def alive(self):
+    bot_subprocess = self.table.players[1].bot_subprocess
+    return self.table.thread.is_alive() and (bot_subprocess is None or bot_subprocess.poll() is None)
+
+
+class WarmPool(object):
+  """
+  Keeps depth parked tables for each of the size most requested bots.
+
+  launch(key) builds and connects a table for key and returns a WarmTable, or None if
+  the bot can't be launched. popular(count) returns the keys that should be warm, most
+  popular first. A background thread refills the pool after every claim and every
+  refill_interval seconds, and relaunches tables older than max_age. Every wanted bot
+  gets its first table before any gets its second.
+
+  Parked tables count towards max_tables, the engine service's budget of tables shared
+  with live games: the pool only launches into free slots, and make_room gives one back
+  for a game that is about to start cold.
+  """
+
+  def __init__(self, engine_service, launch, popular, size, depth, max_age, refill_interval, max_tables):
+    self.engine_service = engine_service
+    self.launch = launch
+    self.popular = popular
+    self.size = size
+    self.depth = depth
+    self.max_age = max_age
+    self.refill_interval = refill_interval
+    self.max_tables = max_tables
+    self.lock = threading.Lock()
+    # key -> parked WarmTables, oldest first
+    self.tables = {}
+    # keys whose launch failed, so a broken bot isn't rebuilt on every pass
+    self.failed = {}
+    self.wakeup = threading.Event()
+    self.thread = threading.Thread(target=self._refill_loop, daemon=True)
+
+  def start(self):
+    self.thread.start()
+    return self
+
+  def claim(self, key):
+    """
+    Takes a live parked table for key out of the pool, or returns None.
+
+    The caller owns the returned WarmTable: it must release() and eventually close its
+    table, and clean up its tmp_dir.
+    """
+    claimed, dead = None, []
+    with self.lock:
+      warm_tables = self.tables.get(key, [])
+      while warm_tables and claimed is None:
+        warm_table = warm_tables.pop(0)
+        if warm_table.alive:
+          claimed = warm_table
+        else:
+          dead.append(warm_table)
+      if not warm_tables:
+        self.tables.pop(key, None)
+    self.wakeup.set()
+    for warm_table in dead:
+      self.discard(warm_table)
+    return claimed
+
+  def make_room(self):
+    """Discards the oldest parked table if live games and parked tables fill the budget."""
+    with self.lock:
+      if not self.tables or self.engine_service.num_tables < self.max_tables:
+        return
+      parked = [warm_table for warm_tables in self.tables.values() for warm_table in warm_tables]
+      warm_table = max(parked, key=lambda table: table.age)
+      self._remove(warm_table)
+    self.discard(warm_table)
+
+  def discard(self, warm_table):
+    try:
+      self.engine_service.close_table(warm_table.table)
+    finally:
+      warm_table.tmp_dir.cleanup()
+
+  def _remove(self, warm_table):
+    warm_tables = self.tables[warm_table.key]
+    warm_tables.remove(warm_table)
+    if not warm_tables:
+      del self.tables[warm_table.key]
+
+  def refill(self):
+    wanted = self.popular(self.size)
+    now = time.monotonic()
+    with self.lock:
+      stale = [
+        warm_table for key, warm_tables in self.tables.items() for warm_table in warm_tables
+        if key not in wanted or warm_table.age > self.max_age or not warm_table.alive
+      ]
+      for warm_table in stale:
+        self._remove(warm_table)
+      launchable = [key for key in wanted if now - self.failed.get(key, -self.max_age) >= self.max_age]
+      missing = [
+        key for level in range(self.depth) for key in launchable
+        if len(self.tables.get(key, [])) <= level
+      ]
+    for warm_table in stale:
+      self.discard(warm_table)
+    failed = set()
+    for key in missing:
+      if self.engine_service.num_tables >= self.max_tables:
+        break
+      if key in failed:
+        continue
+      warm_table = self.launch(key)
+      if warm_table is None:
+        failed.add(key)
+        self.failed[key] = time.monotonic()
+        continue
+      self.failed.pop(key, None)
+      with self.lock:
+        self.tables.setdefault(key, []).append(warm_table)
+
+  def _refill_loop(self):
+    while True:
+      try:
+        self.refill()
+      except Exception as e:
+        print('Warm pool refill failed: {}'.format(e))
+      self.wakeup.wait(self.refill_interval)
+      self.wakeup.clear()
+
+  @property
+  def num_tables(self):
+    with self.lock:
+      return sum(len(warm_tables) for warm_tables in self.tables.values())
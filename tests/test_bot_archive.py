@@ -0,0 +1,120 @@
+import io
+import os
+import tarfile
+import zipfile
+
+import pytest
+
+from server.bot_archive import BOT_DIR_HEADER, BotArchiveError, extract, pack, spool, unpack
+
+
+def make_zip(files):
+  archive = io.BytesIO()
+  with zipfile.ZipFile(archive, 'w', zipfile.ZIP_DEFLATED) as zip_file:
+    for name, data in files.items():
+      zip_file.writestr(name, data)
+  archive.seek(0)
+  return archive
+
+
+def test_extract_writes_a_small_bot(tmp_path):
+  extract(make_zip({'bot/commands.json': '{}', 'bot/player.py': 'pass'}), str(tmp_path), 1024, 10)
+  assert (tmp_path / 'bot' / 'player.py').read_text() == 'pass'
+
+
+def test_extract_rejects_a_zip_bomb_before_writing(tmp_path):
+  # 64 MB of zeros deflates to about 64 KB
+  bomb = make_zip({'bot/commands.json': '{}', 'bot/zeros': b'\0' * 64 * 1024 ** 2})
+  assert len(bomb.getvalue()) < 1024 ** 2
+  with pytest.raises(BotArchiveError, match='unpacks to more than'):
+    extract(bomb, str(tmp_path), 1024 ** 2, 10)
+  assert os.listdir(str(tmp_path)) == []
+
+
+def test_extract_rejects_too_many_entries(tmp_path):
+  archive = make_zip({'bot/{}.txt'.format(i): '' for i in range(20)})
+  with pytest.raises(BotArchiveError, match='more than 10 files'):
+    extract(archive, str(tmp_path), 1024, 10)
+  assert os.listdir(str(tmp_path)) == []
+
+
+def test_extract_rejects_a_malformed_zip(tmp_path):
+  with pytest.raises(BotArchiveError, match='malformed'):
+    extract(io.BytesIO(b'not a zip'), str(tmp_path), 1024, 10)
+
+
+def test_spool_stops_reading_past_the_limit():
+  stream = io.BytesIO(b'x' * 10000)
+  with pytest.raises(BotArchiveError):
+    spool(stream, 4000, 1024, chunk_size=1000)
+  assert stream.tell() == 5000
+
+
+def test_spool_keeps_the_whole_stream():
+  with spool(io.BytesIO(b'x' * 3000), 4000, 1024, chunk_size=1000) as archive:
+    assert archive.read() == b'x' * 3000
+
+
+
+def make_tar(members, bot_dir='.'):
+  archive = io.BytesIO()
+  with tarfile.open(fileobj=archive, mode='w:gz', format=tarfile.PAX_FORMAT,
+                    pax_headers={BOT_DIR_HEADER: bot_dir}) as tar:
+    for member, data in members:
+      tar.addfile(member, io.BytesIO(data) if data is not None else None)
+  archive.seek(0)
+  return archive
+
+
+def file_member(name, data):
+  member = tarfile.TarInfo(name)
+  member.size = len(data)
+  return member, data
+
+
+def link_member(name, target, kind=tarfile.SYMTYPE):
+  member = tarfile.TarInfo(name)
+  member.type = kind
+  member.linkname = target
+  return member, None
+
+
+def test_pack_and_unpack_keep_the_bot_dir(tmp_path):
+  bot_dir = tmp_path / 'source' / 'nested' / 'bot'
+  bot_dir.mkdir(parents=True)
+  (bot_dir / 'commands.json').write_text('{}')
+  os.symlink('commands.json', str(bot_dir / 'link.json'))
+  with pack(str(tmp_path / 'source'), str(bot_dir), 1024 ** 2) as archive:
+    unpacked = unpack(archive, str(tmp_path / 'out'))
+  assert unpacked == str(tmp_path / 'out' / 'nested' / 'bot')
+  assert os.path.exists(os.path.join(unpacked, 'commands.json'))
+  assert os.readlink(os.path.join(unpacked, 'link.json')) == 'commands.json'
+
+
+@pytest.mark.parametrize('member', [
+  file_member('../escape.txt', b'x'),
+  file_member('/tmp/escape.txt', b'x'),
+  file_member('bot/../../escape.txt', b'x'),
+  link_member('bot/link', '/etc/passwd'),
+  link_member('bot/link', '../../etc/passwd'),
+  link_member('bot/link', '../etc/passwd', tarfile.LNKTYPE),
+], ids=['parent', 'absolute', 'nested-parent', 'absolute-symlink', 'escaping-symlink', 'escaping-hardlink'])
+def test_unpack_rejects_members_outside_dest(tmp_path, member):
+  dest = tmp_path / 'out'
+  dest.mkdir()
+  with pytest.raises(BotArchiveError):
+    unpack(make_tar([file_member('bot/commands.json', b'{}'), member]), str(dest))
+  assert os.listdir(str(dest)) == []
+  assert not (tmp_path / 'escape.txt').exists()
+
+
+def test_unpack_rejects_special_files(tmp_path):
+  fifo = tarfile.TarInfo('bot/fifo')
+  fifo.type = tarfile.FIFOTYPE
+  with pytest.raises(BotArchiveError, match='special file'):
+    unpack(make_tar([(fifo, None)]), str(tmp_path))
+
+
+def test_unpack_rejects_a_bot_dir_outside_the_archive(tmp_path):
+  with pytest.raises(BotArchiveError, match='where its bot is'):
+    unpack(make_tar([file_member('bot/commands.json', b'{}')], bot_dir='../bot'), str(tmp_path))
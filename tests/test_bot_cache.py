@@ -0,0 +1,100 @@
+import os
+import threading
+import time
+
+import pytest
+
+from server.bot_cache import BotCache
+
+
+def make_bot(tmp_path, name, size):
+  source_dir = tmp_path / 'build-{}'.format(name)
+  bot_dir = source_dir / 'bot'
+  bot_dir.mkdir(parents=True)
+  (bot_dir / 'commands.json').write_text('{}')
+  (bot_dir / 'payload').write_bytes(b'x' * (size - 2))
+  return str(source_dir), str(bot_dir)
+
+
+def age(cache, key, seconds_ago):
+  meta_path = os.path.join(cache.root, key, BotCache.META_FILE)
+  then = os.path.getmtime(meta_path) - seconds_ago
+  os.utime(meta_path, (then, then))
+
+
+def test_checkout_returns_the_stored_bot(tmp_path):
+  cache = BotCache(str(tmp_path / 'cache'), 10000)
+  assert cache.checkout('a', str(tmp_path / 'miss')) is None
+  cache.store('a', *make_bot(tmp_path, 'a', 1000))
+  bot_dir = cache.checkout('a', str(tmp_path / 'out'))
+  assert bot_dir == str(tmp_path / 'out' / 'bot')
+  assert os.path.getsize(os.path.join(bot_dir, 'payload')) == 998
+
+
+def test_eviction_is_by_bytes_least_recently_used_first(tmp_path):
+  cache = BotCache(str(tmp_path / 'cache'), 2500)
+  cache.store('a', *make_bot(tmp_path, 'a', 1000))
+  cache.store('b', *make_bot(tmp_path, 'b', 1000))
+  age(cache, 'a', 200)
+  age(cache, 'b', 100)
+  # using a makes b the least recently used
+  cache.checkout('a', str(tmp_path / 'out'))
+  cache.store('c', *make_bot(tmp_path, 'c', 1000))
+  assert sorted(name for name in os.listdir(cache.root) if not name.startswith('.')) == ['a', 'c']
+  assert cache.total_bytes == 2000
+
+
+def test_one_large_entry_evicts_several_small_ones(tmp_path):
+  cache = BotCache(str(tmp_path / 'cache'), 3000)
+  for name in 'abc':
+    cache.store(name, *make_bot(tmp_path, name, 1000))
+  cache.store('big', *make_bot(tmp_path, 'big', 2500))
+  assert cache.total_bytes <= 3000
+  assert cache.checkout('big', str(tmp_path / 'out')) is not None
+
+
+def test_entries_larger_than_the_cache_are_not_stored(tmp_path):
+  cache = BotCache(str(tmp_path / 'cache'), 500)
+  assert not cache.store('a', *make_bot(tmp_path, 'a', 1000))
+  assert cache.total_bytes == 0
+
+
+def test_concurrent_stores_stay_within_the_budget(tmp_path):
+  cache = BotCache(str(tmp_path / 'cache'), 5000)
+  bots = [make_bot(tmp_path, str(i), 1000) for i in range(12)]
+  threads = [
+    threading.Thread(target=cache.store, args=(str(i % 6),) + bot)
+    for i, bot in enumerate(bots)
+  ]
+  for thread in threads:
+    thread.start()
+  for thread in threads:
+    thread.join()
+  names = os.listdir(cache.root)
+  assert not [name for name in names if name.startswith('.staging-')]
+  assert cache.total_bytes <= 5000
+  for name in names:
+    if not name.startswith('.'):
+      assert cache.checkout(name, str(tmp_path / 'out' / name)) is not None
+
+
+def test_failed_stores_leave_no_staging_dirs(tmp_path):
+  cache = BotCache(str(tmp_path / 'cache'), 10000)
+  with pytest.raises(TypeError):
+    # metadata that can't be written as JSON fails the store after the copy
+    cache.store('a', *make_bot(tmp_path, 'a', 1000), unserializable=object())
+  assert os.listdir(cache.root) == []
+  assert cache.checkout('a', str(tmp_path / 'out')) is None
+
+
+def test_abandoned_staging_dirs_are_removed(tmp_path):
+  cache = BotCache(str(tmp_path / 'cache'), 10000)
+  abandoned = os.path.join(cache.root, BotCache.STAGING_PREFIX + 'old')
+  recent = os.path.join(cache.root, BotCache.STAGING_PREFIX + 'new')
+  os.makedirs(abandoned)
+  os.makedirs(recent)
+  then = time.time() - BotCache.STAGING_MAX_AGE - 1
+  os.utime(abandoned, (then, then))
+  cache.store('a', *make_bot(tmp_path, 'a', 1000))
+  assert not os.path.exists(abandoned)
+  assert os.path.exists(recent)
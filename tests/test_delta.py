@@ -0,0 +1,64 @@
+import json
+
+from server import delta
+
+
+def round_trip(messages):
+  """Sends messages as diff would and rebuilds each one from the previous as a client."""
+  rebuilt = messages[0]
+  for previous, message in zip(messages, messages[1:]):
+    update = delta.diff(previous, message)
+    assert update is not None
+    # updates reach clients and Redis as JSON
+    rebuilt = delta.apply(rebuilt, json.loads(json.dumps(update)))
+    assert rebuilt == message
+
+
+def test_moves_are_sent_as_new_moves():
+  previous = {'status': 'get_action', 'pot': 3, 'move_history': ['A posts 1', 'B posts 2']}
+  message = {'status': 'get_action', 'pot': 7, 'move_history': ['A posts 1', 'B posts 2', 'A raises to 6']}
+  update = delta.diff(previous, message)
+  assert update == {'delta': {'pot': 7}, 'removed': [], 'new_moves': ['A raises to 6']}
+  assert delta.apply(previous, update) == message
+
+
+def test_new_hand_sends_the_move_history_whole():
+  previous = {'round_num': 1, 'move_history': ['A posts 1', 'B folds']}
+  message = {'round_num': 2, 'move_history': ['B posts 1']}
+  update = delta.diff(previous, message)
+  assert update['delta'] == {'round_num': 2, 'move_history': ['B posts 1']}
+  assert delta.apply(previous, update) == message
+
+
+def test_removed_fields_are_dropped():
+  previous = {'status': 'get_action', 'legal_moves': [{'type': 'check'}]}
+  message = {'status': 'round_over', 'result': 'win'}
+  update = delta.diff(previous, message)
+  assert update['removed'] == ['legal_moves']
+  assert delta.apply(previous, update) == message
+
+
+def test_apply_does_not_modify_the_message():
+  previous = {'move_history': ['a']}
+  update = delta.diff(previous, {'move_history': ['a', 'b']})
+  delta.apply(previous, update)
+  assert previous == {'move_history': ['a']}
+
+
+def test_non_dict_messages_need_a_snapshot():
+  assert delta.diff(None, {'status': 'starting_game'}) is None
+  assert delta.diff({'status': 'starting_game'}, None) is None
+
+
+def test_a_hand_rebuilds_from_its_deltas():
+  round_trip([
+    {'status': 'starting_game'},
+    {'status': 'get_action', 'round_num': 1, 'pot': 3, 'move_history': ['A posts 1', 'B posts 2'],
+     'legal_moves': [{'type': 'call'}, {'type': 'raise', 'min': 4, 'max': 400}]},
+    {'status': 'get_action', 'round_num': 1, 'pot': 8, 'move_history': ['A posts 1', 'B posts 2', 'A calls', 'B raises to 6'],
+     'legal_moves': [{'type': 'call'}, {'type': 'fold'}]},
+    {'status': 'round_over', 'round_num': 1, 'pot': 12, 'result': 'win',
+     'move_history': ['A posts 1', 'B posts 2', 'A calls', 'B raises to 6', 'A calls']},
+    {'status': 'get_action', 'round_num': 2, 'pot': 3, 'move_history': ['B posts 1', 'A posts 2'],
+     'legal_moves': [{'type': 'check'}]},
+  ])
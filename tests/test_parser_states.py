@@ -0,0 +1,39 @@
+from server.pokerbots_parser.actions import CallAction, CheckAction, RaiseAction
+from server.pokerbots_parser.states import BIG_BLIND, SMALL_BLIND, STARTING_STACK, RoundState
+
+BOARD = ['Ah', 'Kd', '7c', '2s', '9h']
+
+
+def new_round():
+  pips = [SMALL_BLIND, BIG_BLIND]
+  stacks = [STARTING_STACK - SMALL_BLIND, STARTING_STACK - BIG_BLIND]
+  return RoundState(0, 0, pips, stacks, [['As', 'Ad'], []], ['A', '-1'], [])
+
+
+def play(round_state, steps):
+  """Applies steps, each an action or the board the engine reveals, as the runner does."""
+  states = []
+  for step in steps:
+    if isinstance(step, list):
+      round_state.deck = step
+    else:
+      states.append((round_state.street, list(round_state.pips), list(round_state.stacks), list(round_state.deck)))
+      round_state = round_state.proceed(step)
+  return round_state, states
+
+
+def test_previous_state_is_the_state_before_each_action():
+  steps = [CallAction(), CheckAction(), BOARD[:3], RaiseAction(10), CallAction(), BOARD[:4], CheckAction(), RaiseAction(20)]
+  round_state, states = play(new_round(), steps)
+  for expected in reversed(states):
+    previous = round_state.previous_state
+    assert (previous.street, previous.pips, previous.stacks, previous.deck) == expected
+    round_state = previous
+  assert round_state.previous_state is None
+
+
+def test_previous_state_sees_the_board_known_at_the_time():
+  round_state, _ = play(new_round(), [CallAction(), CheckAction(), BOARD[:3], CheckAction()])
+  round_state.deck = BOARD[:4]
+  assert round_state.previous_state.deck == BOARD[:3]
+  assert round_state.previous_state.previous_state.deck == []
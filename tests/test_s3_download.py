@@ -0,0 +1,72 @@
+import concurrent.futures
+import io
+import threading
+
+import pytest
+
+from server.s3_download import RangedObject
+
+
+class FakeS3Client(object):
+  """Serves get_object from bytes in memory and records the ranges requested."""
+
+  def __init__(self, data):
+    self.data = data
+    self.ranges = []
+    self.lock = threading.Lock()
+
+  def get_object(self, Bucket, Key, Range=None):
+    with self.lock:
+      self.ranges.append(Range)
+    if Range is None:
+      return {'ContentLength': len(self.data), 'Body': io.BytesIO(self.data)}
+    first, last = (int(bound) for bound in Range[len('bytes='):].split('-'))
+    last = min(last, len(self.data) - 1)
+    return {
+      'ContentLength': last + 1 - first,
+      'ContentRange': 'bytes {}-{}/{}'.format(first, last, len(self.data)),
+      'Body': io.BytesIO(self.data[first:last + 1])
+    }
+
+
+@pytest.fixture
+def executor():
+  with concurrent.futures.ThreadPoolExecutor(max_workers=4) as executor:
+    yield executor
+
+
+@pytest.mark.parametrize('size', [1, 99, 100, 101, 1000, 1050])
+def test_read_returns_the_whole_object(executor, size):
+  data = bytes(i % 251 for i in range(size))
+  client = FakeS3Client(data)
+  ranged = RangedObject(client, 'bots', 'bot.zip', 100, executor, 3)
+  assert ranged.size == size
+  assert ranged.read() == data
+  assert len(client.ranges) == -(-size // 100)
+
+
+def test_small_reads_cross_part_boundaries(executor):
+  data = bytes(range(250))
+  ranged = RangedObject(FakeS3Client(data), 'bots', 'bot.zip', 100, executor, 2)
+  chunks = list(iter(lambda: ranged.read(7), b''))
+  assert b''.join(chunks) == data
+  assert max(len(chunk) for chunk in chunks) <= 7
+
+
+def test_read_ahead_is_bounded(executor):
+  client = FakeS3Client(b'x' * 1000)
+  ranged = RangedObject(client, 'bots', 'bot.zip', 100, executor, 2)
+  assert len(ranged._parts) == 2
+  while ranged.read(50):
+    assert len(ranged._parts) <= 2
+  assert len(client.ranges) == 10
+
+
+def test_close_stops_fetching(executor):
+  client = FakeS3Client(b'x' * 1000)
+  ranged = RangedObject(client, 'bots', 'bot.zip', 100, executor, 2)
+  ranged.read(10)
+  ranged.close()
+  assert ranged.read(10) == b''
+  # the first part and at most the read-ahead after it
+  assert len(client.ranges) <= 3
@@ -0,0 +1,85 @@
+from server.warm_pool import WarmPool, WarmTable
+
+
+class FakeTable(object):
+  def __init__(self):
+    self.closed = False
+
+
+class FakeEngineService(object):
+  def __init__(self):
+    self.tables = []
+
+  @property
+  def num_tables(self):
+    return len(self.tables)
+
+  def close_table(self, table):
+    table.closed = True
+    self.tables.remove(table)
+
+
+class FakeTmpDir(object):
+  def cleanup(self):
+    pass
+
+
+class FakeWarmTable(WarmTable):
+  alive = True
+
+
+def make_pool(popular, depth, max_tables=10):
+  engine_service = FakeEngineService()
+
+  def launch(key):
+    table = FakeTable()
+    engine_service.tables.append(table)
+    return FakeWarmTable(key, table, FakeTmpDir())
+
+  pool = WarmPool(engine_service, launch, lambda count: popular[:count], 2, depth, 60, 30, max_tables)
+  return pool, engine_service
+
+
+def test_refill_parks_depth_tables_per_bot():
+  pool, _ = make_pool(['a', 'b', 'c'], 3)
+  pool.refill()
+  assert {key: len(tables) for key, tables in pool.tables.items()} == {'a': 3, 'b': 3}
+  assert pool.num_tables == 6
+
+
+def test_refill_warms_every_bot_once_before_any_twice():
+  pool, _ = make_pool(['a', 'b'], 3, max_tables=3)
+  pool.refill()
+  assert {key: len(tables) for key, tables in pool.tables.items()} == {'a': 2, 'b': 1}
+
+
+def test_claim_takes_the_oldest_table_and_leaves_the_rest():
+  pool, _ = make_pool(['a'], 2)
+  pool.refill()
+  first, second = pool.tables['a']
+  assert pool.claim('a') is first
+  assert pool.claim('a') is second
+  assert pool.claim('a') is None
+  assert pool.num_tables == 0
+
+
+def test_claim_discards_dead_tables():
+  pool, engine_service = make_pool(['a'], 2)
+  pool.refill()
+  dead, alive = pool.tables['a']
+  dead.alive = False
+  assert pool.claim('a') is alive
+  assert dead.table.closed
+  assert engine_service.tables == [alive.table]
+
+
+def test_make_room_discards_the_oldest_table_when_the_budget_is_full():
+  pool, engine_service = make_pool(['a', 'b'], 1, max_tables=2)
+  pool.refill()
+  oldest = pool.tables['a'][0]
+  oldest.parked_at -= 10
+  pool.make_room()
+  assert oldest.table.closed
+  assert list(pool.tables) == ['b']
+  pool.make_room()
+  assert list(pool.tables) == ['b']